@@ -0,0 +1,152 @@
+"""
+Ketma-ket qoldirilgan darslar (Attendance Alert).
+
+detect_absence_streaks oxirgi ishga tushirishdan (JobWatermark) keyin
+davomati belgilangan o'quvchilarni oladi va ularning hozirgi "Absent"
+seriyasini bitta SQL bilan hisoblaydi: darslar eng yangisidan boshlab
+tartiblanadi, SUM(...) OVER oynasi shu paytgacha uchragan "kelgan"
+belgilarini sanaydi - nol bo'lgan qatorlar hozirgi seriya. Natija
+AbsenceStreak'ka upsert qilinadi (at-risk endpoint'i shu jadvaldan o'qiydi),
+chegaradan oshganlar uchun bildirishnomalar create_deduplicated bilan.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, models
+from django.utils import timezone
+
+from .models import AbsenceStreak, Attendance, JobWatermark, Lesson, Student
+from .notifications import create_deduplicated
+
+WATERMARK = 'absence-streaks'
+
+
+def _streaks_sql(since):
+    """Current absence run per student; since=None - barcha o'quvchilar (--full)"""
+    quote = connection.ops.quote_name
+    attendance, lesson = Attendance._meta, Lesson._meta
+
+    def column(meta, name):
+        return quote(meta.get_field(name).column)
+
+    touched = (
+        f'SELECT {column(attendance, "student")} FROM {quote(attendance.db_table)} '
+        f'WHERE {column(attendance, "marked_at")} > %s'
+    ) if since is not None else None
+    return f'''
+        SELECT student_id,
+               SUM(CASE WHEN seen_present = 0 THEN 1 ELSE 0 END),
+               MIN(CASE WHEN seen_present = 0 THEN lesson_date END),
+               MAX(lesson_date)
+        FROM (
+            SELECT a.{column(attendance, "student")} AS student_id,
+                   l.{column(lesson, "date")} AS lesson_date,
+                   SUM(CASE WHEN a.{column(attendance, "status")} = %s THEN 0 ELSE 1 END) OVER (
+                       PARTITION BY a.{column(attendance, "student")}
+                       ORDER BY l.{column(lesson, "date")} DESC, l.{column(lesson, "start_time")} DESC,
+                                l.{quote(lesson.pk.column)} DESC
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+                   ) AS seen_present
+            FROM {quote(attendance.db_table)} a
+            JOIN {quote(lesson.db_table)} l ON l.{quote(lesson.pk.column)} = a.{column(attendance, "lesson")}
+            WHERE l.{column(lesson, "date")} BETWEEN %s AND %s
+              AND l.{column(lesson, "is_cancelled")} = %s
+              AND a.{column(attendance, "status")} <> %s
+              {f'AND a.{column(attendance, "student")} IN ({touched})' if touched else ''}
+        ) marks
+        GROUP BY student_id
+    '''
+
+
+def current_streaks(today, since=None):
+    """[(student_id, length, started_on, last_lesson_date)] for students marked after since (None - all)"""
+    ops = connection.ops
+    params = [
+        'Absent',
+        ops.adapt_datefield_value(today - timedelta(days=settings.ABSENCE_LOOKBACK_DAYS)),
+        ops.adapt_datefield_value(today),
+        False,
+        'Excused',  # sababli - seriyani uzmaydi ham, davom ettirmaydi ham
+    ]
+    if since is not None:
+        params.append(ops.adapt_datetimefield_value(since))
+    to_date = models.DateField().to_python
+    with connection.cursor() as cursor:
+        cursor.execute(_streaks_sql(since), params)
+        return [
+            (student_id, int(length or 0), to_date(started_on), to_date(last_lesson_date))
+            for student_id, length, started_on, last_lesson_date in cursor.fetchall()
+        ]
+
+
+def _keep_started_on(streaks):
+    """
+    Davom etayotgan seriyaning saqlangan started_on'i saqlanib qoladi.
+
+    SQL natijasi ABSENCE_LOOKBACK_DAYS oynasi bilan kesiladi: uzun seriyaning
+    boshi oyna siljigan sari keyinga suriladi. Yangi seriya eski seriyaning
+    oxirgi darsidan kech boshlanmasa (orada "kelgan" belgi yo'q) - bu o'sha seriya.
+    """
+    result = []
+    for start in range(0, len(streaks), settings.NOTIFICATION_BATCH_SIZE):
+        batch = streaks[start:start + settings.NOTIFICATION_BATCH_SIZE]
+        stored = {
+            student_id: (length, started_on, last_lesson_date)
+            for student_id, length, started_on, last_lesson_date in AbsenceStreak.objects.filter(
+                pk__in=[student_id for student_id, *_ in batch], length__gt=0,
+            ).values_list('student_id', 'length', 'started_on', 'last_lesson_date')
+        }
+        for student_id, length, started_on, last_lesson_date in batch:
+            _, stored_start, stored_last = stored.get(student_id, (0, None, None))
+            if length and started_on and stored_start and stored_last and started_on <= stored_last:
+                started_on = min(started_on, stored_start)
+            result.append((student_id, length, started_on, last_lesson_date))
+    return result
+
+
+def _alerts(at_risk):
+    """{(dedup_key, user_id): (title, message)} for the student, parent and group teacher"""
+    rows = {}
+    ids = list(at_risk)
+    for start in range(0, len(ids), settings.NOTIFICATION_BATCH_SIZE):
+        students = Student.objects.filter(
+            pk__in=ids[start:start + settings.NOTIFICATION_BATCH_SIZE], status='Active',
+        ).values_list('id', 'first_name', 'last_name', 'user_id', 'parent_user_id', 'group__teacher__user_id')
+        for student_id, first_name, last_name, user_id, parent_id, teacher_user_id in students:
+            length, started_on = at_risk[student_id]
+            message = f'{first_name} {last_name} missed {length} lessons in a row (since {started_on}).'
+            for recipient in {user_id, parent_id, teacher_user_id} - {None}:
+                # Bitta seriya - bitta ogohlantirish (started_on seriya davomida o'zgarmaydi)
+                rows[f'absence-streak:{student_id}:{started_on}', recipient] = ('Consecutive absences', message)
+    return rows
+
+
+def detect_absence_streaks(now=None, full=False):
+    """Recompute streaks touched since the watermark, alert at ABSENCE_STREAK_THRESHOLD; returns a summary"""
+    now = now or timezone.now()
+    watermark = JobWatermark.objects.filter(name=WATERMARK).values_list('value', flat=True).first()
+    # Overlap: marked_at commit'dan oldin qo'yiladi - kechikib commit bo'lganlar ham qayta ko'riladi
+    since = None if full or watermark is None else watermark - timedelta(seconds=settings.ABSENCE_WATERMARK_OVERLAP)
+
+    streaks = _keep_started_on(current_streaks(timezone.localdate(now), since))
+    at_risk = {
+        student_id: (length, started_on)
+        for student_id, length, started_on, _ in streaks
+        if length >= settings.ABSENCE_STREAK_THRESHOLD
+    }
+    AbsenceStreak.objects.bulk_create(
+        [
+            AbsenceStreak(student_id=student_id, length=length, started_on=started_on,
+                          last_lesson_date=last_lesson_date)
+            for student_id, length, started_on, last_lesson_date in streaks
+        ],
+        batch_size=settings.NOTIFICATION_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=['length', 'started_on', 'last_lesson_date', 'updated_at'],
+    )
+    notifications = create_deduplicated('Attendance Alert', _alerts(at_risk)) if at_risk else 0
+    # Watermark oxirida: xato bo'lsa keyingi ishga tushirish shu oraliqni qayta ko'radi (dedup_key)
+    JobWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': now})
+    return {'students': len(streaks), 'at_risk': len(at_risk), 'notifications': notifications}
@@ -4,7 +4,8 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     EducationalCenter, UserProfile, Branch, Subject, Group, Student,
     Teacher, Lesson, Attendance, Payment, Assignment, AssignmentSubmission,
-    Exam, ExamResult, Room, Payroll, Notification, Contract, Lead
+    Exam, ExamResult, Room, Payroll, Notification, Contract, Lead,
+    GroupSchedule, GroupWaitlist, Holiday, TeacherAvailability, BroadcastJob
 )
 
 # ----------------------------
@@ -54,10 +55,21 @@ class SubjectAdmin(admin.ModelAdmin):
 # ----------------------------
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
-    list_display = ('name', 'subject', 'teacher', 'status')
+    list_display = ('name', 'subject', 'teacher', 'status', 'enrolled_count', 'capacity')
     list_filter = ('status', 'subject')
     search_fields = ('name',)
     autocomplete_fields = ('subject', 'teacher')
+    readonly_fields = ('enrolled_count',)
+
+
+# ----------------------------
+# Group Waitlist
+# ----------------------------
+@admin.register(GroupWaitlist)
+class GroupWaitlistAdmin(admin.ModelAdmin):
+    list_display = ('group', 'student', 'created_at')
+    list_filter = ('group',)
+    autocomplete_fields = ('group', 'student')
 
 
 # ----------------------------
@@ -68,7 +80,7 @@ class StudentAdmin(admin.ModelAdmin):
     list_display = ('full_name', 'group', 'branch', 'status', 'enrollment_date')
     list_filter = ('status', 'branch', 'group')
     search_fields = ('first_name', 'last_name', 'phone')
-    autocomplete_fields = ('group', 'branch')
+    autocomplete_fields = ('group', 'branch', 'user', 'parent_user')
 
     def full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}"
@@ -86,6 +98,16 @@ class TeacherAdmin(admin.ModelAdmin):
     autocomplete_fields = ('branch',)
 
 
+# ----------------------------
+# Teacher Availability
+# ----------------------------
+@admin.register(TeacherAvailability)
+class TeacherAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ('teacher', 'weekday', 'start_time', 'end_time')
+    list_filter = ('weekday',)
+    autocomplete_fields = ('teacher',)
+
+
 # ----------------------------
 # Lesson
 # ----------------------------
@@ -97,6 +119,26 @@ class LessonAdmin(admin.ModelAdmin):
     autocomplete_fields = ('group', 'teacher')
 
 
+# ----------------------------
+# Group Schedule
+# ----------------------------
+@admin.register(GroupSchedule)
+class GroupScheduleAdmin(admin.ModelAdmin):
+    list_display = ('group', 'weekday', 'start_time', 'end_time', 'room', 'teacher')
+    list_filter = ('weekday',)
+    autocomplete_fields = ('group', 'room', 'teacher')
+
+
+# ----------------------------
+# Holiday
+# ----------------------------
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ('name', 'date', 'educational_center')
+    list_filter = ('educational_center',)
+    search_fields = ('name',)
+
+
 # ----------------------------
 # Attendance
 # ----------------------------
@@ -188,6 +230,14 @@ class NotificationAdmin(admin.ModelAdmin):
     autocomplete_fields = ('user',)
 
 
+@admin.register(BroadcastJob)
+class BroadcastJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'target_type', 'target_id', 'role', 'status', 'sent', 'total', 'created_at')
+    list_filter = ('status', 'target_type', 'educational_center')
+    search_fields = ('title',)
+    readonly_fields = ('status', 'total', 'sent', 'error', 'started_at', 'finished_at')
+
+
 # ----------------------------
 # Contract
 # ----------------------------
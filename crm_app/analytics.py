@@ -0,0 +1,480 @@
+"""
+Hisobotlar uchun vektorlashtirilgan hisob-kitoblar (NumPy).
+
+Ma'lumotlar bazadan ixcham sonli massiv sifatida olinadi va barcha
+statistikalar bitta vektor o'tishda hisoblanadi.
+"""
+
+import csv
+import hashlib
+import warnings
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, CharField, ExpressionWrapper, F, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from .caching import versioned_key
+from .models import Assignment, AssignmentSubmission, Attendance, Exam, ExamResult, Payment, Student
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+
+# Gradebook: topshiriq harf bahosining foizdagi qiymati
+ASSIGNMENT_GRADE_PERCENT = {'A': 100, 'B': 80, 'C': 60, 'D': 40, 'F': 0}
+COLUMN_ASSIGNMENT, COLUMN_EXAM, ROW_STUDENT = 0, 1, 2
+
+
+def exam_results_namespace(exam_id=None):
+    """Cache namespace invalidated whenever an exam's ExamResult set changes"""
+    if exam_id is None:
+        return 'exam_results'
+    return f'exam_results:{exam_id}'
+
+
+def score_statistics(scores, passing_score, total_points):
+    """Mean, median, percentiles, pass rate and histogram for one score array"""
+    total_points = max(int(total_points), 1)
+    if scores.size == 0:
+        return {
+            'count': 0,
+            'mean': None,
+            'median': None,
+            'std': None,
+            'min': None,
+            'max': None,
+            'percentiles': {str(p): None for p in PERCENTILES},
+            'passed_count': 0,
+            'pass_rate': None,
+            'histogram': {'bin_edges': [], 'counts': []},
+        }
+
+    percentiles = np.percentile(scores, PERCENTILES)
+    counts, edges = np.histogram(
+        np.clip(scores, 0, total_points), bins=HISTOGRAM_BINS, range=(0, total_points)
+    )
+    passed = int(np.count_nonzero(scores >= passing_score))
+
+    return {
+        'count': int(scores.size),
+        'mean': round(float(scores.mean()), 2),
+        'median': float(np.median(scores)),
+        'std': round(float(scores.std()), 2),
+        'min': scores.min().item(),
+        'max': scores.max().item(),
+        'percentiles': {str(p): round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+        'passed_count': passed,
+        'pass_rate': round(passed / scores.size * 100, 2),
+        'histogram': {
+            'bin_edges': [round(float(e), 2) for e in edges],
+            'counts': counts.tolist(),
+        },
+    }
+
+
+def exam_statistics(exam):
+    """Cached score statistics for a single exam"""
+    key = versioned_key(
+        exam_results_namespace(exam.id), 'stats', exam.passing_score, exam.total_points
+    )
+    data = cache.get(key)
+    if data is None:
+        scores = np.fromiter(
+            ExamResult.objects.filter(exam_id=exam.id).values_list('score', flat=True),
+            dtype=np.int32,
+        )
+        data = score_statistics(scores, exam.passing_score, exam.total_points)
+        data['exam'] = exam.id
+        data['passing_score'] = exam.passing_score
+        data['total_points'] = exam.total_points
+        cache.set(key, data, timeout=settings.EXAM_STATS_CACHE_TIMEOUT)
+    return data
+
+
+def exams_comparison(exams):
+    """
+    Side-by-side statistics for many exams (group- or center-wide).
+
+    Ikki so'rov: imtihonlar ro'yxati va barcha ballar (exam_id, score).
+    Har bir imtihon bo'yicha o'rtacha, mediana va o'tish foizi
+    saralangan massiv segmentlari ustida vektorli hisoblanadi.
+    """
+    rows = list(
+        exams.order_by('id').values_list(
+            'id', 'title', 'exam_date', 'group_id', 'passing_score', 'total_points'
+        )
+    )
+    if not rows:
+        return {'exams': [], 'overall': score_statistics(np.empty(0, dtype=np.int32), 0, 1)}
+
+    exam_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    digest = hashlib.md5(exam_ids.tobytes()).hexdigest()
+    key = versioned_key(exam_results_namespace(), 'comparison', digest)
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    passing = np.array([r[4] for r in rows], dtype=np.int32)
+    totals = np.array([max(r[5], 1) for r in rows], dtype=np.int32)
+
+    pairs = np.array(
+        ExamResult.objects.filter(exam_id__in=exam_ids.tolist())
+        .values_list('exam_id', 'score')
+        .order_by(),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    ids, scores = pairs[:, 0], pairs[:, 1]
+
+    # Imtihon bo'yicha, keyin ball bo'yicha saralash: har bir segment tartiblangan
+    order = np.lexsort((scores, ids))
+    ids, scores = ids[order], scores[order]
+    present, starts, counts = np.unique(ids, return_index=True, return_counts=True)
+    row_of_score = np.searchsorted(exam_ids, ids)
+
+    idx = np.searchsorted(exam_ids, present)
+    n = len(rows)
+    count = np.zeros(n, dtype=np.int64)
+    mean = np.full(n, np.nan)
+    median = np.full(n, np.nan)
+    low = np.full(n, np.nan)
+    high = np.full(n, np.nan)
+    passed = np.zeros(n, dtype=np.int64)
+
+    if present.size:
+        count[idx] = counts
+        mean[idx] = np.add.reduceat(scores, starts) / counts
+        median[idx] = (scores[starts + (counts - 1) // 2] + scores[starts + counts // 2]) / 2
+        low[idx] = scores[starts]
+        high[idx] = scores[starts + counts - 1]
+        passed[idx] = np.add.reduceat((scores >= passing[row_of_score]).astype(np.int64), starts)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pass_rate = passed / count * 100
+        mean_percent = mean / totals * 100
+
+    def _num(value):
+        return None if np.isnan(value) else round(float(value), 2)
+
+    data = {
+        'exams': [
+            {
+                'exam': row[0],
+                'title': row[1],
+                'exam_date': row[2],
+                'group': row[3],
+                'passing_score': row[4],
+                'total_points': row[5],
+                'count': int(count[i]),
+                'mean': _num(mean[i]),
+                'mean_percent': _num(mean_percent[i]),
+                'median': _num(median[i]),
+                'min': _num(low[i]),
+                'max': _num(high[i]),
+                'passed_count': int(passed[i]),
+                'pass_rate': _num(pass_rate[i]),
+            }
+            for i, row in enumerate(rows)
+        ],
+        # Umumiy ko'rsatkich foizlarda: turli total_points'li imtihonlarni solishtirish uchun
+        'overall': score_statistics(
+            scores * 100 / totals[row_of_score],
+            passing[row_of_score] * 100 / totals[row_of_score],
+            100,
+        ),
+    }
+    cache.set(key, data, timeout=settings.EXAM_STATS_CACHE_TIMEOUT)
+    return data
+
+
+def _month_index(year, month):
+    return year * 12 + (month - 1)
+
+
+def _month_label(index):
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def _month_pairs(queryset, date_field):
+    """Distinct (student_id, month index) pairs as an int64 array of shape (n, 2)"""
+    rows = (
+        queryset.annotate(_y=ExtractYear(date_field), _m=ExtractMonth(date_field))
+        .values_list('student_id', '_y', '_m')
+        .distinct()
+        .order_by()
+    )
+    arr = np.array(list(rows), dtype=np.int64).reshape(-1, 3)
+    return np.column_stack((arr[:, 0], arr[:, 1] * 12 + arr[:, 2] - 1))
+
+
+def compute_cohort_retention(center_id, months=12):
+    """
+    Retention matrix of monthly enrollment cohorts.
+
+    Qator - enrollment_date oyi (kogorta), ustun - N oy o'tgach.
+    Har bir katakda kogortaning shu oyda darsga kelgan, to'lov qilgan va
+    ikkalasini ham qilgan o'quvchilar ulushi (foizda). Hisob to'liq
+    NumPy massivlari ustida, Python siklisiz bajariladi.
+    """
+    today = timezone.localdate()
+    current = _month_index(today.year, today.month)
+    first = current - months
+    window_start = date(first // 12, first % 12 + 1, 1)
+
+    students = np.array(
+        list(
+            Student.objects.filter(
+                branch__educational_center_id=center_id,
+                enrollment_date__gte=window_start,
+            )
+            .annotate(
+                _y=ExtractYear('enrollment_date'),
+                _m=ExtractMonth('enrollment_date'),
+                _active=ExpressionWrapper(Q(status='Active'), output_field=BooleanField()),
+            )
+            .values_list('id', '_y', '_m', '_active')
+            .order_by('id')
+        ),
+        dtype=np.int64,
+    ).reshape(-1, 4)
+
+    offsets = list(range(months + 1))
+    if not len(students):
+        return {'center': center_id, 'months': months, 'offsets': offsets, 'cohorts': [],
+                'cohort_sizes': [], 'active_rate': [], 'attending': [], 'paying': [], 'retained': []}
+
+    student_ids = students[:, 0]
+    enrolled = students[:, 1] * 12 + students[:, 2] - 1
+    active = students[:, 3]
+
+    cohort_months, cohort_of = np.unique(enrolled, return_inverse=True)
+    sizes = np.bincount(cohort_of, minlength=len(cohort_months))
+    width = months + 1
+
+    attended = _month_pairs(
+        Attendance.objects.filter(
+            student__branch__educational_center_id=center_id,
+            student__enrollment_date__gte=window_start,
+            status__in=['Present', 'Late'],
+        ),
+        'lesson__date',
+    )
+    paid = _month_pairs(
+        Payment.objects.filter(
+            student__branch__educational_center_id=center_id,
+            student__enrollment_date__gte=window_start,
+        ),
+        'payment_date',
+    )
+
+    def cell_keys(pairs):
+        # (student, oy) juftliklarini (o'quvchi indeksi * width + offset) kalitiga aylantirish
+        pos = np.searchsorted(student_ids, pairs[:, 0])
+        pos = np.clip(pos, 0, len(student_ids) - 1)
+        offset = pairs[:, 1] - enrolled[pos]
+        keep = (student_ids[pos] == pairs[:, 0]) & (offset >= 0) & (offset < width)
+        return np.unique(pos[keep] * width + offset[keep])
+
+    def matrix(keys):
+        counts = np.zeros((len(cohort_months), width), dtype=np.int64)
+        np.add.at(counts, (cohort_of[keys // width], keys % width), 1)
+        return counts
+
+    attend_keys = cell_keys(attended)
+    pay_keys = cell_keys(paid)
+    both_keys = np.intersect1d(attend_keys, pay_keys, assume_unique=True)
+
+    # Hali kelmagan oylar (kogorta oyi + offset > joriy oy) None bo'ladi
+    future = (cohort_months[:, None] + np.arange(width)[None, :]) > current
+
+    def rates(counts):
+        pct = np.round(counts / sizes[:, None] * 100, 2)
+        return np.where(future, None, pct).tolist()
+
+    return {
+        'center': center_id,
+        'months': months,
+        'offsets': offsets,
+        'cohorts': [_month_label(int(m)) for m in cohort_months],
+        'cohort_sizes': sizes.tolist(),
+        'active_rate': np.round(
+            np.bincount(cohort_of, weights=active, minlength=len(cohort_months)) / sizes * 100, 2
+        ).tolist(),
+        'attending': rates(matrix(attend_keys)),
+        'paying': rates(matrix(pay_keys)),
+        'retained': rates(matrix(both_keys)),
+    }
+
+
+def cohort_retention(center_id, months=12):
+    """Cohort retention matrix cached per center"""
+    key = f'cohorts:{center_id}:{months}:{timezone.localdate():%Y-%m}'
+    data = cache.get(key)
+    if data is None:
+        data = compute_cohort_retention(center_id, months)
+        cache.set(key, data, timeout=getattr(settings, 'COHORT_CACHE_TIMEOUT', 60 * 60))
+    return data
+
+
+def _gradebook_headers(group):
+    """Query 1: assignment/exam columns and the student rows in one UNION ALL"""
+    submissions = AssignmentSubmission.objects.filter(assignment__group=group, grade__isnull=False)
+    results = ExamResult.objects.filter(exam__group=group)
+    roster = Student.objects.filter(
+        Q(group=group)
+        | Q(pk__in=submissions.values('student_id'))
+        | Q(pk__in=results.values('student_id'))
+    )
+    columns = ('kind', 'ref', 'label', 'label2', 'day', 'points')
+
+    def part(queryset, kind, label, label2, day, points):
+        return queryset.annotate(
+            kind=Value(kind, output_field=IntegerField()),
+            ref=F('id'),
+            label=label,
+            label2=label2,
+            day=day,
+            points=points,
+        ).values_list(*columns).order_by()
+
+    empty = Value('', output_field=CharField())
+    return part(
+        Assignment.objects.filter(group=group), COLUMN_ASSIGNMENT, F('title'), empty, F('due_date'),
+        Value(100, output_field=IntegerField()),
+    ).union(
+        part(Exam.objects.filter(group=group), COLUMN_EXAM, F('title'), empty, F('exam_date'), F('total_points')),
+        part(roster, ROW_STUDENT, F('first_name'), F('last_name'), F('enrollment_date'),
+             Value(0, output_field=IntegerField())),
+        all=True,
+    )
+
+
+def _gradebook_cells(group):
+    """Query 2: (kind, column id, student id, value) for every graded submission and exam result"""
+    grade_percent = Case(
+        *[When(grade=letter, then=Value(percent)) for letter, percent in ASSIGNMENT_GRADE_PERCENT.items()],
+        output_field=IntegerField(),
+    )
+    columns = ('kind', 'ref', 'student_ref', 'value')
+    submissions = AssignmentSubmission.objects.filter(
+        assignment__group=group, grade__in=list(ASSIGNMENT_GRADE_PERCENT),
+    ).annotate(
+        kind=Value(COLUMN_ASSIGNMENT, output_field=IntegerField()),
+        ref=F('assignment_id'),
+        student_ref=F('student_id'),
+        value=grade_percent,
+    )
+    results = ExamResult.objects.filter(exam__group=group).annotate(
+        kind=Value(COLUMN_EXAM, output_field=IntegerField()),
+        ref=F('exam_id'),
+        student_ref=F('student_id'),
+        value=F('score'),
+    )
+    return submissions.values_list(*columns).order_by().union(
+        results.values_list(*columns).order_by(), all=True,
+    )
+
+
+def compute_gradebook(group, assignment_weight):
+    """
+    Dense students × (assignments + exams) matrix in percent with weighted averages.
+
+    Ikki so'rov: sarlavhalar (ustunlar + o'quvchilar) va baholar. Matritsa
+    NumPy'da to'ldiriladi; o'rtachalar NaN'larni (baholanmagan kataklar)
+    hisobga olmasdan vektorli hisoblanadi.
+    """
+    headers = list(_gradebook_headers(group))
+    columns = sorted(
+        (row for row in headers if row[0] != ROW_STUDENT),
+        key=lambda row: (row[4], row[0], row[1]),
+    )
+    students = sorted(
+        ((row[2], row[3], row[1]) for row in headers if row[0] == ROW_STUDENT),
+    )
+
+    column_keys = np.array([kind * 2**32 + ref for kind, ref, *_ in columns], dtype=np.int64)
+    column_order = np.argsort(column_keys)
+    points = np.array([max(row[5], 1) for row in columns], dtype=np.float64)
+    is_exam = np.array([row[0] == COLUMN_EXAM for row in columns], dtype=bool)
+    student_ids = np.array([student_id for _, _, student_id in students], dtype=np.int64)
+    student_order = np.argsort(student_ids)
+
+    matrix = np.full((len(students), len(columns)), np.nan)
+    cells = np.array(list(_gradebook_cells(group)), dtype=np.int64).reshape(-1, 4)
+    if cells.size and columns and students:
+        keys = cells[:, 0] * 2**32 + cells[:, 1]
+        col = column_order[np.searchsorted(column_keys, keys, sorter=column_order)]
+        row = student_order[np.searchsorted(student_ids, cells[:, 2], sorter=student_order)]
+        matrix[row, col] = cells[:, 3] / points[col] * 100
+
+    # Bo'sh qator/ustun uchun nanmean "Mean of empty slice" ogohlantirishini beradi
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        assignment_avg = np.nanmean(matrix[:, ~is_exam], axis=1) if (~is_exam).any() else np.full(len(students), np.nan)
+        exam_avg = np.nanmean(matrix[:, is_exam], axis=1) if is_exam.any() else np.full(len(students), np.nan)
+        column_avg = np.nanmean(matrix, axis=0) if len(students) else np.full(len(columns), np.nan)
+
+    # Bitta turdagi baho bo'lmasa o'rtacha faqat ikkinchisidan olinadi
+    weighted = np.where(
+        np.isnan(assignment_avg), exam_avg,
+        np.where(np.isnan(exam_avg), assignment_avg,
+                 assignment_weight * assignment_avg + (1 - assignment_weight) * exam_avg),
+    )
+
+    def _list(values):
+        return [None if np.isnan(v) else round(float(v), 2) for v in values]
+
+    return {
+        'group': group.id,
+        'assignment_weight': assignment_weight,
+        'students': {
+            'id': student_ids.tolist(),
+            'name': [f'{first} {last}'.strip() for first, last, _ in students],
+        },
+        'columns': {
+            'kind': ['exam' if exam else 'assignment' for exam in is_exam],
+            'id': [row[1] for row in columns],
+            'title': [row[2] for row in columns],
+            'date': [row[4] for row in columns],
+            'max_points': [row[5] for row in columns],
+            'average': _list(column_avg),
+        },
+        'matrix': [_list(values) for values in matrix],
+        'assignment_average': _list(assignment_avg),
+        'exam_average': _list(exam_avg),
+        'weighted_average': _list(weighted),
+    }
+
+
+class _Echo:
+    """csv.writer uchun: yozilgan qatorni qaytaradi (StreamingHttpResponse)"""
+
+    def write(self, value):
+        return value
+
+
+def gradebook_csv_rows(gradebook):
+    """Yield the gradebook as CSV lines, one student per chunk"""
+    writer = csv.writer(_Echo())
+    columns = gradebook['columns']
+    yield writer.writerow(
+        ['student_id', 'student']
+        + [f"{title} ({kind}, {day})" for title, kind, day in zip(columns['title'], columns['kind'], columns['date'])]
+        + ['assignment_average', 'exam_average', 'weighted_average']
+    )
+    students = gradebook['students']
+    for i, (student_id, name) in enumerate(zip(students['id'], students['name'])):
+        yield writer.writerow(
+            [student_id, name]
+            + ['' if value is None else value for value in gradebook['matrix'][i]]
+            + ['' if value is None else value for value in (
+                gradebook['assignment_average'][i],
+                gradebook['exam_average'][i],
+                gradebook['weighted_average'][i],
+            )]
+        )
+    yield writer.writerow(
+        ['', 'average'] + ['' if value is None else value for value in columns['average']] + ['', '', '']
+    )
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 class CrmAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'crm_app'
+
+    def ready(self):
+        from . import login_guard, middleware, signals  # noqa: F401
@@ -0,0 +1,128 @@
+"""
+Davomat jadvali (o'quvchi × dars matritsasi).
+
+Ro'yxat, darslar va davomat yozuvlari bitta UNION ALL so'rovi bilan olinadi
+va ixcham ustunli ko'rinishga keltiriladi: serializer ishlatilmaydi.
+"""
+
+import calendar
+import hashlib
+from datetime import date
+
+from django.db.models import Case, CharField, Count, F, IntegerField, Max, Q, Value, When
+from django.db.models.functions import Cast
+
+from .caching import get_version
+from .models import Attendance, Lesson, Student
+from .scheduling import LAZY_SCHEDULES_NAMESPACE, lazy_schedules, virtual_lessons
+
+# Matritsadagi kodlar; 0 - belgilanmagan
+STATUS_CODES = {'Present': 1, 'Absent': 2, 'Late': 3, 'Excused': 4}
+
+ROW_LESSON, ROW_STUDENT, ROW_MARK = 0, 1, 2
+COLUMNS = ('kind', 'lesson_ref', 'student_ref', 'day', 'text1', 'text2')
+
+
+def parse_month(value):
+    """'YYYY-MM' -> (first day, last day); ValueError on bad input"""
+    year, month = (int(part) for part in str(value).split('-'))
+    if not 1 <= month <= 12:
+        raise ValueError('month out of range')
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _row(queryset, kind, lesson_ref, student_ref, day, text1, text2):
+    # Barcha ustunlar annotatsiya: UNION qismlarida tartib bir xil bo'ladi
+    return queryset.annotate(
+        kind=Value(kind, output_field=IntegerField()),
+        lesson_ref=lesson_ref,
+        student_ref=student_ref,
+        day=day,
+        text1=text1,
+        text2=text2,
+    ).values_list(*COLUMNS).order_by()
+
+
+def _sheet_rows(group, date_from, date_to):
+    lessons = Lesson.objects.filter(group=group, date__gte=date_from, date__lte=date_to)
+    marks = Attendance.objects.filter(lesson__in=lessons.values('id'))
+    roster = Student.objects.filter(Q(group=group) | Q(pk__in=marks.values('student_id')))
+    zero = Value(0, output_field=IntegerField())
+
+    return _row(
+        lessons, ROW_LESSON, F('id'), zero, F('date'),
+        Cast('start_time', CharField()),
+        Case(When(is_cancelled=True, then=Value('cancelled')), default=Value(''), output_field=CharField()),
+    ).union(
+        _row(roster, ROW_STUDENT, zero, F('id'), F('enrollment_date'), F('first_name'), F('last_name')),
+        _row(marks, ROW_MARK, F('lesson_id'), F('student_id'), F('lesson__date'), F('status'),
+             Value('', output_field=CharField())),
+        all=True,
+    )
+
+
+def attendance_matrix(group, date_from, date_to):
+    """
+    Columnar attendance sheet of one group for [date_from, date_to].
+
+    matrix[i][j] - students.id[i] ning lessons.id[j] darsidagi holati (STATUS_CODES).
+    """
+    lessons, students, marks = [], [], {}
+    for kind, lesson_ref, student_ref, day, text1, text2 in _sheet_rows(group, date_from, date_to):
+        if kind == ROW_LESSON:
+            lessons.append((day, text1, lesson_ref, text2 == 'cancelled'))
+        elif kind == ROW_STUDENT:
+            students.append((text1, text2, student_ref))
+        else:
+            marks[(student_ref, lesson_ref)] = STATUS_CODES.get(text1, 0)
+
+    if group.lazy_schedule:
+        # Hali saqlanmagan virtual darslar ham ustun bo'ladi (davomatsiz)
+        for lesson in virtual_lessons(date_from, date_to, lazy_schedules(group_id=group.id)):
+            lessons.append((lesson['date'], str(lesson['start_time']), lesson['id'], lesson['is_cancelled']))
+
+    lessons.sort(key=lambda item: (item[0], item[1]))
+    students.sort()
+    lesson_ids = [lesson_ref for _, _, lesson_ref, _ in lessons]
+
+    return {
+        'group': group.id,
+        'from': date_from,
+        'to': date_to,
+        'status_codes': {'0': None, **{str(code): name for name, code in STATUS_CODES.items()}},
+        'students': {
+            'id': [student_id for _, _, student_id in students],
+            'name': [f'{first} {last}'.strip() for first, last, _ in students],
+        },
+        'lessons': {
+            'id': lesson_ids,
+            'date': [day for day, _, _, _ in lessons],
+            'start_time': [start[:5] for _, start, _, _ in lessons],
+            'is_cancelled': [cancelled for _, _, _, cancelled in lessons],
+        },
+        'matrix': [
+            [marks.get((student_id, lesson_id), 0) for lesson_id in lesson_ids]
+            for _, _, student_id in students
+        ],
+    }
+
+
+def attendance_matrix_etag(group, date_from, date_to):
+    """
+    ETag of a sheet: latest marked_at (auto_now) + row counts.
+
+    O'chirilgan belgi sonni, o'zgartirilgani marked_at'ni, ro'yxat/darslar
+    o'zgarishi esa ularning updated_at'ini o'zgartiradi.
+    """
+    lessons = Lesson.objects.filter(group=group, date__gte=date_from, date__lte=date_to)
+    marks = Attendance.objects.filter(lesson__in=lessons.values('id')).aggregate(
+        count=Count('id'), changed=Max('marked_at'),
+    )
+    lesson_state = lessons.aggregate(count=Count('id'), changed=Max('updated_at'))
+    roster = Student.objects.filter(group=group).aggregate(count=Count('id'), changed=Max('updated_at'))
+    lazy_version = get_version(LAZY_SCHEDULES_NAMESPACE) if group.lazy_schedule else ''
+    raw = (
+        f"{group.id}:{date_from}:{date_to}:{marks['count']}:{marks['changed']}:"
+        f"{lesson_state['count']}:{lesson_state['changed']}:{roster['count']}:{roster['changed']}:{lazy_version}"
+    )
+    return hashlib.md5(raw.encode()).hexdigest()
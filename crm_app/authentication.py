@@ -0,0 +1,164 @@
+"""
+Claim'lardan foydalanuvchi yasovchi JWT autentifikatsiyasi.
+
+Login tokenga role, educational_center_id, teacher_id va is_blocked
+claim'larini yozadi. Har so'rovda User/UserProfile bazadan o'qilmaydi:
+request.user va request.user.profile / .teacher shu claim'lardan quriladi.
+
+Eskirish chegaralangan:
+- blok/rol/markaz/parol o'zgarsa va logout'da TokenRevocation qatori
+  yoziladi; har worker uni AUTH_REVOCATION_SYNC_SECONDS ichida ko'radi
+  (crm_app/revocation.py), tekshiruvning o'zi xotirada;
+- har AUTH_CLAIMS_REVALIDATE_SECONDS da bir marta (har worker, har
+  foydalanuvchi) claim'lar (role, markaz, teacher_id) bitta so'rov bilan
+  bazadagi holat bilan solishtiriladi; tekshiruv vaqtlari
+  AUTH_CLAIMS_REVALIDATE_CACHE_SIZE ta yozuvli LRU'da saqlanadi.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Teacher, UserProfile
+from .revocation import revocations, revoke_user
+
+CLAIMS_VERSION = 1
+
+# (user_id, role, center_id, teacher_id) -> oxirgi tekshiruv (monotonic); LRU, cheklangan
+_revalidated = OrderedDict()
+_revalidated_lock = threading.Lock()
+
+
+def token_claims(user):
+    """Role/tenant claims of a user (two small queries, only at login)"""
+    profile = UserProfile.objects.filter(user=user).values(
+        'id', 'role', 'educational_center_id', 'is_blocked'
+    ).first() or {}
+    return {
+        'claims': CLAIMS_VERSION,
+        # iat butun sekund; bekor qilish belgisi bilan aniq solishtirish uchun
+        'issued_at': time.time(),
+        'username': user.username,
+        'profile_id': profile.get('id'),
+        'role': profile.get('role'),
+        'educational_center_id': profile.get('educational_center_id'),
+        'teacher_id': Teacher.objects.filter(user=user).values_list('id', flat=True).first(),
+        'is_blocked': bool(profile.get('is_blocked')),
+    }
+
+
+def issue_tokens(user):
+    """Refresh + access tokens carrying the claims (access claim'larni refresh'dan oladi)"""
+    refresh = RefreshToken.for_user(user)
+    claims = token_claims(user)
+    for name, value in claims.items():
+        refresh[name] = value
+    return refresh, claims
+
+
+def revoke_user_tokens(user_id):
+    """Reject every token of the user issued before now (blok, rol o'zgarishi, parol)"""
+    revoke_user(user_id)
+    with _revalidated_lock:
+        for key in [key for key in _revalidated if key[0] == user_id]:
+            del _revalidated[key]
+
+
+def claims_principal(token):
+    """Unsaved User with profile/teacher caches filled from the token - faqat o'qish uchun"""
+    # simplejwt user_id claim'ini satr sifatida yozadi ("1") - pk int bo'lsin
+    user_id = int(token[api_settings.USER_ID_CLAIM])
+    user = User(id=user_id, username=token.get('username', ''), is_active=True)
+    user._state.adding = False
+    user._state.db = 'default'
+
+    profile = None
+    if token.get('profile_id'):
+        profile = UserProfile(
+            id=token['profile_id'],
+            user_id=user_id,
+            role=token.get('role') or '',
+            educational_center_id=token.get('educational_center_id'),
+            is_blocked=bool(token.get('is_blocked')),
+        )
+        profile._state.adding = False
+        profile._state.fields_cache['user'] = user
+    teacher = None
+    if token.get('teacher_id'):
+        teacher = Teacher(id=token['teacher_id'], user_id=user_id)
+        teacher._state.adding = False
+        teacher._state.fields_cache['user'] = user
+
+    # None keshlansa user.profile / user.teacher so'rovsiz DoesNotExist beradi
+    user._state.fields_cache['profile'] = profile
+    user._state.fields_cache['teacher'] = teacher
+    user.token_claims = token
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that trusts role/tenant claims instead of loading User.
+
+    Claim'siz (eski) tokenlar uchun odatdagi bazadan o'qish ishlatiladi.
+    """
+
+    def get_user(self, validated_token):
+        if revocations.is_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        if validated_token.get('claims') != CLAIMS_VERSION:
+            return super().get_user(validated_token)
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        if validated_token.get('is_blocked'):
+            raise AuthenticationFailed('User is blocked', code='user_blocked')
+
+        self.revalidate(user_id, validated_token)
+        return claims_principal(validated_token)
+
+    def revalidate(self, user_id, token):
+        """Periodically compare the claims with the database (bitta so'rov)"""
+        # Kalit claim'lar bilan: yangi token tasdiqlangani eski rolli tokenni o'tkazib yubormaydi
+        key = (user_id, token.get('role'), token.get('educational_center_id'), token.get('teacher_id'))
+        now = time.monotonic()
+        checked_at = _revalidated.get(key)
+        if checked_at is not None and now - checked_at < settings.AUTH_CLAIMS_REVALIDATE_SECONDS:
+            return
+
+        state = User.objects.filter(pk=user_id).values(
+            'is_active', 'profile__role', 'profile__educational_center_id', 'profile__is_blocked', 'teacher__id',
+        ).first()
+        if state is None or not state['is_active']:
+            raise AuthenticationFailed('User not found or inactive', code='user_inactive')
+        if state['profile__is_blocked']:
+            revoke_user_tokens(user_id)
+            raise AuthenticationFailed('User is blocked', code='user_blocked')
+        if (state['profile__role'], state['profile__educational_center_id'], state['teacher__id']) != key[1:]:
+            raise AuthenticationFailed('Token claims are out of date, log in again', code='token_stale')
+
+        with _revalidated_lock:
+            _revalidated[key] = now
+            _revalidated.move_to_end(key)
+            while len(_revalidated) > settings.AUTH_CLAIMS_REVALIDATE_CACHE_SIZE:
+                _revalidated.popitem(last=False)
+
+
+try:
+    from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+except ImportError:  # drf-spectacular o'rnatilmagan
+    SimpleJWTScheme = None
+
+if SimpleJWTScheme is not None:
+    class ClaimsJWTScheme(SimpleJWTScheme):
+        """Swagger: the same Bearer JWT scheme as simplejwt's JWTAuthentication"""
+        target_class = 'crm_app.authentication.ClaimsJWTAuthentication'
@@ -0,0 +1,60 @@
+"""
+So'rov oqimidan tashqari ishlar uchun kichik fon pooli (har worker'da).
+
+Vazifa tranzaksiya commit bo'lgandan keyin navbatga qo'yiladi, shuning uchun
+fon oqimi so'rovda yaratilgan qatorlarni ko'radi. Har vazifa o'z DB
+ulanishini ishlatadi va oxirida yopadi. BACKGROUND_WORKERS = 0 bo'lsa
+vazifa darhol shu oqimda bajariladi (dev/test).
+
+run_every - management buyruqlarining --every rejimi uchun oddiy rejalashtiruvchi.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', getattr(func, '__name__', func))
+    finally:
+        close_old_connections()
+
+
+def submit(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the background pool once the current transaction commits"""
+    global _executor
+    if not settings.BACKGROUND_WORKERS:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_WORKERS, thread_name_prefix='crm-background')
+    transaction.on_commit(lambda: _executor.submit(_run, func, args, kwargs))
+
+
+def run_every(func, interval, stop=None, report=None):
+    """Call func() now and then every interval seconds until stop is set; report(result) after each run"""
+    stop = stop or threading.Event()
+    while True:
+        try:
+            result = func()
+            if report:
+                report(result)
+        except Exception:
+            logger.exception('Scheduled job %s failed', getattr(func, '__name__', func))
+        finally:
+            close_old_connections()
+        if stop.wait(interval):
+            return
@@ -0,0 +1,134 @@
+"""
+Ommaviy bildirishnomalar (guruh, filial, markaz yoki rol bo'yicha).
+
+Qabul qiluvchilar bitta so'rov bilan (pk__in subquery'lar) aniqlanadi,
+Notification qatorlari BROADCAST_CHUNK_SIZE bo'laklarda INSERT ... SELECT
+bilan yoziladi; har bo'lakdan keyin BroadcastJob.sent oshiriladi (progress).
+Yuborish so'rov oqimida emas - crm_app.background pooli orqali.
+"""
+
+import logging
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import BooleanField, CharField, DateTimeField, F, IntegerField, Q, TextField, Value
+from django.utils import timezone
+
+from . import background
+from .events import publish_many
+from .models import BroadcastJob, Group, Notification, Student, Teacher
+from .notifications import bump_unread_many
+
+logger = logging.getLogger(__name__)
+
+
+def broadcast_recipients(job):
+    """Active, not blocked users targeted by the job (faqat job markazi ichida)"""
+    center_id = job.educational_center_id
+    students = Student.objects.filter(user__isnull=False, branch__educational_center_id=center_id)
+    teachers = Teacher.objects.filter(branch__educational_center_id=center_id)
+
+    if job.target_type == 'group':
+        target = Q(pk__in=students.filter(group_id=job.target_id).values('user_id')) | Q(
+            pk__in=Group.objects.filter(pk=job.target_id, educational_center_id=center_id).values('teacher__user_id')
+        )
+    elif job.target_type == 'branch':
+        target = Q(pk__in=students.filter(branch_id=job.target_id).values('user_id')) | Q(
+            pk__in=teachers.filter(branch_id=job.target_id).values('user_id')
+        )
+    elif job.target_type == 'center':
+        target = (
+            Q(profile__educational_center_id=center_id)
+            | Q(pk__in=students.values('user_id'))
+            | Q(pk__in=teachers.values('user_id'))
+        )
+    else:
+        target = Q(profile__role=job.role, profile__educational_center_id=center_id)
+
+    return User.objects.filter(target, is_active=True).exclude(profile__is_blocked=True)
+
+
+def _insert_notifications(job, recipients, created_at):
+    """
+    INSERT INTO notification ... SELECT over the recipients query; returns the row count.
+
+    Barcha ustunlar annotatsiya: doimiy qiymatlar har qator uchun Python'da
+    tayyorlanmaydi, qatorlarni bazaning o'zi yasaydi.
+    """
+    rows = recipients.order_by().annotate(
+        n_user=F('pk'),
+        n_type=Value(job.notification_type, output_field=CharField()),
+        n_title=Value(job.title, output_field=CharField()),
+        n_message=Value(job.message, output_field=TextField()),
+        n_is_read=Value(False, output_field=BooleanField()),
+        n_created_at=Value(created_at, output_field=DateTimeField()),
+        n_broadcast=Value(job.pk, output_field=IntegerField()),
+    ).values_list('n_user', 'n_type', 'n_title', 'n_message', 'n_is_read', 'n_created_at', 'n_broadcast')
+    sql, params = rows.query.sql_with_params()
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(Notification._meta.get_field(name).column)
+        for name in ('user', 'notification_type', 'title', 'message', 'is_read', 'created_at', 'broadcast')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(Notification._meta.db_table)} ({columns}) {sql}', params)
+        return cursor.rowcount
+
+
+def deliver_broadcast(job_id, resume=False):
+    """
+    Fan the job out into Notification rows; returns the number written.
+
+    Qabul qiluvchi id'lari bitta so'rov bilan olinadi (total va bo'lak
+    chegaralari uchun), har bo'lak - id oralig'i bo'yicha bitta
+    INSERT ... SELECT. resume=True - to'xtab qolgan (Running/Failed) ishni
+    davom ettiradi: shu broadcast bildirishnomasi bor userlar o'tkazib yuboriladi.
+    """
+    claimable = ['Pending', 'Running', 'Failed'] if resume else ['Pending']
+    if not BroadcastJob.objects.filter(pk=job_id, status__in=claimable).update(
+        status='Running', started_at=timezone.now(), error='',
+    ):
+        return 0
+    job = BroadcastJob.objects.get(pk=job_id)
+
+    written = 0
+    try:
+        recipients = broadcast_recipients(job)
+        recipient_ids = list(recipients.order_by('pk').values_list('pk', flat=True))
+        delivered = Notification.objects.filter(broadcast=job).count() if resume else 0
+        if delivered:
+            recipients = recipients.exclude(pk__in=Notification.objects.filter(broadcast=job).values('user_id'))
+        BroadcastJob.objects.filter(pk=job.pk).update(total=len(recipient_ids), sent=delivered)
+
+        created_at = timezone.now()
+        chunk_size = settings.BROADCAST_CHUNK_SIZE
+        for start in range(0, len(recipient_ids), chunk_size):
+            chunk = recipient_ids[start:start + chunk_size]
+            chunk_recipients = recipients.filter(pk__gte=chunk[0], pk__lte=chunk[-1])
+            with transaction.atomic():
+                count = _insert_notifications(job, chunk_recipients, created_at)
+                # Faqat shu ishga tushirishda yozilgan qatorlar (created_at bir xil) - resume'da ikki marta sanalmaydi
+                bump_unread_many(Notification.objects.filter(
+                    broadcast_id=job.pk, user_id__gte=chunk[0], user_id__lte=chunk[-1], created_at=created_at,
+                ).values('user_id'))
+                BroadcastJob.objects.filter(pk=job.pk).update(sent=F('sent') + count)
+            # Bo'lakka bitta hodisa: har qabul qiluvchining user: kanaliga
+            publish_many([([f'user:{user_id}' for user_id in chunk], 'notification', {
+                'broadcast': job.pk, 'notification_type': job.notification_type,
+                'title': job.title, 'message': job.message, 'created_at': created_at,
+            })])
+            written += count
+    except Exception as exc:
+        logger.exception('Broadcast %s failed', job_id)
+        BroadcastJob.objects.filter(pk=job_id).update(status='Failed', error=str(exc)[:1000], finished_at=timezone.now())
+        return written
+
+    BroadcastJob.objects.filter(pk=job.pk).update(status='Completed', finished_at=timezone.now())
+    return written
+
+
+def start_broadcast(job):
+    """Queue delivery after the job row is committed"""
+    background.submit(deliver_broadcast, job.pk)
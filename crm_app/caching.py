@@ -0,0 +1,75 @@
+"""
+Kesh yordamchilari.
+
+Hisobotlar (statistika, dashboard va h.k.) kalitlari "versiya" bilan quriladi:
+ma'lumot o'zgarganda versiya oshiriladi va eski kalitlar o'z-o'zidan eskiradi.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(namespace):
+    return f"ver:{namespace}"
+
+
+def get_version(namespace):
+    """Return the current version number for a cache namespace"""
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), 1, timeout=None)
+        version = cache.get(_version_key(namespace), 1)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every key built with versioned_key() for this namespace"""
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), 2, timeout=None)
+
+
+def versioned_key(namespace, *parts):
+    """Build a cache key that changes whenever bump_version(namespace) is called"""
+    suffix = ':'.join(str(p) for p in parts)
+    return f"{namespace}:v{get_version(namespace)}:{suffix}"
+
+
+def single_flight(key, compute, timeout, stale_timeout=300, lock_timeout=30, wait=5.0):
+    """
+    Cache compute() under key, recomputing it in only one request at a time.
+
+    Muddat tugaganda birinchi so'rov qulfni (cache.add) oladi va qiymatni
+    qayta hisoblaydi; qolgan so'rovlar shu vaqt ichida eski qiymatni oladi,
+    shuning uchun bir vaqtda kelgan so'rovlar bazani "bosib" ketmaydi.
+    """
+    entry = cache.get(key)
+    if entry is not None and entry['expires_at'] > time.time():
+        return entry['value']
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = compute()
+            cache.set(
+                key,
+                {'value': value, 'expires_at': time.time() + timeout},
+                timeout=timeout + stale_timeout,
+            )
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        return entry['value']
+
+    # Kesh bo'sh va boshqa so'rov hisoblayapti: natijani qisqa kutamiz
+    deadline = time.time() + wait
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+    return compute()
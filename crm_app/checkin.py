@@ -0,0 +1,160 @@
+"""
+QR orqali darsga o'zi belgilanish (check-in).
+
+Token dars id va boshlanish vaqtini imzolaydi (TimestampSigner), shuning
+uchun tekshirish bazaga murojaat qilmaydi. Qabul qilingan check-in'lar
+protsess ichidagi buferga yoziladi va fon oqimi ularni Attendance'ga
+bitta bulk insert bilan to'playdi (har gunicorn worker o'z buferiga ega).
+Worker to'xtaganda bufer atexit'da yoziladi; SIGKILL/OOM'dagi yo'qotish
+oynasi settings.CHECKIN_FLUSH_INTERVAL yonida tasvirlangan.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .events import lesson_channels, publish_many
+from .models import Attendance, Lesson, Student
+
+logger = logging.getLogger(__name__)
+
+CHECKIN_SALT = 'crm_app.lesson-checkin'
+
+
+def checkin_token(lesson):
+    """Short-lived token shown as a QR code in the classroom"""
+    start = timezone.make_aware(datetime.combine(lesson.date, lesson.start_time))
+    return signing.TimestampSigner(salt=CHECKIN_SALT).sign(f'{lesson.id}.{int(start.timestamp())}')
+
+
+def read_checkin_token(token):
+    """(lesson_id, lesson start as epoch seconds); signing.BadSignature if invalid or expired"""
+    value = signing.TimestampSigner(salt=CHECKIN_SALT).unsign(
+        str(token or ''), max_age=settings.CHECKIN_TOKEN_MAX_AGE
+    )
+    lesson_id, start = value.split('.')
+    return int(lesson_id), int(start)
+
+
+def checkin_status(start, now=None):
+    """Present until CHECKIN_LATE_MINUTES after the lesson start, Late afterwards"""
+    now = time.time() if now is None else now
+    return 'Present' if now <= start + settings.CHECKIN_LATE_MINUTES * 60 else 'Late'
+
+
+def write_checkins(checkins):
+    """
+    Insert buffered check-ins {(lesson_id, student_id): status} into Attendance.
+
+    Faqat mavjud darslar va shu dars guruhidagi o'quvchilar yoziladi.
+    Allaqachon belgilangan davomat (o'qituvchi qo'ygan Absent/Excused yoki
+    oldingi skan) o'zgartirilmaydi - check-in faqat yangi qator qo'shadi.
+    """
+    if not checkins:
+        return 0
+    lessons = {
+        lesson_id: (group_id, center_id, teacher_id)
+        for lesson_id, group_id, center_id, teacher_id in Lesson.objects.filter(
+            pk__in={lesson_id for lesson_id, _ in checkins}
+        ).values_list('id', 'group_id', 'group__educational_center_id', 'teacher_id')
+    }
+    student_groups = dict(
+        Student.objects.filter(pk__in={student_id for _, student_id in checkins}).values_list('id', 'group_id')
+    )
+    existing = set(
+        Attendance.objects.filter(lesson_id__in=lessons, student_id__in=student_groups).values_list(
+            'lesson_id', 'student_id'
+        )
+    )
+    rows = [
+        # Belgilagan - darsning o'qituvchisi (QR uning darsida ko'rsatiladi)
+        Attendance(lesson_id=lesson_id, student_id=student_id, status=status, marked_by_id=lessons[lesson_id][2])
+        for (lesson_id, student_id), status in checkins.items()
+        if lesson_id in lessons and student_groups.get(student_id) == lessons[lesson_id][0]
+        and (lesson_id, student_id) not in existing
+    ]
+    if rows:
+        # ignore_conflicts: shu orada o'qituvchi belgilagan bo'lsa uning belgisi qoladi
+        Attendance.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+        # bulk_create signal yubormaydi - har dars uchun bitta attendance_marked
+        marked = {}
+        for row in rows:
+            marked.setdefault(row.lesson_id, []).append(row.student_id)
+        publish_many([
+            (lesson_channels(*lessons[lesson_id][1:]), 'attendance_marked', {'lesson': lesson_id, 'students': students})
+            for lesson_id, students in marked.items()
+        ])
+    return len(rows)
+
+
+class CheckinBuffer:
+    """Thread-safe in-memory check-in buffer flushed by a daemon thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, lesson_id, student_id, status):
+        if not settings.CHECKIN_FLUSH_INTERVAL:
+            # Sinxron rejim (dev/test): darhol yoziladi
+            write_checkins({(lesson_id, student_id): status})
+            return
+        with self._lock:
+            # Bir o'quvchining takroriy skanerlari - birinchisi qoladi
+            self._items.setdefault((lesson_id, student_id), status)
+            size = len(self._items)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='checkin-flush', daemon=True)
+                self._thread.start()
+        if size >= settings.CHECKIN_FLUSH_SIZE:
+            self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            items, self._items = self._items, {}
+        if not items:
+            return 0
+        try:
+            return write_checkins(items)
+        except Exception:
+            # Baza vaqtincha ishlamasa yozuvlar yo'qolmasin - keyingi flush'da qayta
+            logger.exception('Check-in flush failed, %s records kept for retry', len(items))
+            with self._lock:
+                for key, status in items.items():
+                    self._items.setdefault(key, status)
+            return 0
+
+    def pending(self):
+        with self._lock:
+            return len(self._items)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.CHECKIN_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+
+
+buffer = CheckinBuffer()
+atexit.register(buffer.flush)
+
+
+def check_in(lesson_id, start, student_id):
+    """Queue the check-in of a verified token (read_checkin_token); returns the status"""
+    status = checkin_status(start)
+    buffer.add(lesson_id, student_id, status)
+    return status
+
+
+def token_expires_at():
+    return timezone.now() + timedelta(seconds=settings.CHECKIN_TOKEN_MAX_AGE)
@@ -0,0 +1,90 @@
+"""
+Direktor bosh sahifasi uchun KPI'lar.
+
+Barcha ko'rsatkichlar bitta javobda qaytariladi; har bir jadval uchun
+bittadan shartli agregat so'rov ishlatiladi.
+"""
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .caching import single_flight
+from .models import Branch, Group, Lead, Lesson, Payment, Payroll, Student, Teacher
+
+
+def compute_center_dashboard(center_id):
+    """Compute all KPIs of one educational center"""
+    today = timezone.localdate()
+    month_start = today.replace(day=1)
+
+    branches = Branch.objects.filter(educational_center_id=center_id).aggregate(
+        total=Count('id'),
+        open=Count('id', filter=Q(status='Open')),
+    )
+    groups = Group.objects.filter(educational_center_id=center_id).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='Active')),
+        capacity=Sum('capacity', filter=Q(status='Active')),
+    )
+    students = Student.objects.filter(branch__educational_center_id=center_id).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='Active')),
+        inactive=Count('id', filter=Q(status='Inactive')),
+        blocked=Count('id', filter=Q(status='Blocked')),
+        without_group=Count('id', filter=Q(group__isnull=True, status='Active')),
+        new_this_month=Count('id', filter=Q(enrollment_date__gte=month_start)),
+    )
+    teachers = Teacher.objects.filter(branch__educational_center_id=center_id).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='Active')),
+    )
+    payments = Payment.objects.filter(student__branch__educational_center_id=center_id).aggregate(
+        month_total=Sum('amount', filter=Q(payment_date__gte=month_start)),
+        month_count=Count('id', filter=Q(payment_date__gte=month_start)),
+        today_total=Sum('amount', filter=Q(payment_date=today)),
+        today_count=Count('id', filter=Q(payment_date=today)),
+    )
+    leads_by_status = dict(
+        Lead.objects.filter(branch__educational_center_id=center_id)
+        .values_list('status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    lessons_today = Lesson.objects.filter(group__educational_center_id=center_id, date=today).aggregate(
+        total=Count('id'),
+        cancelled=Count('id', filter=Q(is_cancelled=True)),
+        online=Count('id', filter=~Q(online_link='')),
+    )
+    unpaid_payroll = Payroll.objects.filter(
+        teacher__branch__educational_center_id=center_id, is_paid=False
+    ).aggregate(
+        count=Count('id'),
+        total=Sum('total_salary'),
+    )
+
+    return {
+        'center': center_id,
+        'date': today,
+        'generated_at': timezone.now(),
+        'branches': branches,
+        'groups': groups,
+        'students': students,
+        'teachers': teachers,
+        'payments': payments,
+        'leads': {
+            'total': sum(leads_by_status.values()),
+            'by_status': leads_by_status,
+        },
+        'lessons_today': lessons_today,
+        'unpaid_payroll': unpaid_payroll,
+    }
+
+
+def center_dashboard(center_id):
+    """Briefly cached dashboard; only one request recomputes after expiry"""
+    return single_flight(
+        f'dashboard:{center_id}',
+        lambda: compute_center_dashboard(center_id),
+        timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 30),
+    )
@@ -0,0 +1,231 @@
+"""
+Guruhga yozilish: sig'im nazorati va navbat (waitlist).
+
+Group.enrolled_count denormallashtirilgan. Joy olish shartli UPDATE bilan
+bajariladi (enrolled_count + n <= capacity): ikki parallel so'rov oxirgi
+joyni bir vaqtda ololmaydi va har so'rovda COUNT(*) kerak bo'lmaydi.
+Joy bo'shaganda navbatdagi birinchi o'quvchi avtomatik o'tkaziladi.
+
+Qulflash tartibi hamma joyda bir xil (deadlock yo'q): avval guruhlar (pk
+bo'yicha), keyin o'quvchilar (pk bo'yicha), oxirida navbat qatorlari.
+O'quvchining joriy guruhi qulfsiz o'qiladi; qulflashgacha o'zgargan bo'lsa
+tranzaksiya qaytadan boshlanadi.
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Group, GroupWaitlist, Student
+
+
+def take_seats(group_id, count=1):
+    """Atomically reserve count seats; False if the group does not have them"""
+    return bool(
+        Group.objects.filter(pk=group_id, enrolled_count__lte=F('capacity') - count)
+        .update(enrolled_count=F('enrolled_count') + count)
+    )
+
+
+def release_seats(group_id, count=1):
+    Group.objects.filter(pk=group_id).update(enrolled_count=Greatest(F('enrolled_count') - count, 0))
+
+
+def _move(student, group_id):
+    student.group_id = group_id
+    # Hisoblagichni shu modul boshqaradi - signal qayta o'zgartirmasin
+    student._enrollment_managed = True
+    student.save(update_fields=['group', 'updated_at'])
+
+
+def waitlist_position(group_id, student_id):
+    entry = GroupWaitlist.objects.filter(group_id=group_id, student_id=student_id).first()
+    if entry is None:
+        return None
+    return GroupWaitlist.objects.filter(group_id=group_id, created_at__lte=entry.created_at, id__lte=entry.id).count()
+
+
+def _lock_groups(group_ids):
+    """Lock group rows in pk order (enrolled_count shu qulf ostida o'zgaradi)"""
+    group_ids = sorted({pk for pk in group_ids if pk})
+    return list(Group.objects.select_for_update().filter(pk__in=group_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def _lock_student(student_id, *group_ids):
+    """
+    Lock the given groups plus the student's current group, then the student.
+
+    O'quvchi guruhi qulflashgacha o'zgargan bo'lsa None - chaqiruvchi
+    tranzaksiyani qaytadan boshlaydi (tartibni buzib qulf olmaslik uchun).
+    """
+    current = Student.objects.filter(pk=student_id).values_list('group_id', flat=True).get()
+    _lock_groups({*group_ids, current})
+    student = Student.objects.select_for_update().get(pk=student_id)
+    return student if student.group_id == current else None
+
+
+def enroll(student, group, waitlist=False):
+    """
+    Put a student into a group (transfer if already in another one).
+
+    Natija status'i: enrolled, already_enrolled, waitlisted yoki full.
+    """
+    student_id = student.pk
+    while True:
+        with transaction.atomic():
+            student = _lock_student(student_id, group.id)
+            if student is None:
+                continue
+            if student.group_id == group.id:
+                return {'status': 'already_enrolled', 'student': student.id, 'group': group.id}
+
+            old_group_id = student.group_id
+            if not take_seats(group.id):
+                if not waitlist:
+                    return {'status': 'full', 'student': student.id, 'group': group.id}
+                GroupWaitlist.objects.get_or_create(group=group, student=student)
+                return {
+                    'status': 'waitlisted',
+                    'student': student.id,
+                    'group': group.id,
+                    'position': waitlist_position(group.id, student.id),
+                }
+
+            _move(student, group.id)
+            GroupWaitlist.objects.filter(group=group, student=student).delete()
+            if old_group_id:
+                release_seats(old_group_id)
+        break
+
+    if old_group_id:
+        promote_waitlist(old_group_id)
+    return {'status': 'enrolled', 'student': student.id, 'group': group.id, 'from_group': old_group_id}
+
+
+def leave_group(student):
+    """Remove a student from their group and give the seat to the waitlist"""
+    student_id = student.pk
+    while True:
+        with transaction.atomic():
+            student = _lock_student(student_id)
+            if student is None:
+                continue
+            old_group_id = student.group_id
+            if not old_group_id:
+                return None
+            _move(student, None)
+            release_seats(old_group_id)
+        break
+    promote_waitlist(old_group_id)
+    return old_group_id
+
+
+def promote_waitlist(group_id):
+    """
+    Fill free seats of a group from its FIFO waitlist.
+
+    O'tkazilgan o'quvchi boshqa guruhdan kelsa, o'sha guruhda ham joy bo'shaydi -
+    u ham navbat bo'yicha to'ldiriladi.
+    """
+    promoted = []
+    pending = [group_id]
+    while pending:
+        current = pending.pop()
+        while True:
+            head = (
+                GroupWaitlist.objects.filter(group_id=current)
+                .order_by('created_at', 'id')
+                .values_list('id', 'student_id')
+                .first()
+            )
+            if head is None:
+                break
+            with transaction.atomic():
+                # Guruhlar -> o'quvchi -> navbat qatori; navbat boshi o'zgargan bo'lsa qaytadan
+                student = _lock_student(head[1], current)
+                entry = GroupWaitlist.objects.select_for_update().filter(group_id=current).order_by(
+                    'created_at', 'id',
+                ).first()
+                if student is None or entry is None or entry.pk != head[0]:
+                    continue
+                if not take_seats(current):
+                    break
+                old_group_id = student.group_id
+                _move(student, current)
+                entry.delete()
+                if old_group_id and old_group_id != current:
+                    release_seats(old_group_id)
+                    pending.append(old_group_id)
+            promoted.append({'student': student.id, 'group': current, 'from_group': old_group_id})
+    return promoted
+
+
+def bulk_enroll(group, student_ids, waitlist=False):
+    """
+    Enroll/transfer a list of students into one group in a single transaction.
+
+    Guruh qatori qulflanadi, bo'sh joylar soni bir marta hisoblanadi va
+    ro'yxat tartibida shuncha o'quvchi bitta UPDATE bilan ko'chiriladi;
+    qolganlari (waitlist=True bo'lsa) navbatga qo'yiladi.
+    """
+    order = {student_id: index for index, student_id in enumerate(dict.fromkeys(student_ids))}
+    while True:
+        with transaction.atomic():
+            # enroll bilan bir xil tartib: maqsad va manba guruhlar (pk), keyin o'quvchilar (pk)
+            current = dict(Student.objects.filter(pk__in=order.keys()).values_list('id', 'group_id'))
+            _lock_groups({group.pk, *current.values()})
+            locked = list(Student.objects.select_for_update().filter(pk__in=order.keys()).order_by('pk'))
+            if any(s.group_id != current.get(s.pk) for s in locked):
+                continue
+            group = Group.objects.get(pk=group.pk)
+            students = sorted(locked, key=lambda s: order[s.pk])
+            already = [s.pk for s in students if s.group_id == group.id]
+            candidates = [s for s in students if s.group_id != group.id]
+
+            free = max(group.capacity - group.enrolled_count, 0)
+            moving, rest = candidates[:free], candidates[free:]
+            sources = Counter(s.group_id for s in moving if s.group_id)
+
+            if moving:
+                moved_ids = [s.pk for s in moving]
+                Student.objects.filter(pk__in=moved_ids).update(group=group, updated_at=timezone.now())
+                Group.objects.filter(pk=group.pk).update(enrolled_count=F('enrolled_count') + len(moving))
+                for source_id, count in sources.items():
+                    release_seats(source_id, count)
+                GroupWaitlist.objects.filter(group=group, student_id__in=moved_ids).delete()
+
+            waitlisted = []
+            if waitlist and rest:
+                queued = set(
+                    GroupWaitlist.objects.filter(group=group, student__in=rest).values_list('student_id', flat=True)
+                )
+                GroupWaitlist.objects.bulk_create([
+                    GroupWaitlist(group=group, student=s) for s in rest if s.pk not in queued
+                ])
+                waitlisted = [s.pk for s in rest]
+        break
+
+    for source_id in sources:
+        promote_waitlist(source_id)
+
+    found = {s.pk for s in students}
+    return {
+        'group': group.id,
+        'enrolled': [s.pk for s in moving],
+        'already_enrolled': already,
+        'waitlisted': waitlisted,
+        'full': [] if waitlist else [s.pk for s in rest],
+        'not_found': [student_id for student_id in order if student_id not in found],
+    }
+
+
+def sync_group_change(old_group_id, new_group_id):
+    """Keep enrolled_count right for group changes made outside this module (admin, serializers)"""
+    if new_group_id:
+        Group.objects.filter(pk=new_group_id).update(enrolled_count=F('enrolled_count') + 1)
+    if old_group_id:
+        release_seats(old_group_id)
+        promote_waitlist(old_group_id)
@@ -0,0 +1,212 @@
+"""
+Real-time hodisalar uchun pub/sub (Server-Sent Events: crm_app/sse.py).
+
+Hodisa kanal(lar)ga yuboriladi: user:<id>, center:<id>, teacher:<id>,
+group:<id>. Protsess ichidagi LocalEventBus obunachilar navbatiga
+to'g'ridan-to'g'ri qo'yadi (publish istalgan oqimdan chaqirilishi mumkin,
+navbat esa event loop'da). REDIS_URL berilsa RedisEventBus ishlatiladi:
+publish Redis'ga, har protsessda bitta tinglovchi uni mahalliy
+obunachilarga tarqatadi - WSGI workerlar yuborgan hodisalar ASGI
+protsessiga ham yetadi. Boshqa broker: EVENT_BUS sozlamasi.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One connection's queue; overflowed=True means events were dropped (klient qayta yuklasin)"""
+
+    def __init__(self, channels, loop, maxsize):
+        self.channels = tuple(channels)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver(self, event):
+        # publish boshqa oqimdan kelishi mumkin - navbatga faqat o'z loop'i yozadi
+        self.loop.call_soon_threadsafe(self._put, event)
+
+
+class LocalEventBus:
+    """In-process pub/sub: channel -> set of subscriptions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, asyncio.get_running_loop(), settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def has_subscribers(self, channel):
+        return channel in self._channels
+
+    def dispatch(self, channels, event):
+        """Hand an already-encoded event to local subscribers of any of the channels (bir marta)"""
+        with self._lock:
+            targets = set()
+            for channel in channels:
+                targets.update(self._channels.get(channel, ()))
+        for subscription in targets:
+            subscription.deliver(event)
+
+    def encode(self, event_type, data):
+        return {'id': next(self._ids), 'type': event_type, 'data': json.dumps(data, cls=DjangoJSONEncoder)}
+
+    def publish(self, channels, event_type, data):
+        self.dispatch(channels, self.encode(event_type, data))
+
+    def publish_many(self, items):
+        """[(channels, event_type, data), ...] - broadcast bo'laklari uchun"""
+        for channels, event_type, data in items:
+            if any(self.has_subscribers(channel) for channel in channels):
+                self.publish(channels, event_type, data)
+
+
+class RedisEventBus(LocalEventBus):
+    """Shared broker: PUBLISH to Redis, one pattern subscriber per process re-dispatches locally"""
+
+    prefix = 'crm-events:'
+
+    def __init__(self, url=None):
+        super().__init__()
+        import redis  # REDIS_URL bilan kesh uchun ham kerak
+
+        self.url = url or settings.REDIS_URL
+        self._redis = redis.Redis.from_url(self.url)
+        self._listener = None
+
+    def publish(self, channels, event_type, data):
+        self.publish_many([(channels, event_type, data)])
+
+    def publish_many(self, items):
+        # Bitta Redis kanali: tinglovchi hodisa kanallarini o'zi tekshiradi
+        with self._redis.pipeline(transaction=False) as pipe:
+            for channels, event_type, data in items:
+                pipe.publish(f'{self.prefix}all', json.dumps({
+                    'channels': list(channels), 'type': event_type,
+                    'data': json.dumps(data, cls=DjangoJSONEncoder),
+                }))
+            pipe.execute()
+
+    def subscribe(self, channels):
+        subscription = super().subscribe(channels)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        while True:
+            try:
+                client = aioredis.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(f'{self.prefix}all')
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        payload = json.loads(message['data'])
+                        self.dispatch(payload['channels'], {
+                            'id': next(self._ids), 'type': payload['type'], 'data': payload['data'],
+                        })
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Event listener lost the Redis connection, reconnecting')
+                await asyncio.sleep(1)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                path = settings.EVENT_BUS or (
+                    'crm_app.events.RedisEventBus' if settings.REDIS_URL else 'crm_app.events.LocalEventBus'
+                )
+                _bus = import_string(path)()
+    return _bus
+
+
+def require_shared_bus():
+    """Events-only process: publishers are other processes, an in-process bus would deliver nothing"""
+    if type(get_bus()) is LocalEventBus:
+        raise ImproperlyConfigured(
+            'WEB_ROLE=events needs a shared event bus: set REDIS_URL (or EVENT_BUS) for both the API and the events service'
+        )
+
+
+def publish(channels, event_type, data):
+    """Publish an event; a broker failure never breaks the request that caused it"""
+    try:
+        get_bus().publish(channels, event_type, data)
+    except Exception:
+        logger.exception('Failed to publish %s event', event_type)
+
+
+def publish_many(items):
+    try:
+        get_bus().publish_many(items)
+    except Exception:
+        logger.exception('Failed to publish %s events', len(items))
+
+
+def publish_on_commit(channels, event_type, data):
+    """Publish once the surrounding transaction commits (rollback bo'lsa hodisa yo'q)"""
+    transaction.on_commit(lambda: publish(channels, event_type, data))
+
+
+def connection_channels(user_id, role, center_id, teacher_id=None, group_id=None):
+    """Channels a connection may listen to (tenant chegarasi shu yerda)"""
+    channels = [f'user:{user_id}']
+    if role in ('Director', 'Manager', 'Admin') and center_id:
+        channels.append(f'center:{center_id}')
+    if teacher_id:
+        channels.append(f'teacher:{teacher_id}')
+    if group_id:
+        channels.append(f'group:{group_id}')
+    return channels
+
+
+def lesson_channels(center_id, teacher_id):
+    """Dars hodisalari: markaz xodimlari va darsning o'qituvchisi"""
+    channels = [f'center:{center_id}']
+    if teacher_id:
+        channels.append(f'teacher:{teacher_id}')
+    return channels
@@ -0,0 +1,153 @@
+"""
+Dars jadvali uchun iCalendar (.ics) lentalari.
+
+Lenta qatorma-qator generator sifatida yoziladi (StreamingHttpResponse),
+shuning uchun katta jadval ham xotirada to'liq yig'ilmaydi. ETag lenta
+oynasidagi darslar soni/oxirgi o'zgarishidan quriladi: o'zgarish bo'lmasa
+kalendar ilovasi 304 oladi va tana umuman hisoblanmaydi.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .caching import get_version
+from .models import Group, Lesson, Room, Teacher
+from .scheduling import LAZY_SCHEDULES_NAMESPACE, lazy_schedules, virtual_lessons
+
+FEED_KINDS = {
+    'teacher': (Teacher, 'teacher_id'),
+    'group': (Group, 'group_id'),
+    'room': (Room, 'room_id'),
+}
+FEED_SALT = 'crm_app.calendar-feed'
+
+
+def feed_token(kind, pk):
+    """Signed token that lets a calendar app read one feed without a JWT"""
+    return signing.Signer(salt=FEED_SALT).sign(f'{kind}:{pk}').split(':')[-1]
+
+
+def check_feed_token(kind, pk, token):
+    try:
+        signing.Signer(salt=FEED_SALT).unsign(f'{kind}:{pk}:{token or ""}')
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def feed_window():
+    today = timezone.localdate()
+    return (
+        today - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS),
+        today + timedelta(days=settings.CALENDAR_FEED_FUTURE_DAYS),
+    )
+
+
+def feed_lessons(kind, pk, date_from, date_to):
+    _, field = FEED_KINDS[kind]
+    return Lesson.objects.filter(**{field: pk}, date__gte=date_from, date__lte=date_to)
+
+
+def feed_schedules(kind, pk):
+    return lazy_schedules(**{FEED_KINDS[kind][1]: pk})
+
+
+def feed_etag(kind, pk):
+    """ETag of a feed: one aggregate over the (resource, date) index + lazy schedule version"""
+    date_from, date_to = feed_window()
+    state = feed_lessons(kind, pk, date_from, date_to).aggregate(count=Count('id'), changed=Max('updated_at'))
+    raw = f"{kind}:{pk}:{date_from}:{state['count']}:{state['changed']}:{get_version(LAZY_SCHEDULES_NAMESPACE)}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _escape(value):
+    return (
+        str(value or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    """RFC 5545: 75 oktetdan uzun qatorlar bo'shliq bilan davom ettiriladi"""
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # UTF-8 belgini o'rtasidan bo'lmaslik uchun
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode())
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(day, time):
+    moment = timezone.make_aware(datetime.combine(day, time))
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(lesson, stamp):
+    # UID (guruh, sana, vaqt)dan: virtual dars saqlanganda ham o'zgarmaydi
+    uid = f"{lesson['group']}-{lesson['date']:%Y%m%d}-{lesson['start_time']:%H%M}@crm"
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{stamp}',
+        f"DTSTART:{_utc(lesson['date'], lesson['start_time'])}",
+        f"DTEND:{_utc(lesson['date'], lesson['end_time'])}",
+        f"SUMMARY:{_escape(lesson['group_name'])}",
+    ]
+    if lesson['room_name']:
+        lines.append(f"LOCATION:{_escape(lesson['room_name'])}")
+    description = ', '.join(filter(None, [lesson['teacher_name'], lesson['online_link']]))
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    if lesson['online_link']:
+        lines.append(f"URL:{lesson['online_link']}")
+    if lesson['is_cancelled']:
+        lines.append('STATUS:CANCELLED')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def stream_feed(kind, pk, name):
+    """Yield the .ics document of one teacher/group/room chunk by chunk"""
+    date_from, date_to = feed_window()
+    stamp = timezone.now().astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Educational Center CRM//Schedule//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ])
+
+    rows = feed_lessons(kind, pk, date_from, date_to).values(
+        'group', 'date', 'start_time', 'end_time', 'online_link', 'is_cancelled',
+        'group__name', 'room__name', 'teacher__user__first_name', 'teacher__user__last_name',
+    ).order_by('date', 'start_time')
+    for row in rows.iterator(chunk_size=500):
+        yield _event({
+            **row,
+            'group_name': row['group__name'],
+            'room_name': row['room__name'],
+            'teacher_name': ' '.join(filter(None, [
+                row['teacher__user__first_name'], row['teacher__user__last_name'],
+            ])),
+        }, stamp)
+
+    for lesson in virtual_lessons(date_from, date_to, feed_schedules(kind, pk)):
+        yield _event(lesson, stamp)
+
+    yield 'END:VCALENDAR\r\n'
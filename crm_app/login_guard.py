@@ -0,0 +1,132 @@
+"""
+Login himoyasi: parol tekshiruvi uchun chegaralangan pool va brute-force cheklovi.
+
+PBKDF2 xeshi (hashlib, GIL'ni qo'yib yuboradi) LOGIN_HASH_WORKERS ta oqimli
+poolda bajariladi: login to'lqini bir vaqtda shuncha yadrodan ortiq band
+qilmaydi, qolgan so'rovlar (gthread worker) navbatsiz ishlaydi. Navbat
+LOGIN_HASH_QUEUE dan oshsa darhol 503 qaytadi.
+
+Muvaffaqiyatsiz urinishlar username va IP bo'yicha umumiy keshda (Redis
+bo'lsa barcha workerlar uchun bitta) sanaladi; limitdan oshgan so'rov
+xeshlashgacha 429 oladi.
+"""
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core import checks
+from django.core.cache import cache
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+
+_executor = ThreadPoolExecutor(max_workers=settings.LOGIN_HASH_WORKERS, thread_name_prefix='login-hash')
+# Bajarilayotgan + navbatdagi tekshiruvlar soni shu bilan chegaralanadi
+_slots = threading.BoundedSemaphore(settings.LOGIN_HASH_WORKERS + settings.LOGIN_HASH_QUEUE)
+
+
+class LoginUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'login_busy'
+
+    def __init__(self, wait=1):
+        super().__init__()
+        self.wait = wait
+
+
+def client_ip(request):
+    """
+    Address seen by the outermost trusted proxy, aks holda REMOTE_ADDR.
+
+    Har proxy X-Forwarded-For oxiriga o'zi ko'rgan manzilni qo'shadi, shuning
+    uchun o'ngdan TRUSTED_PROXY_HOPS-chi qiymat olinadi; undan chapdagilarni
+    klient o'zi yozishi mumkin (cheklovni aylanib o'tish uchun).
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+    if hops > 0 and len(forwarded) >= hops:
+        return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+@checks.register(checks.Tags.security)
+def check_shared_failure_cache(app_configs, **kwargs):
+    """Locmem'da har gunicorn worker o'z hisobini yuritadi - limit workerlar soniga ko'payadi"""
+    if settings.DEBUG or settings.REDIS_URL:
+        return []
+    return [checks.Warning(
+        'Login failure counters use the per-process cache; with several workers the lockout '
+        'thresholds are multiplied by the number of workers.',
+        hint='Set REDIS_URL so every worker counts failed logins in one shared cache.',
+        id='crm_app.W001',
+    )]
+
+
+def _failure_keys(username, ip):
+    # Kalitda xom username saqlanmaydi
+    user_hash = hashlib.sha256(str(username).strip().lower().encode()).hexdigest()[:32]
+    return f'login-fail:user:{user_hash}', f'login-fail:ip:{ip}'
+
+
+def check_throttle(username, ip):
+    """Raise Throttled if the username or IP used up its failed attempts (bitta kesh so'rovi)"""
+    user_key, ip_key = _failure_keys(username, ip)
+    counts = cache.get_many([user_key, ip_key])
+    if (counts.get(user_key, 0) >= settings.LOGIN_FAILURES_PER_USERNAME
+            or counts.get(ip_key, 0) >= settings.LOGIN_FAILURES_PER_IP):
+        raise Throttled(wait=settings.LOGIN_FAILURE_WINDOW, detail='Too many failed login attempts.')
+
+
+def record_failure(username, ip):
+    for key in _failure_keys(username, ip):
+        # add + incr: oyna birinchi xatodan boshlanadi, workerlar orasida atomar
+        cache.add(key, 0, timeout=settings.LOGIN_FAILURE_WINDOW)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=settings.LOGIN_FAILURE_WINDOW)
+
+
+def reset_failures(username):
+    cache.delete(_failure_keys(username, '')[0])
+
+
+def _authenticate(username, password):
+    # Pool oqimi o'z DB ulanishini ishlatadi (CONN_MAX_AGE bo'yicha yopiladi)
+    close_old_connections()
+    try:
+        return authenticate(username=username, password=password)
+    finally:
+        close_old_connections()
+
+
+def verify_password(username, password):
+    """authenticate() on the bounded hashing pool; LoginUnavailable if the queue is full"""
+    if not _slots.acquire(blocking=False):
+        raise LoginUnavailable()
+    try:
+        future = _executor.submit(_authenticate, username, password)
+    except RuntimeError:
+        _slots.release()
+        raise LoginUnavailable()
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=settings.LOGIN_HASH_TIMEOUT)
+    except FutureTimeout:
+        raise LoginUnavailable()
+
+
+def guarded_authenticate(request, username, password):
+    """Throttle check -> pooled password check -> failure bookkeeping; returns User or None"""
+    ip = client_ip(request)
+    check_throttle(username, ip)
+    user = verify_password(username, password)
+    if user is None:
+        record_failure(username, ip)
+    else:
+        reset_failures(username)
+    return user
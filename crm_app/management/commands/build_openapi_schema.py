@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from crm_app.openapi import generate_schema, write_schema
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema once and store it (YAML/JSON + .gz) for /api/schema/"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=None, help='Default: settings.OPENAPI_SCHEMA_DIR')
+
+    def handle(self, *args, **options):
+        directory = options['output_dir'] or settings.OPENAPI_SCHEMA_DIR
+        etags = write_schema(generate_schema(), directory)
+        for fmt, etag in etags.items():
+            self.stdout.write(f"{fmt}: ETag {etag}")
+        self.stdout.write(self.style.SUCCESS(f"OpenAPI schema written to {directory}"))
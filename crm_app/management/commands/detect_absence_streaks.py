@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.absences import detect_absence_streaks
+from crm_app.background import run_every
+
+
+class Command(BaseCommand):
+    help = "Find consecutive-absence streaks marked since the last run and create Attendance Alert notifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Ignore the watermark and recompute every student with recent attendance')
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Keep running and rescan every SECONDS (in-process scheduler)')
+
+    def handle(self, *args, **options):
+        if options['every']:
+            if options['full']:
+                raise CommandError('--every cannot be combined with --full')
+            try:
+                run_every(detect_absence_streaks, options['every'], report=self.report)
+            except KeyboardInterrupt:
+                pass
+            return
+        self.report(detect_absence_streaks(full=options['full']))
+
+    def report(self, summary):
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['students']} students rechecked, {summary['at_risk']} at risk, "
+            f"{summary['notifications']} alerts created"
+        ))
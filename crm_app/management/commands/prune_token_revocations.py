@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from crm_app.revocation import prune_revocations
+
+
+class Command(BaseCommand):
+    help = "Delete TokenRevocation rows whose tokens have already expired"
+
+    def handle(self, *args, **options):
+        deleted = prune_revocations()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired revocations"))
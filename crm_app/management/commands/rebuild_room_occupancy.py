@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from crm_app.models import Lesson
+from crm_app.occupancy import rebuild_occupancy
+
+
+class Command(BaseCommand):
+    help = "Backfill RoomOccupancy bitmaps from existing lessons"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, help='Branch id (default: all branches)')
+        parser.add_argument('--from', dest='date_from', help='Only lessons on/after YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        lessons = Lesson.objects.all()
+        if options['branch']:
+            lessons = lessons.filter(room__branch_id=options['branch'])
+        if options['date_from']:
+            lessons = lessons.filter(date__gte=parse_date(options['date_from']))
+
+        total = rebuild_occupancy(lessons)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt occupancy for {total} room-days"))
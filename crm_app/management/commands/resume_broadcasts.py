@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from crm_app.broadcasts import deliver_broadcast
+from crm_app.models import BroadcastJob
+
+
+class Command(BaseCommand):
+    help = "Finish broadcasts interrupted by a worker restart (Pending/Running/Failed)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-minutes', type=int, default=10,
+                            help="Running/Pending jobs older than this are considered interrupted")
+        parser.add_argument('--include-failed', action='store_true')
+
+    def handle(self, *args, **options):
+        stale = timezone.now() - timedelta(minutes=options['stale_minutes'])
+        interrupted = Q(status='Pending', created_at__lt=stale) | Q(status='Running', started_at__lt=stale)
+        if options['include_failed']:
+            interrupted |= Q(status='Failed')
+        for job_id in BroadcastJob.objects.filter(interrupted).values_list('id', flat=True):
+            written = deliver_broadcast(job_id, resume=True)
+            self.stdout.write(f"Broadcast {job_id}: {written} notifications written")
+        self.stdout.write(self.style.SUCCESS("Done"))
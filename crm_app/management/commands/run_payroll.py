@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm_app.models import EducationalCenter
+from crm_app.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Generate Payroll rows for every teacher of a center from lesson hours"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--center', type=int, help='EducationalCenter id (default: all active centers)')
+        parser.add_argument('--month', help='YYYY-MM (default: current month)')
+        parser.add_argument(
+            '--rule', action='append', default=[], metavar='NAME=VALUE',
+            help='Override a payroll rule, e.g. --rule penalty_per_cancelled_lesson=50000',
+        )
+
+    def handle(self, *args, **options):
+        month = options['month'] or timezone.localdate().strftime('%Y-%m')
+
+        overrides = {}
+        for item in options['rule']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Invalid --rule "{item}", expected NAME=VALUE')
+            overrides[name.strip()] = value.strip()
+
+        if options['center']:
+            center_ids = [options['center']]
+        else:
+            center_ids = list(
+                EducationalCenter.objects.filter(status='Active').values_list('id', flat=True)
+            )
+
+        for center_id in center_ids:
+            try:
+                summary = run_payroll(center_id, month, overrides)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(
+                f"Center {center_id} {month}: {summary['teachers_processed']} teachers, "
+                f"{summary['total_hours']} hours, total {summary['total_salary']} "
+                f"(skipped paid: {summary['skipped_paid']})"
+            ))
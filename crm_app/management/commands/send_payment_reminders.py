@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.background import run_every
+from crm_app.reminders import send_payment_reminders
+
+
+class Command(BaseCommand):
+    help = "Create Payment Reminder notifications for students (and parents) with upcoming or overdue payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Scan as of YYYY-MM-DD (default: today)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be created')
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Keep running and rescan every SECONDS (in-process scheduler)')
+
+    def handle(self, *args, **options):
+        if options['every']:
+            if options['date'] or options['dry_run']:
+                raise CommandError('--every cannot be combined with --date or --dry-run')
+            try:
+                run_every(send_payment_reminders, options['every'], report=self.report)
+            except KeyboardInterrupt:
+                pass
+            return
+
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError:
+            raise CommandError(f"Invalid --date \"{options['date']}\", expected YYYY-MM-DD")
+        summary = send_payment_reminders(today, dry_run=options['dry_run'])
+        self.report(summary, 'would be created' if options['dry_run'] else 'created')
+
+    def report(self, summary, verb='created'):
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['payments']} due payments, {summary['notifications']} reminders {verb}"
+        ))
@@ -0,0 +1,57 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_app.models import Branch
+from crm_app.timetable import solve_timetable
+
+
+class Command(BaseCommand):
+    help = "Build a conflict-free weekly timetable (GroupSchedule) for a branch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--branch', type=int, required=True, help='Branch id')
+        parser.add_argument('--lesson-minutes', type=int, default=90)
+        parser.add_argument('--budget', type=float, default=settings.TIMETABLE_TIME_BUDGET, help='Seconds')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--hours', action='append', default=[], metavar='GROUP=HOURS',
+            help='Override Group.weekly_hours, e.g. --hours 12=6',
+        )
+        parser.add_argument('--apply', action='store_true', help='Replace the groups\' GroupSchedule rows')
+        parser.add_argument('--json', action='store_true', help='Print the full report as JSON')
+
+    def handle(self, *args, **options):
+        branch = Branch.objects.filter(pk=options['branch']).first()
+        if branch is None:
+            raise CommandError(f"Branch {options['branch']} not found")
+
+        weekly_hours = {}
+        for item in options['hours']:
+            group_id, sep, hours = item.partition('=')
+            if not sep or not group_id.strip().isdigit() or not hours.strip().isdigit():
+                raise CommandError(f'Invalid --hours "{item}", expected GROUP=HOURS')
+            weekly_hours[int(group_id)] = int(hours)
+
+        report = solve_timetable(
+            branch, options['lesson_minutes'], weekly_hours, options['budget'], options['seed'],
+            apply=options['apply'],
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(report, default=str, indent=2))
+            if 'error' in report:
+                raise CommandError(f"Not applied: {report['error']}")
+            return
+
+        metrics = report['metrics']
+        self.stdout.write(self.style.SUCCESS(
+            f"Branch {branch.id}: placed {report['sessions_placed']}/{report['sessions_required']} sessions "
+            f"for {report['groups']} groups in {metrics['elapsed_ms']} ms "
+            f"(score {metrics['score']}, same-day {metrics['same_day_sessions']}, "
+            f"room changes {metrics['room_changes']}, applied {report['applied']})"
+        ))
+        for item in report['unplaced']:
+            self.stdout.write(self.style.WARNING(f"  group {item['group']}: {item['reason']}"))
+        if 'error' in report:
+            raise CommandError(f"Not applied: {report['error']}")
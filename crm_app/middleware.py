@@ -0,0 +1,113 @@
+"""
+Yo'lga qarab middleware zanjirini tanlovchi dispatcher.
+
+/api/ faqat JWT bilan ishlaydi: sessiya, CSRF, messages va X-Frame-Options
+unga kerak emas. Dispatcher settings.MIDDLEWARE dagi yagona element bo'lib,
+MIDDLEWARE_BY_PATH dagi prefikslar uchun qisqa zanjirni, qolgan barcha
+yo'llar (/admin/ va h.k.) uchun FULL_MIDDLEWARE ni ishga tushiradi.
+
+Django handler process_view/process_exception/process_template_response
+hook'larini faqat MIDDLEWARE dan yig'adi, shuning uchun dispatcher ularni
+tanlangan zanjirdagi middleware'larga o'zi uzatadi (masalan, admin'da
+CsrfViewMiddleware.process_view).
+"""
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+
+class MiddlewareChain:
+    """One middleware stack built the way BaseHandler.load_middleware builds it (sync)"""
+
+    def __init__(self, middleware_paths, get_response):
+        self.view_hooks = []
+        self.template_response_hooks = []
+        self.exception_hooks = []
+        handler = get_response
+        for middleware_path in reversed(middleware_paths):
+            middleware = import_string(middleware_path)
+            try:
+                instance = middleware(handler)
+            except MiddlewareNotUsed:
+                continue
+            if instance is None:
+                raise ImproperlyConfigured(f'Middleware factory {middleware_path} returned None.')
+            if hasattr(instance, 'process_view'):
+                self.view_hooks.insert(0, instance.process_view)
+            if hasattr(instance, 'process_template_response'):
+                self.template_response_hooks.append(instance.process_template_response)
+            if hasattr(instance, 'process_exception'):
+                self.exception_hooks.append(instance.process_exception)
+            handler = convert_exception_to_response(instance)
+        self.handler = handler
+
+
+class PathMiddlewareDispatcher:
+    """Runs MIDDLEWARE_BY_PATH chains for matching prefixes, FULL_MIDDLEWARE otherwise"""
+
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        self.routes = [
+            (prefix, MiddlewareChain(paths, get_response))
+            for prefix, paths in settings.MIDDLEWARE_BY_PATH
+        ]
+        self.default = MiddlewareChain(settings.FULL_MIDDLEWARE, get_response)
+
+    def chain_for(self, request):
+        path = request.path_info
+        for prefix, chain in self.routes:
+            if path.startswith(prefix):
+                return chain
+        return self.default
+
+    def __call__(self, request):
+        chain = self.chain_for(request)
+        # Hook'lar uchun: so'rov qaysi zanjirdan o'tganini eslab qolamiz
+        request._middleware_chain = chain
+        return chain.handler(request)
+
+    def _chain(self, request):
+        return getattr(request, '_middleware_chain', None) or self.chain_for(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for hook in self._chain(request).view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for hook in self._chain(request).template_response_hooks:
+            response = hook(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for hook in self._chain(request).exception_hooks:
+            response = hook(request, exception)
+            if response is not None:
+                return response
+        return None
+
+
+ADMIN_MIDDLEWARE = (
+    ('E408', 'django.contrib.auth.middleware.AuthenticationMiddleware'),
+    ('E409', 'django.contrib.messages.middleware.MessageMiddleware'),
+    ('E410', 'django.contrib.sessions.middleware.SessionMiddleware'),
+)
+
+
+@checks.register(checks.Tags.admin)
+def check_full_middleware(app_configs, **kwargs):
+    """admin.E408-E410 o'rniga: admin kerak middleware'lar FULL_MIDDLEWARE da bo'lsin"""
+    full = getattr(settings, 'FULL_MIDDLEWARE', [])
+    return [
+        checks.Error(f"'{path}' must be in FULL_MIDDLEWARE in order to use the admin application.",
+                     id=f'crm_app.{check_id}')
+        for check_id, path in ADMIN_MIDDLEWARE
+        if path not in full
+    ]
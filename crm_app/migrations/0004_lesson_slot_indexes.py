@@ -0,0 +1,21 @@
+# Generated by Django 6.0 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0003_alter_student_passport_number_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['room', 'date', 'start_time'], name='lesson_room_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['teacher', 'date', 'start_time'], name='lesson_teacher_slot_idx'),
+        ),
+    ]
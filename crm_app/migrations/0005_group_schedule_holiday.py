@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-19 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0004_lesson_slot_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedules', to='crm_app.group')),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='crm_app.room')),
+                ('teacher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='schedules', to='crm_app.teacher')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+                'unique_together': {('group', 'weekday', 'start_time')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('educational_center', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='crm_app.educationalcenter')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('educational_center', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0005_group_schedule_holiday'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='lazy_schedule',
+            field=models.BooleanField(default=False),
+        ),
+    ]
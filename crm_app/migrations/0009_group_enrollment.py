@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-19 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_enrolled_count(apps, schema_editor):
+    Group = apps.get_model('crm_app', 'Group')
+    Student = apps.get_model('crm_app', 'Student')
+    counts = (
+        Student.objects.filter(group=OuterRef('pk'))
+        .order_by()
+        .values('group')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    Group.objects.update(enrolled_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0008_timetable_inputs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='GroupWaitlist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='crm_app.group')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='crm_app.student')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'unique_together': {('group', 'student')},
+            },
+        ),
+        migrations.RunPython(backfill_enrolled_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0009_group_enrollment'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attendance',
+            name='marked_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
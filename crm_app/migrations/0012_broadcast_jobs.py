@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-19 13:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0011_token_revocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='student', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='BroadcastJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('group', 'Group'), ('branch', 'Branch'), ('center', 'Center'), ('role', 'Role')], max_length=10)),
+                ('target_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('role', models.CharField(blank=True, choices=[('SuperAdmin', 'SuperAdmin'), ('Director', 'Director'), ('Manager', 'Manager'), ('Admin', 'Admin'), ('Teacher', 'Teacher'), ('Student', 'Student')], max_length=20)),
+                ('notification_type', models.CharField(choices=[('Payment Reminder', 'Payment Reminder'), ('Attendance Alert', 'Attendance Alert'), ('Exam Notification', 'Exam Notification'), ('System Alert', 'System Alert'), ('Group Notification', 'Group Notification')], default='Group Notification', max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Running', 'Running'), ('Completed', 'Completed'), ('Failed', 'Failed')], default='Pending', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='broadcasts', to=settings.AUTH_USER_MODEL)),
+                ('educational_center', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcasts', to='crm_app.educationalcenter')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='broadcast',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='crm_app.broadcastjob'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-19 13:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    NotificationCounter = apps.get_model('crm_app', 'NotificationCounter')
+    users = User.objects.order_by('pk').annotate(
+        unread_total=Count('notifications', filter=Q(notifications__is_read=False)),
+    ).values_list('pk', 'unread_total')
+    NotificationCounter.objects.bulk_create(
+        (NotificationCounter(user_id=user_id, unread=unread) for user_id, unread in users.iterator(chunk_size=5000)),
+        batch_size=5000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('crm_app', '0012_broadcast_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='notification_user_read_idx'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0 on 2026-10-19 14:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_app', '0014_payment_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenceStreak',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='absence_streak', serialize=False, to='crm_app.student')),
+                ('length', models.PositiveIntegerField(default=0)),
+                ('started_on', models.DateField(blank=True, null=True)),
+                ('last_lesson_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobWatermark',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['marked_at'], name='attendance_marked_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='absencestreak',
+            index=models.Index(fields=['length'], name='absence_streak_length_idx'),
+        ),
+    ]
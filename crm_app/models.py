@@ -154,12 +154,29 @@ class Group(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Active')
     start_date = models.DateField()
     end_date = models.DateField()
+    # True bo'lsa darslar GroupSchedule qoidasidan o'qishda hisoblanadi (virtual),
+    # Lesson qatori faqat davomat/bekor qilish/online link kerak bo'lganda yaratiladi
+    lazy_schedule = models.BooleanField(default=False)
+    # Haftalik dars soatlari (timetable solver uchun; 0 - avtomatik jadval tuzilmaydi)
+    weekly_hours = models.PositiveSmallIntegerField(default=0)
+    # Guruhdagi o'quvchilar soni (denormallashtirilgan): faqat crm_app/enrollment.py
+    # dagi shartli UPDATE'lar orqali o'zgaradi, COUNT(*) kerak emas
+    enrolled_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.room.name if self.room else 'No room'}"
 
+    def save(self, *args, **kwargs):
+        # Eskirgan enrolled_count parallel yozilishlarni bosib ketmasligi uchun
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'enrolled_count'
+            ]
+        super().save(*args, **kwargs)
+
     class Meta:
         unique_together = ('branch', 'name')
         ordering = ['-created_at']
@@ -221,6 +238,10 @@ class Student(models.Model):
 
     # group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True, blank=True, related_name='students')
     branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='students')
+    # O'quvchi kabineti (role='Student') - bildirishnomalar shu userga boradi
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='student')
+    # Ota-ona kabineti: to'lov eslatmalari shu userga ham boradi
+    parent_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='children')
     
     passport_number = models.CharField(
     max_length=50,
@@ -245,6 +266,20 @@ class Student(models.Model):
 
 
 
+class GroupWaitlist(models.Model):
+    """FIFO queue of students waiting for a seat in a full group"""
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='waitlist')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='waitlist_entries')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.group.name} - {self.student.first_name} {self.student.last_name}"
+
+    class Meta:
+        unique_together = ('group', 'student')
+        ordering = ['created_at', 'id']
+
+
 class Teacher(models.Model):
     """Teacher model with performance metrics"""
     STATUS_CHOICES = [
@@ -306,6 +341,69 @@ class Lesson(models.Model):
     
     class Meta:
         ordering = ['-date', '-start_time']
+        indexes = [
+            # Xona/o'qituvchi bandligini tekshirish (to'qnashuvlar) uchun
+            models.Index(fields=['room', 'date', 'start_time'], name='lesson_room_slot_idx'),
+            models.Index(fields=['teacher', 'date', 'start_time'], name='lesson_teacher_slot_idx'),
+        ]
+
+
+class GroupSchedule(models.Model):
+    """Recurring weekly slot of a group (dars jadvali qoidasi)"""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='schedules')
+    weekday = models.IntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    # Bo'sh bo'lsa guruhning xonasi / o'qituvchisi ishlatiladi
+    room = models.ForeignKey('Room', on_delete=models.SET_NULL, null=True, blank=True, related_name='schedules')
+    teacher = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, blank=True, related_name='schedules')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.group.name} - {self.get_weekday_display()} {self.start_time}"
+
+    class Meta:
+        unique_together = ('group', 'weekday', 'start_time')
+        ordering = ['weekday', 'start_time']
+
+
+class TeacherAvailability(models.Model):
+    """Weekly window a teacher can teach in (bo'lmasa - filial ish vaqti)"""
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='availability')
+    weekday = models.IntegerField(choices=GroupSchedule.WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    def __str__(self):
+        return f"{self.teacher} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+    class Meta:
+        ordering = ['teacher', 'weekday', 'start_time']
+
+
+class Holiday(models.Model):
+    """Days without lessons for an educational center"""
+    educational_center = models.ForeignKey(EducationalCenter, on_delete=models.CASCADE, related_name='holidays')
+    date = models.DateField()
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} - {self.date}"
+
+    class Meta:
+        unique_together = ('educational_center', 'date')
+        ordering = ['date']
 
 
 class Attendance(models.Model):
@@ -322,7 +420,8 @@ class Attendance(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     marked_by = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, related_name='marked_attendances')
     notes = models.TextField(blank=True)
-    marked_at = models.DateTimeField(auto_now_add=True)
+    # Har qayta belgilashda yangilanadi (davomat jadvali ETag'i shunga tayanadi)
+    marked_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.lesson.date} - {self.status}"
@@ -330,6 +429,32 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ('lesson', 'student')
         ordering = ['-marked_at']
+        indexes = [
+            # detect_absence_streaks: watermark'dan keyin belgilanganlar
+            models.Index(fields=['marked_at'], name='attendance_marked_at_idx'),
+        ]
+
+
+class AbsenceStreak(models.Model):
+    """
+    Current run of consecutive absences of a student (at-risk ro'yxati).
+
+    detect_absence_streaks faqat oxirgi ishga tushirishdan keyin davomati
+    belgilangan o'quvchilar uchun qayta hisoblaydi (crm_app/absences.py).
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='absence_streak')
+    length = models.PositiveIntegerField(default=0)
+    started_on = models.DateField(null=True, blank=True)
+    last_lesson_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.student_id}: {self.length}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['length'], name='absence_streak_length_idx'),
+        ]
 
 
 class Payment(models.Model):
@@ -358,6 +483,11 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-payment_date']
+        indexes = [
+            # To'lov eslatmalari: muddat oralig'i skani va "keyingi to'lov bormi" tekshiruvi
+            models.Index(fields=['due_date'], name='payment_due_date_idx'),
+            models.Index(fields=['student', 'group', 'due_date'], name='payment_student_due_idx'),
+        ]
 
 
 class Assignment(models.Model):
@@ -463,6 +593,25 @@ class Room(models.Model):
         unique_together = ('branch', 'name')
 
 
+class RoomOccupancy(models.Model):
+    """
+    Busy 5-minute slots of a room for one day as a 288-bit bitmap.
+
+    Lesson yozilganda signal orqali qayta hisoblanadi; bo'sh xona qidiruvi
+    faqat shu jadvaldan o'qiydi.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='occupancy')
+    date = models.DateField()
+    slots = models.BinaryField(max_length=36)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.room.name} - {self.date}"
+
+    class Meta:
+        unique_together = ('room', 'date')
+
+
 class Payroll(models.Model):
     """Teacher payroll management"""
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='payroll')
@@ -499,12 +648,49 @@ class Notification(models.Model):
     message = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Ommaviy yuborish (BroadcastJob) orqali yaratilgan bo'lsa
+    broadcast = models.ForeignKey('BroadcastJob', on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='notifications')
+    # Avtomatik bildirishnomalar kaliti (masalan, to'lov eslatmasi): bir userga bir marta
+    dedup_key = models.CharField(max_length=100, null=True, blank=True)
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.title}"
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # O'qilmaganlarni qayta sanash va mark-all-read UPDATE'i uchun
+            models.Index(fields=['user', 'is_read'], name='notification_user_read_idx'),
+        ]
+        constraints = [
+            # dedup_key birinchi: kalitlar ro'yxati bo'yicha mavjudlarini topish ham shu indeksdan
+            models.UniqueConstraint(fields=['dedup_key', 'user'], name='notification_dedup_key_uniq'),
+        ]
+
+
+class NotificationCounter(models.Model):
+    """
+    Denormalized unread-notification count of a user (badge).
+
+    Bildirishnoma yaratilganda/o'qilganda F() bilan o'zgartiriladi
+    (crm_app/notifications.py); qator bo'lmasa birinchi o'qishda sanaladi.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread}"
+
+
+class JobWatermark(models.Model):
+    """How far a periodic job has processed (masalan, Attendance.marked_at)"""
+    name = models.CharField(max_length=100, primary_key=True)
+    value = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
 
 
 class Contract(models.Model):
@@ -562,3 +748,71 @@ class Lead(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+
+
+class TokenRevocation(models.Model):
+    """
+    Append-only log of revoked JWTs (logout) and users (block, role change).
+
+    Har worker yangi qatorlarni id bo'yicha (id > oxirgi ko'rilgan) o'qib
+    xotiradagi to'plamni yangilaydi; qator faqat bekor qilinganda yoziladi.
+    """
+    KIND_CHOICES = [
+        ('user', 'User'),
+        ('token', 'Token'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # user uchun user id, token uchun jti
+    key = models.CharField(max_length=64)
+    revoked_at = models.DateTimeField(db_index=True)
+    # Shundan keyin bu qator bilan bekor qilinadigan token qolmaydi (prune qilinadi)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.kind}:{self.key} @ {self.revoked_at}"
+
+
+class BroadcastJob(models.Model):
+    """
+    One announcement fanned out to every recipient of a group/branch/center/role.
+
+    Qabul qiluvchilar bitta so'rov bilan aniqlanadi, Notification qatorlari
+    fon oqimida bo'laklab (INSERT ... SELECT) yoziladi; sent - progress.
+    """
+    TARGET_CHOICES = [
+        ('group', 'Group'),
+        ('branch', 'Branch'),
+        ('center', 'Center'),
+        ('role', 'Role'),
+    ]
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
+
+    educational_center = models.ForeignKey(EducationalCenter, on_delete=models.CASCADE, related_name='broadcasts')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='broadcasts')
+    target_type = models.CharField(max_length=10, choices=TARGET_CHOICES)
+    # group/branch id; center va role uchun bo'sh
+    target_id = models.PositiveIntegerField(null=True, blank=True)
+    role = models.CharField(max_length=20, choices=UserProfile.ROLE_CHOICES, blank=True)
+    notification_type = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPES,
+                                         default='Group Notification')
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.title} -> {self.target_type} {self.target_id or self.role} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
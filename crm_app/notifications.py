@@ -0,0 +1,131 @@
+"""
+O'qilmagan bildirishnomalar hisoblagichi (NotificationCounter).
+
+Badge so'rovi bitta PK bo'yicha o'qish: Notification jadvali sanalmaydi.
+Hisoblagich yaratishda (signal yoki broadcast bo'lagi) +1, o'qilganda
+bitta UPDATE'ning rowcount'i qadar kamayadi. Qator yo'q bo'lsa (masalan,
+yangi foydalanuvchi) birinchi o'qishda (user, is_read) indeksi bo'yicha sanaladi.
+
+create_deduplicated - avtomatik bildirishnomalar (to'lov eslatmasi, davomat
+ogohlantirishi): dedup_key bo'yicha bir marta, executemany INSERT bilan.
+"""
+
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .events import publish_many
+from .models import Notification, NotificationCounter
+
+
+def bump_unread(user_id, delta):
+    """Shift the counter by delta; a missing row stays missing (keyingi o'qishda sanaladi)"""
+    if user_id is not None and delta:
+        NotificationCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') + delta, 0))
+
+
+def bump_unread_many(user_ids, delta=1):
+    """Shift the counters of a user id subquery/list by delta in one UPDATE"""
+    return NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=Greatest(F('unread') + delta, 0))
+
+
+def recount_unread(user_id):
+    unread = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    NotificationCounter.objects.update_or_create(user_id=user_id, defaults={'unread': unread})
+    return unread
+
+
+def unread_count(user_id):
+    """Unread notifications of the user (PK lookup)"""
+    unread = NotificationCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    return recount_unread(user_id) if unread is None else unread
+
+
+def mark_read(user_id, ids=None):
+    """Mark the user's unread notifications (all, or only ids) read with one UPDATE; returns the count"""
+    unread = Notification.objects.filter(user_id=user_id, is_read=False)
+    if ids is not None:
+        unread = unread.filter(pk__in=ids)
+    with transaction.atomic():
+        updated = unread.update(is_read=True)
+        bump_unread(user_id, -updated)
+    return updated
+
+
+def _existing_keys(keys):
+    """{(dedup_key, user_id)} already stored (notification_dedup_key_uniq indeksi bo'yicha)"""
+    existing = set()
+    for start in range(0, len(keys), settings.NOTIFICATION_BATCH_SIZE):
+        existing.update(Notification.objects.filter(
+            dedup_key__in=keys[start:start + settings.NOTIFICATION_BATCH_SIZE],
+        ).values_list('dedup_key', 'user_id'))
+    return existing
+
+
+def _insert(notification_type, rows, created_at):
+    """executemany INSERT of [(key, user_id, title, message)]; dedup conflict'lar o'tkazib yuboriladi"""
+    ops = connection.ops
+    fields = [Notification._meta.get_field(name) for name in (
+        'user', 'notification_type', 'title', 'message', 'is_read', 'created_at', 'dedup_key',
+    )]
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        ops.insert_statement(on_conflict=OnConflict.IGNORE),
+        ops.quote_name(Notification._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None) or '',
+    )
+    created_at = ops.adapt_datetimefield_value(created_at)
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            (user_id, notification_type, title, message, False, created_at, key)
+            for key, user_id, title, message in rows
+        ])
+
+
+def create_deduplicated(notification_type, rows, dry_run=False):
+    """
+    Create {(dedup_key, user_id): (title, message)} notifications not stored yet; returns the count.
+
+    Signal yo'q (bulk): hisoblagichlar bir xil sondagi userlar uchun bitta
+    UPDATE bilan oshiriladi, SSE hodisalari bo'lak bo'yicha yuboriladi.
+    Parallel ishga tushirish yozib ulgurgan qatorlar (ON CONFLICT) sanalmaydi.
+    """
+    existing = _existing_keys(sorted({key for key, _ in rows}))
+    new = [item for item in rows.items() if item[0] not in existing]
+    if dry_run or not new:
+        return len(new)
+
+    created_at = timezone.now()
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+    created = 0
+    for start in range(0, len(new), batch_size):
+        batch = new[start:start + batch_size]
+        with transaction.atomic():
+            _insert(notification_type, [
+                (key, user_id, title, message) for (key, user_id), (title, message) in batch
+            ], created_at)
+            # Faqat shu chaqiruvda yozilganlar (created_at bir xil) - deliver_broadcast'dagi kabi
+            inserted = set(Notification.objects.filter(
+                dedup_key__in={key for (key, _), _ in batch}, created_at=created_at,
+            ).values_list('dedup_key', 'user_id'))
+            batch = [item for item in batch if item[0] in inserted]
+            by_count = defaultdict(list)
+            for user_id, count in Counter(user_id for (_, user_id), _ in batch).items():
+                by_count[count].append(user_id)
+            for count, user_ids in by_count.items():
+                bump_unread_many(user_ids, count)
+        publish_many([
+            ([f'user:{user_id}'], 'notification', {
+                'notification_type': notification_type, 'title': title, 'message': message,
+                'created_at': created_at,
+            })
+            for (_, user_id), (title, message) in batch
+        ])
+        created += len(batch)
+    return created
@@ -0,0 +1,87 @@
+"""
+Xonalar bandligi bitmaplari (RoomOccupancy).
+
+Kun 5 daqiqalik 288 ta slotga bo'linadi; i-bit [i*5, i*5+5) daqiqalar
+oralig'i band ekanini bildiradi. Bitmap Python int sifatida ishlatiladi:
+slot bo'shligini tekshirish bitta `&` amali.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import Lesson, RoomOccupancy
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+
+
+def slot_mask(start_time, end_time):
+    """Bitmask of the 5-minute slots touched by [start_time, end_time)"""
+    start = (start_time.hour * 60 + start_time.minute) // SLOT_MINUTES
+    end = -(-(end_time.hour * 60 + end_time.minute) // SLOT_MINUTES)
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def to_bitmap(value):
+    return int.from_bytes(bytes(value or b''), 'big')
+
+
+def from_bitmap(mask):
+    return mask.to_bytes(BITMAP_BYTES, 'big')
+
+
+def refresh_occupancy(pairs):
+    """
+    Recompute the bitmaps of the given (room_id, date) pairs from their lessons.
+
+    Bitta so'rov bilan shu xona/kunlardagi bekor qilinmagan darslar o'qiladi;
+    bitmapi nol bo'lgan kunlarning qatori upsert qilinmaydi, o'chiriladi.
+    """
+    pairs = {(room_id, day) for room_id, day in pairs if room_id and day}
+    if not pairs:
+        return
+
+    masks = defaultdict(int)
+    lessons = Lesson.objects.filter(
+        room_id__in={room_id for room_id, _ in pairs},
+        date__in={day for _, day in pairs},
+        is_cancelled=False,
+    ).values_list('room_id', 'date', 'start_time', 'end_time').order_by()
+    for room_id, day, start_time, end_time in lessons:
+        if (room_id, day) in pairs:
+            masks[(room_id, day)] |= slot_mask(start_time, end_time)
+
+    busy = {pair: mask for pair, mask in masks.items() if mask}
+    if busy:
+        RoomOccupancy.objects.bulk_create(
+            [RoomOccupancy(room_id=room_id, date=day, slots=from_bitmap(mask))
+             for (room_id, day), mask in busy.items()],
+            update_conflicts=True,
+            unique_fields=['room', 'date'],
+            update_fields=['slots', 'updated_at'],
+        )
+    # Mask nol bo'lgan kunlar ham (darssiz yoki faqat nol uzunlikdagi darslar) - qator qolmasin
+    empty = pairs - set(busy)
+    if empty:
+        stale = Q()
+        for room_id, day in empty:
+            stale |= Q(room_id=room_id, date=day)
+        RoomOccupancy.objects.filter(stale).delete()
+
+
+def rebuild_occupancy(lessons, batch_size=2000):
+    """Backfill bitmaps for every (room, date) of a Lesson queryset"""
+    pairs = lessons.filter(room__isnull=False).values_list('room_id', 'date').distinct().order_by()
+    batch, total = [], 0
+    for pair in pairs.iterator(chunk_size=batch_size):
+        batch.append(pair)
+        if len(batch) >= batch_size:
+            refresh_occupancy(batch)
+            total += len(batch)
+            batch = []
+    refresh_occupancy(batch)
+    return total + len(batch)
@@ -0,0 +1,88 @@
+"""
+Oldindan yig'ilgan OpenAPI sxemasi.
+
+build_openapi_schema buyrug'i sxemani deploy paytida bir marta yaratadi va
+OPENAPI_SCHEMA_DIR ga YAML va JSON ko'rinishida (hamda .gz nusxalari bilan)
+yozadi. /api/schema/ faylni xotiradan beradi: ETag, 304 va oldindan
+siqilgan gzip bilan - so'rov paytida ViewSet/serializer'lar introspeksiya
+qilinmaydi.
+"""
+
+import gzip
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+# format -> (fayl nomi, Content-Type); SpectacularAPIView kabi YAML birinchi (default)
+SCHEMA_FORMATS = {
+    'yaml': ('schema.yaml', 'application/vnd.oai.openapi; charset=utf-8'),
+    'json': ('schema.json', 'application/vnd.oai.openapi+json; charset=utf-8'),
+}
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def generate_schema():
+    """{format: bytes} rendered by drf-spectacular, the same output as SpectacularAPIView"""
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        urlconf=spectacular_settings.SERVE_URLCONF,
+        api_version=spectacular_settings.VERSION,
+    )
+    schema = generator.get_schema(request=None, public=True)
+    return {
+        'yaml': OpenApiYamlRenderer().render(schema, renderer_context={}),
+        'json': OpenApiJsonRenderer().render(schema, renderer_context={}),
+    }
+
+
+def write_schema(documents, directory=None):
+    """Write every format and its .gz atomically; returns {format: etag}"""
+    directory = Path(directory or settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    for fmt, content in documents.items():
+        name = SCHEMA_FORMATS[fmt][0]
+        for target, data in ((name, content), (f'{name}.gz', gzip.compress(content, mtime=0))):
+            temporary = directory / f'{target}.tmp'
+            temporary.write_bytes(data)
+            os.replace(temporary, directory / target)
+    return {fmt: schema_etag(content) for fmt, content in documents.items()}
+
+
+def schema_etag(content):
+    return '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+
+
+def _read(fmt):
+    path = Path(settings.OPENAPI_SCHEMA_DIR) / SCHEMA_FORMATS[fmt][0]
+    if not path.exists():
+        return None
+    content = path.read_bytes()
+    gz_path = path.with_name(path.name + '.gz')
+    return content, gz_path.read_bytes() if gz_path.exists() else gzip.compress(content, mtime=0)
+
+
+def load_schema(fmt):
+    """(content, gzipped, etag) read once per process; None if the schema was not built"""
+    if fmt not in _loaded:
+        with _lock:
+            if fmt not in _loaded:
+                documents = {name: _read(name) for name in SCHEMA_FORMATS}
+                if documents[fmt] is None:
+                    if not settings.OPENAPI_RUNTIME_SCHEMA:
+                        return None
+                    # Dev: fayl yo'q bo'lsa protsessda bir marta yaratiladi
+                    documents = {
+                        name: (content, gzip.compress(content, mtime=0))
+                        for name, content in generate_schema().items()
+                    }
+                for name, document in documents.items():
+                    if document is not None:
+                        _loaded[name] = (*document, schema_etag(document[0]))
+    return _loaded[fmt]
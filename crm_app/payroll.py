@@ -0,0 +1,158 @@
+"""
+Oylik maosh (Payroll) hisoblash mexanizmi.
+
+Markaz va oy bo'yicha barcha o'qituvchilarning maoshi bekor qilinmagan
+darslar davomiyligi x soatlik stavka asosida bir nechta agregat so'rov bilan
+hisoblanadi va Payroll jadvaliga (teacher, month) bo'yicha upsert qilinadi.
+"""
+
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Lesson, Payroll, Teacher
+
+MONTH_RE = re.compile(r'^(\d{4})-(0[1-9]|1[0-2])$')
+CENTS = Decimal('0.01')
+
+DEFAULT_RULES = {
+    # Oyiga shu soatdan ko'p dars o'tgan o'qituvchiga bonus (0 - o'chirilgan)
+    'hours_bonus_threshold': Decimal('0'),
+    'hours_bonus_percent': Decimal('0'),
+    # performance_rating shu qiymatdan yuqori bo'lsa bonus (0 - o'chirilgan)
+    'rating_bonus_threshold': Decimal('0'),
+    'rating_bonus_percent': Decimal('0'),
+    # Har bir bekor qilingan dars uchun jarima
+    'penalty_per_cancelled_lesson': Decimal('0'),
+}
+
+
+def month_bounds(month):
+    """'YYYY-MM' -> (first day, first day of next month)"""
+    match = MONTH_RE.match(month or '')
+    if not match:
+        raise ValueError('month must be in YYYY-MM format')
+    year, mon = int(match.group(1)), int(match.group(2))
+    start = date(year, mon, 1)
+    end = date(year + 1, 1, 1) if mon == 12 else date(year, mon + 1, 1)
+    return start, end
+
+
+def build_rules(overrides=None):
+    """Merge settings.PAYROLL_RULES and per-run overrides into Decimal rules"""
+    rules = dict(DEFAULT_RULES)
+    for source in (getattr(settings, 'PAYROLL_RULES', {}), overrides or {}):
+        for name, value in source.items():
+            if name not in DEFAULT_RULES:
+                raise ValueError(f'Unknown payroll rule: {name}')
+            try:
+                rules[name] = Decimal(str(value))
+            except InvalidOperation:
+                raise ValueError(f'Invalid value for payroll rule {name}: {value}')
+    return rules
+
+
+def calculate_salary(minutes, hourly_rate, rating, cancelled, rules):
+    """Return (base_salary, bonus, penalty, total_salary) for one teacher"""
+    hours = Decimal(minutes) / 60
+    base = (hours * hourly_rate).quantize(CENTS)
+
+    bonus = Decimal('0')
+    if rules['hours_bonus_threshold'] and hours > rules['hours_bonus_threshold']:
+        bonus += base * rules['hours_bonus_percent'] / 100
+    if rules['rating_bonus_threshold'] and Decimal(str(rating)) >= rules['rating_bonus_threshold']:
+        bonus += base * rules['rating_bonus_percent'] / 100
+    bonus = bonus.quantize(CENTS)
+
+    penalty = (cancelled * rules['penalty_per_cancelled_lesson']).quantize(CENTS)
+    total = max(base + bonus - penalty, Decimal('0'))
+    return base, bonus, penalty, total
+
+
+def run_payroll(center_id, month, rule_overrides=None, batch_size=1000):
+    """
+    Generate or refresh Payroll rows of every teacher in a center for a month.
+
+    Allaqachon to'langan (is_paid=True) yozuvlar o'zgartirilmaydi.
+    """
+    start, end = month_bounds(month)
+    rules = build_rules(rule_overrides)
+
+    teachers = {
+        teacher_id: (hourly_rate, rating)
+        for teacher_id, hourly_rate, rating in Teacher.objects.filter(
+            branch__educational_center_id=center_id
+        ).values_list('id', 'hourly_rate', 'performance_rating').order_by()
+    }
+
+    lesson_totals = (
+        Lesson.objects.filter(
+            teacher__branch__educational_center_id=center_id,
+            date__gte=start,
+            date__lt=end,
+        )
+        .values('teacher_id')
+        .annotate(
+            minutes=Sum('duration', filter=Q(is_cancelled=False)),
+            lessons=Count('id', filter=Q(is_cancelled=False)),
+            cancelled=Count('id', filter=Q(is_cancelled=True)),
+        )
+        .order_by()
+    )
+
+    rows = []
+    skipped_paid = 0
+    total_minutes = 0
+    total_salary = Decimal('0')
+    with transaction.atomic():
+        # Oyning mavjud yozuvlari qulflanadi: upsert tugaguncha hech biri to'langan deb belgilanmaydi
+        paid = {
+            teacher_id
+            for teacher_id, is_paid in Payroll.objects.select_for_update(of=('self',)).filter(
+                teacher__branch__educational_center_id=center_id, month=month
+            ).values_list('teacher_id', 'is_paid').order_by('pk')
+            if is_paid
+        }
+
+        for item in lesson_totals:
+            teacher_id = item['teacher_id']
+            if teacher_id in paid:
+                skipped_paid += 1
+                continue
+            minutes = item['minutes'] or 0
+            hourly_rate, rating = teachers[teacher_id]
+            base, bonus, penalty, total = calculate_salary(
+                minutes, hourly_rate, rating, item['cancelled'], rules
+            )
+            rows.append(Payroll(
+                teacher_id=teacher_id,
+                month=month,
+                base_salary=base,
+                bonus=bonus,
+                penalty=penalty,
+                total_salary=total,
+            ))
+            total_minutes += minutes
+            total_salary += total
+
+        Payroll.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['teacher', 'month'],
+            update_fields=['base_salary', 'bonus', 'penalty', 'total_salary'],
+        )
+
+    return {
+        'center': center_id,
+        'month': month,
+        'teachers_processed': len(rows),
+        'skipped_paid': skipped_paid,
+        'total_hours': round(total_minutes / 60, 2),
+        'total_salary': str(total_salary),
+        'rules': {name: str(value) for name, value in rules.items()},
+    }
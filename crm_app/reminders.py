@@ -0,0 +1,66 @@
+"""
+To'lov eslatmalari (Payment Reminder).
+
+Har (o'quvchi, guruh) uchun eng oxirgi to'lovning due_date'i navbatdagi
+to'lov muddati hisoblanadi. Skan bitta so'rov: due_date oralig'i
+(payment_due_date_idx) va undan keyingi muddatli to'lov yo'qligi
+(NOT EXISTS, payment_student_due_idx). Bildirishnomalar o'quvchi va
+ota-ona akkauntlariga create_deduplicated bilan yoziladi; dedup_key
+(notification_dedup_key_uniq) tufayli qayta ishga tushirish takror yozmaydi.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Payment
+from .notifications import create_deduplicated
+
+
+def due_payments(today):
+    """Latest payment per (student, group) whose due_date is within the reminder window"""
+    horizon = today + timedelta(days=settings.PAYMENT_REMINDER_DAYS_AHEAD)
+    later = Payment.objects.filter(
+        student_id=OuterRef('student_id'), group_id=OuterRef('group_id'), due_date__gt=OuterRef('due_date'),
+    )
+    return Payment.objects.filter(
+        due_date__gte=today - timedelta(days=settings.PAYMENT_OVERDUE_LOOKBACK_DAYS),
+        due_date__lte=horizon,
+        student__status='Active',
+    ).exclude(Exists(later)).order_by().values_list(
+        'student_id', 'group_id', 'due_date', 'amount',
+        'student__first_name', 'student__last_name', 'student__user_id', 'student__parent_user_id',
+    )
+
+
+def reminder_for(today, student_id, group_id, due_date, amount, first_name, last_name):
+    """(dedup key, title, message); muddati o'tganlar har PAYMENT_OVERDUE_REPEAT_DAYS da qayta eslatiladi"""
+    name = f'{first_name} {last_name}'
+    overdue = (today - due_date).days
+    if overdue > 0:
+        period = overdue // settings.PAYMENT_OVERDUE_REPEAT_DAYS
+        return (
+            f'payment-overdue:{student_id}:{group_id}:{due_date}:{period}',
+            'Payment overdue',
+            f'Payment of {amount} for {name} was due on {due_date} ({overdue} days overdue).',
+        )
+    return (
+        f'payment-due:{student_id}:{group_id}:{due_date}',
+        'Payment due soon',
+        f'Payment of {amount} for {name} is due on {due_date}.',
+    )
+
+
+def send_payment_reminders(today=None, dry_run=False):
+    """Create missing reminder notifications; returns {'payments', 'notifications'}"""
+    today = today or timezone.localdate()
+    rows = {}
+    payments = 0
+    for student_id, group_id, due_date, amount, first_name, last_name, user_id, parent_id in due_payments(today):
+        payments += 1
+        key, title, message = reminder_for(today, student_id, group_id, due_date, amount, first_name, last_name)
+        for recipient in {user_id, parent_id} - {None}:
+            rows[key, recipient] = (title, message)
+    return {'payments': payments, 'notifications': create_deduplicated('Payment Reminder', rows, dry_run=dry_run)}
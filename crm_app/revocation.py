@@ -0,0 +1,173 @@
+"""
+Bekor qilingan tokenlar va foydalanuvchilar to'plami (har worker xotirasida).
+
+Manba - TokenRevocation jadvali (append-only). Versiya sifatida oxirgi
+ko'rilgan id ishlatiladi: har AUTH_REVOCATION_SYNC_SECONDS da bitta
+indeksli so'rov (id > version) faqat yangi qatorlarni olib keladi.
+So'rov vaqtida tekshiruv: Bloom filtr (deyarli har doim "yo'q" deydi),
+"bo'lishi mumkin" bo'lsa aniq lug'at. Bazaga yozish faqat blok/logout'da.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenRevocation
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (k indekslar ikki xeshdan: h1 + i*h2)"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _hashes(self, key):
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=16).digest(), 'little')
+        return digest & 0xFFFFFFFFFFFFFFFF, (digest >> 64) | 1
+
+    def add(self, key):
+        h1, h2 = self._hashes(key)
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % self.size
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        # Birinchi nol bitda to'xtaydi: bo'sh filtrda odatda bitta tekshiruv
+        h1, h2 = self._hashes(key)
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            pos = (h1 + i * h2) % size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+def _max_token_lifetime():
+    return max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+
+
+class RevocationSet:
+    """Per-process mirror of TokenRevocation, synced incrementally by id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = 0
+        self.synced_at = None
+        self.synced_wall = None
+        self.rebuilt_at = time.monotonic()
+        self.users, self.tokens, self.bloom = self._empty()
+
+    @staticmethod
+    def _empty():
+        return {}, {}, BloomFilter(settings.AUTH_REVOCATION_BLOOM_CAPACITY)
+
+    @staticmethod
+    def _add_to(structures, kind, key, revoked_at, expires_at):
+        users, tokens, bloom = structures
+        if kind == 'user':
+            user_id = int(key)
+            users[user_id] = max(users.get(user_id, 0), revoked_at)
+            bloom.add(f'u:{user_id}')
+        else:
+            tokens[key] = expires_at
+            bloom.add(f't:{key}')
+
+    def sync(self, force=False):
+        """Pull rows newer than the local version (odatda bo'sh natija)"""
+        now = time.monotonic()
+        if not force and self.synced_at is not None and now - self.synced_at < settings.AUTH_REVOCATION_SYNC_SECONDS:
+            return
+        with self._lock:
+            if not force and self.synced_at is not None and now - self.synced_at < settings.AUTH_REVOCATION_SYNC_SECONDS:
+                return
+            # Muddati o'tgan yozuvlar yig'ilib qolmasligi uchun vaqti-vaqti bilan to'liq qayta yuklash
+            rebuild = now - self.rebuilt_at > settings.AUTH_REVOCATION_REBUILD_SECONDS or (
+                self.bloom.count > settings.AUTH_REVOCATION_BLOOM_CAPACITY
+            )
+            # Qayta yuklash yangi tuzilmalarga yoziladi va tayyor bo'lgach almashtiriladi:
+            # is_revoked (qulfsiz) hech qachon bo'sh yoki yarim to'plamni ko'rmaydi
+            if rebuild:
+                structures, version, synced_wall = self._empty(), 0, None
+            else:
+                structures, version, synced_wall = (self.users, self.tokens, self.bloom), self.version, self.synced_wall
+            wall = timezone.now()
+            new_rows = Q(id__gt=version)
+            if synced_wall is not None:
+                # Kechroq commit bo'lgan kichik id'li qatorlar ham tushib qolmasin
+                new_rows |= Q(revoked_at__gte=synced_wall - timedelta(seconds=60))
+            rows = TokenRevocation.objects.filter(new_rows, expires_at__gt=wall).order_by('id').values_list(
+                'id', 'kind', 'key', 'revoked_at', 'expires_at',
+            )
+            for row_id, kind, key, revoked_at, expires_at in rows.iterator(chunk_size=2000):
+                self._add_to(structures, kind, key, revoked_at.timestamp(), expires_at.timestamp())
+                version = max(version, row_id)
+            if rebuild:
+                self.users, self.tokens, self.bloom = structures
+                self.rebuilt_at = now
+            self.version = version
+            self.synced_at = now
+            self.synced_wall = wall
+
+    def is_revoked(self, token):
+        """Microsecond check of a validated token (jti, user_id va issued_at/iat bo'yicha)"""
+        self.sync()
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti and f't:{jti}' in self.bloom and jti in self.tokens:
+            return True
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and f'u:{user_id}' in self.bloom:
+            revoked_at = self.users.get(int(user_id))
+            issued_at = token.get('issued_at', token.get('iat', 0))
+            if revoked_at is not None and issued_at < revoked_at:
+                return True
+        return False
+
+    def record(self, kind, key, revoked_at, expires_at):
+        """Apply a revocation written by this process without waiting for the next sync"""
+        with self._lock:
+            self._add_to((self.users, self.tokens, self.bloom), kind, key, revoked_at.timestamp(), expires_at.timestamp())
+
+
+revocations = RevocationSet()
+
+
+def revoke_user(user_id):
+    """Reject every token of the user issued before now"""
+    now = timezone.now()
+    row = TokenRevocation.objects.create(
+        kind='user', key=str(user_id), revoked_at=now, expires_at=now + _max_token_lifetime(),
+    )
+    revocations.record(row.kind, row.key, row.revoked_at, row.expires_at)
+    return row
+
+
+def revoke_token(token):
+    """Reject one token (logout) until it would have expired anyway"""
+    jti = token.get(api_settings.JTI_CLAIM)
+    if not jti:
+        return None
+    now = timezone.now()
+    expires_at = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc) if token.get('exp') else (
+        now + _max_token_lifetime()
+    )
+    row = TokenRevocation.objects.create(kind='token', key=jti, revoked_at=now, expires_at=expires_at)
+    revocations.record(row.kind, row.key, row.revoked_at, row.expires_at)
+    return row
+
+
+def prune_revocations(now=None):
+    """Delete rows whose tokens have all expired"""
+    deleted, _ = TokenRevocation.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,658 @@
+"""
+Dars jadvali bilan bog'liq hisob-kitoblar: xonalar bandligi va h.k.
+
+Vaqt oraliqlari daqiqalarda (kun boshidan) ifodalanadi.
+"""
+
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .caching import bump_version, versioned_key
+from .models import GroupSchedule, Holiday, Lesson, Room, RoomOccupancy, Teacher
+from .occupancy import refresh_occupancy, slot_mask, to_bitmap
+
+VIRTUAL_LESSON_RE = re.compile(r'^v-(\d+)-(\d{8})$')
+# Lazy guruh qoidalari (GroupSchedule, Holiday, Group) o'zgarganda oshiriladi
+LAZY_SCHEDULES_NAMESPACE = 'lazy_schedules'
+
+
+def minutes_of(value):
+    """datetime.time -> minutes since midnight"""
+    return value.hour * 60 + value.minute
+
+
+def _clock(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def merge_intervals(intervals):
+    """Union of (start, end) intervals, sorted and non-overlapping"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def clipped_length(intervals, low, high):
+    """Total length of merged intervals inside [low, high)"""
+    return sum(max(0, min(end, high) - max(start, low)) for start, end in intervals)
+
+
+def room_schedule_namespace(branch_id):
+    """Cache namespace invalidated on every lesson/room write of a branch"""
+    return f'room_schedule:{branch_id}'
+
+
+def open_window():
+    """Branch opening hours from settings as (start, end) minutes"""
+    start, end = getattr(settings, 'ROOM_OPEN_HOURS', ('08:00', '20:00'))
+    to_minutes = lambda text: int(text[:2]) * 60 + int(text[3:5])
+    return to_minutes(start), to_minutes(end)
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _compute_weeks(branch_id, rooms, weeks):
+    """
+    Daily occupancy of every room for the given weeks with a single lesson query.
+
+    Natija: {week_start: {room_id: {date_iso: {...}}}}
+    """
+    capacities = {room[0]: room[1] for room in rooms}
+    date_from = min(weeks)
+    date_to = max(weeks) + timedelta(days=6)
+
+    lessons = (
+        Lesson.objects.filter(
+            room__branch_id=branch_id,
+            date__gte=date_from,
+            date__lte=date_to,
+            is_cancelled=False,
+        )
+        .annotate(group_size=Count('group__students'))
+        .values_list('room_id', 'date', 'start_time', 'end_time', 'group_size')
+        .order_by()
+    )
+
+    intervals = defaultdict(list)
+    lesson_counts = defaultdict(int)
+    raw_minutes = defaultdict(int)
+    seat_minutes = defaultdict(float)
+    for room_id, day, start_time, end_time, group_size in lessons:
+        start, end = minutes_of(start_time), minutes_of(end_time)
+        if end <= start:
+            continue
+        key = (room_id, day)
+        intervals[key].append((start, end))
+        lesson_counts[key] += 1
+        raw_minutes[key] += end - start
+        capacity = capacities.get(room_id) or 0
+        if capacity:
+            seat_minutes[key] += group_size / capacity * (end - start)
+
+    low, high = open_window()
+    open_days = set(getattr(settings, 'ROOM_OPEN_WEEKDAYS', range(7)))
+    result = {week: {room_id: {} for room_id in capacities} for week in weeks}
+    for week in weeks:
+        for offset in range(7):
+            day = week + timedelta(days=offset)
+            day_open = (high - low) if day.weekday() in open_days else 0
+            for room_id in capacities:
+                key = (room_id, day)
+                merged = merge_intervals(intervals.get(key, ()))
+                booked = sum(end - start for start, end in merged)
+                result[week][room_id][day.isoformat()] = {
+                    'open': day_open,
+                    'booked': booked,
+                    'booked_in_hours': clipped_length(merged, low, high) if day_open else 0,
+                    'overlap': raw_minutes.get(key, 0) - booked,
+                    'lessons': lesson_counts.get(key, 0),
+                    'seat_minutes': seat_minutes.get(key, 0.0),
+                }
+    return result
+
+
+def _percent(part, whole):
+    return round(part / whole * 100, 2) if whole else None
+
+
+def room_utilization(branch_id, date_from, date_to, room_id=None):
+    """
+    Booked hours vs open hours and seat fill of each room of a branch.
+
+    Har bir hafta alohida keshlanadi; keshda yo'q haftalar bitta so'rov bilan
+    hisoblanadi. Kesh shu filial darslari/xonalari o'zgarganda eskiradi.
+    """
+    rooms = list(
+        Room.objects.filter(branch_id=branch_id)
+        .values_list('id', 'capacity', 'name', 'is_available')
+        .order_by('name')
+    )
+
+    weeks = []
+    day = week_start(date_from)
+    while day <= date_to:
+        weeks.append(day)
+        day += timedelta(days=7)
+
+    namespace = room_schedule_namespace(branch_id)
+    keys = {week: versioned_key(namespace, 'utilization', week.isoformat()) for week in weeks}
+    cached = cache.get_many(list(keys.values()))
+    per_week = {week: cached[key] for week, key in keys.items() if key in cached}
+
+    missing = [week for week in weeks if week not in per_week]
+    if missing and rooms:
+        computed = _compute_weeks(branch_id, rooms, missing)
+        cache.set_many(
+            {keys[week]: data for week, data in computed.items()},
+            timeout=getattr(settings, 'ROOM_UTILIZATION_CACHE_TIMEOUT', 60 * 60),
+        )
+        per_week.update(computed)
+
+    report = []
+    totals = {'booked': 0, 'open': 0}
+    for rid, capacity, name, is_available in rooms:
+        if room_id and rid != room_id:
+            continue
+        days, weekly = [], []
+        room_totals = defaultdict(float)
+        for week in weeks:
+            week_totals = defaultdict(float)
+            for iso, cell in per_week.get(week, {}).get(rid, {}).items():
+                if not (date_from.isoformat() <= iso <= date_to.isoformat()):
+                    continue
+                days.append({
+                    'date': iso,
+                    'lessons': cell['lessons'],
+                    'booked_hours': round(cell['booked'] / 60, 2),
+                    'open_hours': round(cell['open'] / 60, 2),
+                    'utilization': _percent(cell['booked_in_hours'], cell['open']),
+                })
+                for field in ('booked', 'booked_in_hours', 'open', 'overlap', 'lessons', 'seat_minutes'):
+                    week_totals[field] += cell[field]
+            if week_totals:
+                weekly.append({
+                    'week': f'{week.isocalendar()[0]}-W{week.isocalendar()[1]:02d}',
+                    'booked_hours': round(week_totals['booked'] / 60, 2),
+                    'open_hours': round(week_totals['open'] / 60, 2),
+                    'utilization': _percent(week_totals['booked_in_hours'], week_totals['open']),
+                })
+                for field, value in week_totals.items():
+                    room_totals[field] += value
+
+        report.append({
+            'room': rid,
+            'name': name,
+            'capacity': capacity,
+            'is_available': is_available,
+            'lessons': int(room_totals['lessons']),
+            'booked_hours': round(room_totals['booked'] / 60, 2),
+            'open_hours': round(room_totals['open'] / 60, 2),
+            'utilization': _percent(room_totals['booked_in_hours'], room_totals['open']),
+            'overlap_hours': round(room_totals['overlap'] / 60, 2),
+            # O'rtacha to'lganlik: guruh hajmi / xona sig'imi, dars davomiyligi bo'yicha vaznlangan
+            'seat_fill': _percent(room_totals['seat_minutes'], room_totals['booked'] + room_totals['overlap']),
+            'weeks': weekly,
+            'days': days,
+        })
+        totals['booked'] += room_totals['booked_in_hours']
+        totals['open'] += room_totals['open']
+
+    low, high = open_window()
+    return {
+        'branch': branch_id,
+        'from': date_from,
+        'to': date_to,
+        'open_hours': {'start': _clock(low), 'end': _clock(high)},
+        'utilization': _percent(totals['booked'], totals['open']),
+        'rooms': report,
+    }
+
+
+def lock_resources(room_ids=(), teacher_ids=()):
+    """
+    Lock the room and teacher rows until the surrounding transaction ends.
+
+    Tekshiruv (overlapping_lessons/find_conflicts) va saqlash orasida boshqa
+    so'rov shu xona/o'qituvchiga dars yoza olmasin; chaqiruvchi
+    transaction.atomic() ichida bo'lishi kerak. Tartib doim xonalar, keyin
+    o'qituvchilar, pk bo'yicha o'sib boruvchi (deadlock yo'q).
+    """
+    room_ids = sorted({pk for pk in room_ids if pk})
+    teacher_ids = sorted({pk for pk in teacher_ids if pk})
+    if room_ids:
+        list(Room.objects.select_for_update().filter(pk__in=room_ids).order_by('pk').values_list('pk', flat=True))
+    if teacher_ids:
+        list(Teacher.objects.select_for_update().filter(pk__in=teacher_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def overlapping_lessons(date, start_time, end_time, room_id=None, teacher_id=None, exclude_id=None):
+    """
+    Existing, not cancelled lessons that overlap the slot in the same room or with the same teacher.
+
+    (room, date, start_time) va (teacher, date, start_time) indekslari tufayli
+    so'rov faqat shu xona/o'qituvchining o'sha kundagi darslarini o'qiydi.
+    """
+    resource = Q()
+    if room_id:
+        resource |= Q(room_id=room_id)
+    if teacher_id:
+        resource |= Q(teacher_id=teacher_id)
+    if not resource:
+        return Lesson.objects.none()
+
+    queryset = Lesson.objects.filter(
+        resource,
+        date=date,
+        is_cancelled=False,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    )
+    if exclude_id:
+        queryset = queryset.exclude(pk=exclude_id)
+    return queryset
+
+
+def find_conflicts(proposed):
+    """
+    Report every room/teacher double booking in a batch of proposed lessons.
+
+    proposed: dict'lar ro'yxati - ref, id (mavjud darsni o'zgartirish uchun),
+    group (ixtiyoriy), room, teacher, date, start_time, end_time. Mavjud darslar
+    bitta so'rov bilan olinadi, so'ng har bir (resurs, kun) uchun sweep-line
+    bilan tekshiriladi.
+    Taklif vs mavjud va taklif vs taklif to'qnashuvlari qaytariladi.
+    """
+    if not proposed:
+        return []
+
+    # Ko'chirilayotgan dars uchun room/teacher berilmagan bo'lsa, joriy qiymati olinadi
+    partial = {
+        item['id'] for item in proposed
+        if item.get('id') and ('room' not in item or 'teacher' not in item)
+    }
+    if partial:
+        current = {
+            lesson_id: {'room': room_id, 'teacher': teacher_id}
+            for lesson_id, room_id, teacher_id in Lesson.objects.filter(pk__in=partial)
+            .values_list('id', 'room_id', 'teacher_id')
+        }
+        proposed = [
+            {**current.get(item.get('id'), {}), **item} if item.get('id') in partial else item
+            for item in proposed
+        ]
+
+    dates = {item['date'] for item in proposed}
+    room_ids = {item['room'] for item in proposed if item.get('room')}
+    teacher_ids = {item['teacher'] for item in proposed if item.get('teacher')}
+    replaced_ids = {item['id'] for item in proposed if item.get('id')}
+
+    existing = (
+        Lesson.objects.filter(
+            Q(room_id__in=room_ids) | Q(teacher_id__in=teacher_ids),
+            date__in=dates,
+            is_cancelled=False,
+        )
+        .exclude(pk__in=replaced_ids)
+        .values_list('id', 'room_id', 'teacher_id', 'date', 'start_time', 'end_time')
+        .order_by()
+    )
+
+    # Lazy guruhlarning hali saqlanmagan darslari ham band vaqt hisoblanadi
+    # (taklif shu mashg'ulotning o'zini saqlayotgan bo'lsa, u hisobga olinmaydi)
+    replaced_slots = {
+        (item['group'], item['date'], item['start_time']) for item in proposed if item.get('group')
+    }
+    existing = list(existing) + [
+        (item['id'], item['room'], item['teacher'], item['date'], item['start_time'], item['end_time'])
+        for item in virtual_lessons(min(dates), max(dates), resource_schedules(room_ids, teacher_ids))
+        if item['date'] in dates
+        and (item['room'] in room_ids or item['teacher'] in teacher_ids)
+        and (item['group'], item['date'], item['start_time']) not in replaced_slots
+    ]
+
+    timeline = defaultdict(list)
+    for lesson_id, room_id, teacher_id, day, start_time, end_time in existing:
+        entry = (minutes_of(start_time), minutes_of(end_time), 'lesson', lesson_id)
+        if room_id in room_ids:
+            timeline[('room', room_id, day)].append(entry)
+        if teacher_id in teacher_ids:
+            timeline[('teacher', teacher_id, day)].append(entry)
+
+    for index, item in enumerate(proposed):
+        entry = (
+            minutes_of(item['start_time']), minutes_of(item['end_time']),
+            'proposed', item.get('ref', index),
+        )
+        if item.get('room'):
+            timeline[('room', item['room'], item['date'])].append(entry)
+        if item.get('teacher'):
+            timeline[('teacher', item['teacher'], item['date'])].append(entry)
+
+    conflicts = []
+    for (resource, resource_id, day), entries in timeline.items():
+        active = []
+        for start, end, kind, ref in sorted(entries):
+            active = [other for other in active if other[1] > start]
+            for other_start, other_end, other_kind, other_ref in active:
+                if kind == 'lesson' and other_kind == 'lesson':
+                    continue
+                # Har doim taklif qilingan dars birinchi ko'rsatiladi
+                first, second = ((kind, ref), (other_kind, other_ref))
+                if kind == 'lesson':
+                    first, second = second, first
+                conflicts.append({
+                    'resource': resource,
+                    'resource_id': resource_id,
+                    'date': day,
+                    'proposed': first[1],
+                    'conflicts_with': {second[0]: second[1]},
+                    'overlap': [_clock(start), _clock(min(end, other_end))],
+                })
+            active.append((start, end, kind, ref))
+    conflicts.sort(key=lambda c: (c['date'], c['resource'], c['resource_id'], c['overlap']))
+    return conflicts
+
+
+def invalidate_room_schedules(room_ids):
+    """Bump the utilization cache of every branch owning one of the rooms"""
+    room_ids = set(room_ids) - {None}
+    if not room_ids:
+        return
+    branch_ids = Room.objects.filter(pk__in=room_ids).values_list('branch_id', flat=True).distinct()
+    for branch_id in branch_ids:
+        bump_version(room_schedule_namespace(branch_id))
+
+
+def generate_group_lessons(group, date_from=None, date_to=None, dry_run=False):
+    """
+    Materialize lessons of a group from its GroupSchedule slots with one bulk_create.
+
+    Bayram kunlari va shu guruhda allaqachon mavjud (sana, boshlanish vaqti)
+    darslar o'tkazib yuboriladi; xona/o'qituvchi to'qnashuvlari butun partiya
+    uchun bitta find_conflicts() chaqiruvida tekshiriladi va ular yaratilmaydi.
+    """
+    date_from = max(date_from or group.start_date, group.start_date)
+    date_to = min(date_to or group.end_date, group.end_date)
+
+    slots = list(group.schedules.all())
+    holidays = set(
+        Holiday.objects.filter(
+            educational_center_id=group.educational_center_id,
+            date__gte=date_from,
+            date__lte=date_to,
+        ).values_list('date', flat=True)
+    )
+    existing = set(
+        Lesson.objects.filter(group=group, date__gte=date_from, date__lte=date_to)
+        .values_list('date', 'start_time')
+        .order_by()
+    )
+
+    by_weekday = defaultdict(list)
+    for slot in slots:
+        by_weekday[slot.weekday].append(slot)
+
+    candidates = []
+    skipped_holidays = skipped_existing = 0
+    day = date_from
+    while day <= date_to:
+        for slot in by_weekday.get(day.weekday(), ()):
+            if day in holidays:
+                skipped_holidays += 1
+            elif (day, slot.start_time) in existing:
+                skipped_existing += 1
+            else:
+                candidates.append({
+                    'ref': f'{day.isoformat()}T{slot.start_time:%H:%M}',
+                    'group': group.id,
+                    'room': slot.room_id or group.room_id,
+                    'teacher': slot.teacher_id or group.teacher_id,
+                    'date': day,
+                    'start_time': slot.start_time,
+                    'end_time': slot.end_time,
+                })
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        # Bitta darslik yo'l (LessonSerializer) bilan bir xil qulflar: tekshiruv va insert orasida
+        # parallel yaratilgan/ko'chirilgan dars xona yoki o'qituvchini band qila olmaydi
+        if not dry_run:
+            lock_resources(
+                room_ids={item['room'] for item in candidates},
+                teacher_ids={item['teacher'] for item in candidates},
+            )
+        conflicts = find_conflicts(candidates)
+        conflicting = {c['proposed'] for c in conflicts}
+        conflicting.update(c['conflicts_with']['proposed'] for c in conflicts if 'proposed' in c['conflicts_with'])
+
+        lessons = [
+            Lesson(
+                group=group,
+                teacher_id=item['teacher'],
+                room_id=item['room'],
+                date=item['date'],
+                start_time=item['start_time'],
+                end_time=item['end_time'],
+                duration=minutes_of(item['end_time']) - minutes_of(item['start_time']),
+            )
+            for item in candidates
+            if item['ref'] not in conflicting
+        ]
+        if lessons and not dry_run:
+            Lesson.objects.bulk_create(lessons, batch_size=500)
+            invalidate_room_schedules({lesson.room_id for lesson in lessons})
+            refresh_occupancy({(lesson.room_id, lesson.date) for lesson in lessons})
+
+    return {
+        'group': group.id,
+        'from': date_from,
+        'to': date_to,
+        'dry_run': dry_run,
+        'slots': len(slots),
+        'created': len(lessons),
+        'skipped_holidays': skipped_holidays,
+        'skipped_existing': skipped_existing,
+        'conflicts_count': len(conflicts),
+        'conflicts': conflicts,
+    }
+
+
+def virtual_lesson_id(schedule_id, day):
+    """Id of a not-yet-stored occurrence: v-<GroupSchedule id>-<YYYYMMDD>"""
+    return f'v-{schedule_id}-{day:%Y%m%d}'
+
+
+def parse_virtual_lesson_id(value):
+    """(schedule_id, date) of a virtual lesson id, None for a normal pk"""
+    match = VIRTUAL_LESSON_RE.match(str(value))
+    if not match:
+        return None
+    try:
+        return int(match.group(1)), datetime.strptime(match.group(2), '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+def lazy_schedules(center_id=None, group_id=None, teacher_id=None, room_id=None):
+    """Weekly slots of lazy_schedule groups; teacher/room filter uses the group's value when the slot has none"""
+    queryset = GroupSchedule.objects.filter(group__lazy_schedule=True)
+    if center_id:
+        queryset = queryset.filter(group__educational_center_id=center_id)
+    if group_id:
+        queryset = queryset.filter(group_id=group_id)
+    if teacher_id:
+        queryset = queryset.filter(
+            Q(teacher_id=teacher_id) | Q(teacher__isnull=True, group__teacher_id=teacher_id)
+        )
+    if room_id:
+        queryset = queryset.filter(Q(room_id=room_id) | Q(room__isnull=True, group__room_id=room_id))
+    return queryset
+
+
+def resource_schedules(room_ids=(), teacher_ids=()):
+    """Lazy slots that occupy any of the rooms or teachers (conflict tekshiruvi uchun)"""
+    room_ids, teacher_ids = list(room_ids), list(teacher_ids)
+    resource = Q()
+    if room_ids:
+        resource |= Q(room_id__in=room_ids) | Q(room__isnull=True, group__room_id__in=room_ids)
+    if teacher_ids:
+        resource |= Q(teacher_id__in=teacher_ids) | Q(teacher__isnull=True, group__teacher_id__in=teacher_ids)
+    if not resource:
+        return GroupSchedule.objects.none()
+    return lazy_schedules().filter(resource)
+
+
+def virtual_lessons(date_from, date_to, schedules=None):
+    """
+    Expand lazy groups' weekly slots into lesson-like dicts for a date window.
+
+    Bayram kunlari va allaqachon Lesson sifatida saqlangan (guruh, sana,
+    boshlanish vaqti) mashg'ulotlar qaytarilmaydi - saqlangan qator ustun.
+    """
+    schedules = lazy_schedules() if schedules is None else schedules
+    schedules = schedules.filter(group__start_date__lte=date_to, group__end_date__gte=date_from)
+    if (date_to - date_from).days < 6:
+        weekdays = {(date_from + timedelta(days=i)).weekday() for i in range((date_to - date_from).days + 1)}
+        schedules = schedules.filter(weekday__in=weekdays)
+    slots = list(schedules.select_related(
+        'group', 'group__room', 'group__teacher__user', 'room', 'teacher__user',
+    ))
+    if not slots:
+        return []
+
+    holidays = set(
+        Holiday.objects.filter(
+            educational_center_id__in={slot.group.educational_center_id for slot in slots},
+            date__gte=date_from,
+            date__lte=date_to,
+        ).values_list('educational_center_id', 'date')
+    )
+    stored = set(
+        Lesson.objects.filter(
+            group_id__in={slot.group_id for slot in slots}, date__gte=date_from, date__lte=date_to
+        )
+        .values_list('group_id', 'date', 'start_time')
+        .order_by()
+    )
+
+    occurrences = []
+    for slot in slots:
+        group = slot.group
+        room = slot.room or group.room
+        teacher = slot.teacher or group.teacher
+        first = max(date_from, group.start_date)
+        last = min(date_to, group.end_date)
+        day = first + timedelta(days=(slot.weekday - first.weekday()) % 7)
+        while day <= last:
+            if (group.educational_center_id, day) not in holidays and (group.id, day, slot.start_time) not in stored:
+                occurrences.append({
+                    'id': virtual_lesson_id(slot.id, day),
+                    'group': group.id,
+                    'group_name': group.name,
+                    'teacher': teacher.id if teacher else None,
+                    'teacher_name': teacher.user.get_full_name() if teacher else None,
+                    'room': room.id if room else None,
+                    'room_name': room.name if room else None,
+                    'date': day,
+                    'start_time': slot.start_time,
+                    'end_time': slot.end_time,
+                    'duration': minutes_of(slot.end_time) - minutes_of(slot.start_time),
+                    'online_link': '',
+                    'is_cancelled': False,
+                    'is_virtual': True,
+                    'created_at': None,
+                    'updated_at': None,
+                })
+            day += timedelta(days=7)
+    occurrences.sort(key=lambda item: (item['date'], item['start_time']))
+    return occurrences
+
+
+def merge_lessons(stored, virtual):
+    """Serialized stored lessons + virtual occurrences ordered by date and time"""
+    return sorted([*stored, *virtual], key=lambda item: (str(item['date']), str(item['start_time'])))
+
+
+def materialize_virtual_lesson(virtual_id, schedules=None):
+    """
+    Store a virtual occurrence as a Lesson row (or return the stored one).
+
+    Davomat, bekor qilish yoki online link biriktirilganda chaqiriladi.
+    Slot qatori qulflanadi, shuning uchun parallel so'rovlar bitta dars yaratadi.
+    """
+    parsed = parse_virtual_lesson_id(virtual_id)
+    if parsed is None:
+        return None
+    schedule_id, day = parsed
+    schedules = lazy_schedules() if schedules is None else schedules
+
+    with transaction.atomic():
+        slot = schedules.select_for_update().select_related('group').filter(pk=schedule_id).first()
+        if slot is None or slot.weekday != day.weekday():
+            return None
+        group = slot.group
+        if not group.start_date <= day <= group.end_date:
+            return None
+        if Holiday.objects.filter(educational_center_id=group.educational_center_id, date=day).exists():
+            return None
+        lesson, _ = Lesson.objects.get_or_create(
+            group=group,
+            date=day,
+            start_time=slot.start_time,
+            defaults={
+                'teacher_id': slot.teacher_id or group.teacher_id,
+                'room_id': slot.room_id or group.room_id,
+                'end_time': slot.end_time,
+                'duration': minutes_of(slot.end_time) - minutes_of(slot.start_time),
+            },
+        )
+    return lesson
+
+
+def available_rooms(branch_id, date_from, date_to, start_time, end_time, min_capacity=None):
+    """
+    Rooms of a branch free for [start_time, end_time) on each day of the range.
+
+    Saqlangan darslar RoomOccupancy bitmaplaridan o'qiladi (kun/xona uchun
+    bitta `&`), lazy guruhlarning virtual darslari esa ustiga qo'shiladi.
+    """
+    rooms = Room.objects.filter(branch_id=branch_id, is_available=True)
+    if min_capacity:
+        rooms = rooms.filter(capacity__gte=min_capacity)
+    rooms = list(rooms.values('id', 'name', 'capacity').order_by('name'))
+    if not rooms:
+        return []
+    room_ids = [room['id'] for room in rooms]
+
+    busy = defaultdict(int)
+    bitmaps = RoomOccupancy.objects.filter(
+        room_id__in=room_ids, date__gte=date_from, date__lte=date_to
+    ).values_list('room_id', 'date', 'slots')
+    for room_id, day, slots in bitmaps:
+        busy[(room_id, day)] = to_bitmap(slots)
+    for item in virtual_lessons(date_from, date_to, lazy_schedules().filter(
+        Q(room_id__in=room_ids) | Q(room__isnull=True, group__room_id__in=room_ids)
+    )):
+        busy[(item['room'], item['date'])] |= slot_mask(item['start_time'], item['end_time'])
+
+    mask = slot_mask(start_time, end_time)
+    days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+    result = []
+    for room in rooms:
+        free = [day for day in days if not busy[(room['id'], day)] & mask]
+        if free:
+            result.append({**room, 'free_dates': free})
+    return result
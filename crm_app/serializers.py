@@ -3,8 +3,10 @@ from django.contrib.auth.models import User
 from .models import (
     EducationalCenter, UserProfile, Branch, Subject, Group, Student, 
     Teacher, Lesson, Attendance, Payment, Assignment, AssignmentSubmission,
-    Exam, ExamResult, Room, Payroll, Notification, Contract, Lead
+    Exam, ExamResult, Room, Payroll, Notification, Contract, Lead,
+    GroupSchedule, GroupWaitlist, Holiday, BroadcastJob, AbsenceStreak
 )
+from .scheduling import lock_resources, overlapping_lessons, resource_schedules, virtual_lessons
 
 # class UserProfileSerializer(serializers.ModelSerializer):
 #     class Meta:
@@ -224,10 +226,13 @@ class GroupSerializer(serializers.ModelSerializer):
             'status',
             'start_date',
             'end_date',
+            'lazy_schedule',
+            'weekly_hours',
+            'enrolled_count',
             'created_at',
             'updated_at'
         )
-        read_only_fields = ('educational_center', 'created_at', 'updated_at')
+        read_only_fields = ('educational_center', 'enrolled_count', 'created_at', 'updated_at')
 
 
 class StudentSerializer(serializers.ModelSerializer):
@@ -254,13 +259,16 @@ class StudentSerializer(serializers.ModelSerializer):
             'parent_name',
             'parent_phone',
             'parent_email',
+            'parent_user',
             'address',
             'passport_number',
             'image',
+            'user',
             'created_at',
             'updated_at',
         )
-        read_only_fields = ('enrollment_date', 'created_at', 'updated_at')
+        # parent_user eslatma/ogohlantirishlarni oladi - faqat admin panelda biriktiriladi
+        read_only_fields = ('enrollment_date', 'parent_user', 'created_at', 'updated_at')
 
 class TeacherSerializer(serializers.ModelSerializer):
     """Teacher serializer"""
@@ -285,14 +293,138 @@ class LessonSerializer(serializers.ModelSerializer):
     group_name = serializers.CharField(source='group.name', read_only=True)
     teacher_name = serializers.CharField(source='teacher.user.get_full_name', read_only=True)
     room_name = serializers.CharField(source='room.name', read_only=True)
+    is_virtual = serializers.SerializerMethodField()
     
     class Meta:
         model = Lesson
         fields = ('id', 'group', 'group_name', 'teacher', 'teacher_name', 'room', 'room_name',
                  'date', 'start_time', 'end_time', 'duration', 'online_link', 'is_cancelled',
-                 'created_at', 'updated_at')
+                 'is_virtual', 'created_at', 'updated_at')
         read_only_fields = ('created_at', 'updated_at')
 
+    def get_is_virtual(self, obj):
+        # Saqlangan dars; virtual mashg'ulotlar scheduling.virtual_lessons() dan keladi
+        return False
+
+    def validate(self, attrs):
+        """Xona yoki o'qituvchi shu vaqtda band bo'lsa - xatolik"""
+        current = lambda name: attrs.get(name, getattr(self.instance, name, None))
+        start_time, end_time = current('start_time'), current('end_time')
+        if start_time and end_time and start_time >= end_time:
+            raise serializers.ValidationError({'end_time': 'end_time must be after start_time'})
+
+        if current('is_cancelled') or not current('date'):
+            return attrs
+
+        room, teacher = current('room'), current('teacher')
+        # LessonViewSet create/update atomic() ichida: qulf saqlashgacha turadi
+        lock_resources(room_ids=[room.pk] if room else (), teacher_ids=[teacher.pk] if teacher else ())
+        overlapping = overlapping_lessons(
+            current('date'), start_time, end_time,
+            room_id=room.pk if room else None,
+            teacher_id=teacher.pk if teacher else None,
+            exclude_id=self.instance.pk if self.instance else None,
+        ).values_list('id', 'room_id', 'teacher_id', 'start_time', 'end_time')
+
+        # Lazy guruhlarning saqlanmagan mashg'ulotlari (shu darsning o'zidan tashqari)
+        virtual = []
+        if room or teacher:
+            group = current('group')
+            schedules = resource_schedules(
+                room_ids=[room.pk] if room else [], teacher_ids=[teacher.pk] if teacher else [],
+            )
+            virtual = [
+                (item['id'], item['room'], item['teacher'], item['start_time'], item['end_time'])
+                for item in virtual_lessons(current('date'), current('date'), schedules)
+                if item['start_time'] < end_time and item['end_time'] > start_time
+                and item['id'] != self.context.get('virtual_id')
+                and not (group and item['group'] == group.pk and item['start_time'] == start_time)
+            ]
+
+        errors = []
+        for lesson_id, room_id, teacher_id, other_start, other_end in [*overlapping, *virtual]:
+            slot = f"lesson {lesson_id} ({other_start:%H:%M}-{other_end:%H:%M})"
+            if room and room_id == room.pk:
+                errors.append(f"Room is already booked by {slot}")
+            if teacher and teacher_id == teacher.pk:
+                errors.append(f"Teacher is already teaching {slot}")
+        if errors:
+            raise serializers.ValidationError({'conflicts': errors})
+        return attrs
+
+
+class GroupScheduleSerializer(serializers.ModelSerializer):
+    """Weekly recurrence slot of a group"""
+    group_name = serializers.CharField(source='group.name', read_only=True)
+    weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+
+    class Meta:
+        model = GroupSchedule
+        fields = ('id', 'group', 'group_name', 'weekday', 'weekday_display', 'start_time',
+                  'end_time', 'room', 'teacher', 'created_at')
+        read_only_fields = ('created_at',)
+
+    def validate(self, attrs):
+        start = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start and end and start >= end:
+            raise serializers.ValidationError({'end_time': 'end_time must be after start_time'})
+        return attrs
+
+
+class GroupWaitlistSerializer(serializers.ModelSerializer):
+    """Waitlist entry of a full group"""
+    student_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GroupWaitlist
+        fields = ('id', 'group', 'student', 'student_name', 'created_at')
+        read_only_fields = fields
+
+    def get_student_name(self, obj):
+        return f"{obj.student.first_name} {obj.student.last_name}"
+
+
+class AbsenceStreakSerializer(serializers.ModelSerializer):
+    """At-risk student: current run of consecutive absences"""
+    student_name = serializers.SerializerMethodField()
+    group = serializers.IntegerField(source='student.group_id', read_only=True)
+    group_name = serializers.CharField(source='student.group.name', read_only=True, default=None)
+
+    class Meta:
+        model = AbsenceStreak
+        fields = ('student', 'student_name', 'group', 'group_name', 'length', 'started_on', 'last_lesson_date',
+                  'updated_at')
+        read_only_fields = fields
+
+    def get_student_name(self, obj):
+        return f"{obj.student.first_name} {obj.student.last_name}"
+
+
+class HolidaySerializer(serializers.ModelSerializer):
+    """Holiday serializer"""
+    class Meta:
+        model = Holiday
+        fields = ('id', 'educational_center', 'date', 'name', 'created_at')
+        read_only_fields = ('educational_center', 'created_at')
+
+
+class ProposedLessonSerializer(serializers.Serializer):
+    """One lesson of a batch schedule change checked by /api/lessons/check-conflicts/"""
+    ref = serializers.CharField(required=False)
+    id = serializers.IntegerField(required=False, help_text="Existing lesson being moved")
+    group = serializers.IntegerField(required=False, allow_null=True)
+    room = serializers.IntegerField(required=False, allow_null=True)
+    teacher = serializers.IntegerField(required=False, allow_null=True)
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, attrs):
+        if attrs['start_time'] >= attrs['end_time']:
+            raise serializers.ValidationError({'end_time': 'end_time must be after start_time'})
+        return attrs
+
 
 class AttendanceSerializer(serializers.ModelSerializer):
     """Attendance serializer"""
@@ -411,6 +543,33 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at',)
 
 
+class BroadcastJobSerializer(serializers.ModelSerializer):
+    """Broadcast announcement and its delivery progress"""
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BroadcastJob
+        fields = ('id', 'educational_center', 'created_by', 'target_type', 'target_id', 'role',
+                  'notification_type', 'title', 'message', 'status', 'total', 'sent', 'progress',
+                  'error', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = ('educational_center', 'created_by', 'status', 'total', 'sent', 'error',
+                            'created_at', 'started_at', 'finished_at')
+
+    def get_progress(self, obj) -> float:
+        """Delivered share in percent"""
+        if obj.status == 'Completed':
+            return 100.0
+        return round(obj.sent * 100 / obj.total, 1) if obj.total else 0.0
+
+    def validate(self, data):
+        target_type = data.get('target_type')
+        if target_type in ('group', 'branch') and not data.get('target_id'):
+            raise serializers.ValidationError({'target_id': f'Required for target_type "{target_type}"'})
+        if target_type == 'role' and not data.get('role'):
+            raise serializers.ValidationError({'role': 'Required for target_type "role"'})
+        return data
+
+
 class ContractSerializer(serializers.ModelSerializer):
     """Contract serializer"""
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
@@ -451,6 +610,8 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 
+from .login_guard import guarded_authenticate
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
@@ -460,7 +621,8 @@ class LoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         if username and password:
-            user = authenticate(username=username, password=password)
+            # Cheklov + chegaralangan xeshlash pooli (crm_app.login_guard)
+            user = guarded_authenticate(self.context['request'], username, password)
             if user is None:
                 raise serializers.ValidationError("Invalid username or password")
             if not user.is_active:
@@ -0,0 +1,207 @@
+"""
+Model signallari: hisobot keshlarini ma'lumot o'zgarganda eskirtirish.
+"""
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .analytics import exam_results_namespace
+from .authentication import revoke_user_tokens
+from .caching import bump_version
+from .enrollment import promote_waitlist, release_seats, sync_group_change
+from .events import lesson_channels, publish_on_commit
+from .occupancy import refresh_occupancy
+from .models import (
+    Attendance, Exam, ExamResult, Group, GroupSchedule, Holiday, Lesson, Notification, NotificationCounter, Payment, Room,
+    Student, UserProfile,
+)
+from .notifications import bump_unread
+from .scheduling import LAZY_SCHEDULES_NAMESPACE, invalidate_room_schedules, room_schedule_namespace
+
+
+@receiver([post_save, post_delete], sender=ExamResult)
+def invalidate_exam_statistics(sender, instance, **kwargs):
+    """Exam natijalari o'zgarganda statistika keshini yangilash"""
+    bump_version(exam_results_namespace(instance.exam_id))
+    bump_version(exam_results_namespace())
+
+
+@receiver([post_save, post_delete], sender=Exam)
+def invalidate_exam(sender, instance, **kwargs):
+    """passing_score/total_points/title o'zgarsa o'tish foizi va taqqoslash nomlari ham eskiradi"""
+    bump_version(exam_results_namespace(instance.id))
+    bump_version(exam_results_namespace())
+
+
+@receiver(post_init, sender=Lesson)
+def remember_lesson_room(sender, instance, **kwargs):
+    """Dars boshqa xona/kunga ko'chirilsa eskisini ham yangilash uchun"""
+    instance._initial_room_id = instance.room_id
+    instance._initial_date = instance.date
+    instance._initial_cancelled = instance.is_cancelled
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def invalidate_room_schedule(sender, instance, **kwargs):
+    """Dars o'zgarganda xona bandligi keshi va bitmapini yangilash"""
+    initial_room_id = getattr(instance, '_initial_room_id', None)
+    invalidate_room_schedules({instance.room_id, initial_room_id})
+    refresh_occupancy({
+        (instance.room_id, instance.date),
+        (initial_room_id, getattr(instance, '_initial_date', None)),
+    })
+    instance._initial_room_id = instance.room_id
+    instance._initial_date = instance.date
+
+
+@receiver(post_save, sender=Lesson)
+def publish_lesson_cancelled(sender, instance, created, **kwargs):
+    """lesson_cancelled: markaz, guruh va o'qituvchi kanallariga"""
+    cancelled = instance.is_cancelled and (created or not instance._initial_cancelled)
+    instance._initial_cancelled = instance.is_cancelled
+    if cancelled:
+        publish_on_commit(
+            [*lesson_channels(instance.group.educational_center_id, instance.teacher_id), f'group:{instance.group_id}'],
+            'lesson_cancelled',
+            {'lesson': instance.pk, 'group': instance.group_id, 'date': instance.date,
+             'start_time': instance.start_time},
+        )
+
+
+@receiver([post_save, post_delete], sender=Room)
+def invalidate_room_branch_schedule(sender, instance, **kwargs):
+    bump_version(room_schedule_namespace(instance.branch_id))
+
+
+@receiver([post_save, post_delete], sender=Group)
+@receiver([post_save, post_delete], sender=GroupSchedule)
+@receiver([post_save, post_delete], sender=Holiday)
+def invalidate_lazy_schedules(sender, instance, **kwargs):
+    """Virtual darslar qoidasi o'zgarganda kalendar lentalari ETag'ini yangilash"""
+    bump_version(LAZY_SCHEDULES_NAMESPACE)
+
+
+@receiver(post_init, sender=Student)
+def remember_student_group(sender, instance, **kwargs):
+    instance._initial_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Student)
+def sync_enrolled_count(sender, instance, created, **kwargs):
+    """Guruh enrollment.py'dan tashqarida (admin va h.k.) o'zgarsa hisoblagichni moslash"""
+    initial_group_id = None if created else instance._initial_group_id
+    managed = getattr(instance, '_enrollment_managed', False)
+    instance._enrollment_managed = False
+    instance._initial_group_id = instance.group_id
+    if not managed and initial_group_id != instance.group_id:
+        sync_group_change(initial_group_id, instance.group_id)
+
+
+@receiver(post_delete, sender=Student)
+def release_student_seat(sender, instance, **kwargs):
+    if instance.group_id:
+        release_seats(instance.group_id)
+        promote_waitlist(instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+def fill_freed_seats(sender, instance, created, **kwargs):
+    """Sig'im oshirilsa navbatdagilarni guruhga o'tkazish"""
+    if not created:
+        promote_waitlist(instance.pk)
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_profile_claims(sender, instance, **kwargs):
+    instance._initial_claims = (instance.role, instance.educational_center_id, instance.is_blocked)
+
+
+@receiver(post_save, sender=UserProfile)
+def revoke_stale_claims(sender, instance, created, **kwargs):
+    """Blok, rol yoki markaz o'zgarsa eski tokenlardagi claim'lar bekor qilinadi"""
+    claims = (instance.role, instance.educational_center_id, instance.is_blocked)
+    if not created and claims != instance._initial_claims:
+        revoke_user_tokens(instance.user_id)
+    instance._initial_claims = claims
+
+
+@receiver(post_init, sender=User)
+def remember_user_credentials(sender, instance, **kwargs):
+    instance._initial_credentials = (instance.is_active, instance.password)
+
+
+@receiver(post_save, sender=User)
+def revoke_on_credentials_change(sender, instance, created, **kwargs):
+    """Parol almashsa yoki foydalanuvchi o'chirilsa (is_active) tokenlar bekor qilinadi"""
+    credentials = (instance.is_active, instance.password)
+    if not created and credentials != instance._initial_credentials:
+        revoke_user_tokens(instance.pk)
+    instance._initial_credentials = credentials
+
+
+@receiver(post_save, sender=User)
+def create_notification_counter(sender, instance, created, **kwargs):
+    if created:
+        NotificationCounter.objects.bulk_create([NotificationCounter(user_id=instance.pk)], ignore_conflicts=True)
+
+
+@receiver(post_delete, sender=UserProfile)
+def revoke_on_profile_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.user_id)
+
+
+@receiver(post_init, sender=Notification)
+def remember_notification_state(sender, instance, **kwargs):
+    instance._initial_unread_user = None if instance.is_read else instance.user_id
+
+
+@receiver(post_save, sender=Notification)
+def count_unread_notification(sender, instance, created, **kwargs):
+    """O'qilmagan hisoblagichni yangilash (yaratish, PATCH is_read/user)"""
+    unread_user = None if instance.is_read else instance.user_id
+    previous = None if created else instance._initial_unread_user
+    if unread_user != previous:
+        bump_unread(previous, -1)
+        bump_unread(unread_user, 1)
+    instance._initial_unread_user = unread_user
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        bump_unread(instance.user_id, -1)
+
+
+@receiver(post_save, sender=Notification)
+def publish_notification(sender, instance, created, **kwargs):
+    if created:
+        publish_on_commit([f'user:{instance.user_id}'], 'notification', {
+            'id': instance.pk, 'notification_type': instance.notification_type,
+            'title': instance.title, 'message': instance.message, 'created_at': instance.created_at,
+        })
+
+
+@receiver(post_save, sender=Attendance)
+def publish_attendance_marked(sender, instance, **kwargs):
+    """bulk-mark bitta Lesson obyektini uzatadi - guruh bir marta yuklanadi"""
+    lesson = instance.lesson
+    publish_on_commit(
+        lesson_channels(lesson.group.educational_center_id, lesson.teacher_id),
+        'attendance_marked',
+        {'lesson': lesson.pk, 'students': [instance.student_id], 'status': instance.status},
+    )
+
+
+@receiver(post_save, sender=Payment)
+def publish_payment_recorded(sender, instance, created, **kwargs):
+    if not created:
+        return
+    channels = [f'center:{instance.group.educational_center_id}']
+    student_user_id = instance.student.user_id
+    if student_user_id:
+        channels.append(f'user:{student_user_id}')
+    publish_on_commit(channels, 'payment_recorded', {
+        'id': instance.pk, 'student': instance.student_id, 'group': instance.group_id,
+        'amount': instance.amount, 'due_date': instance.due_date,
+    })
@@ -0,0 +1,146 @@
+"""
+GET /api/events/ - Server-Sent Events oqimi (ASGI, crm_project/asgi.py).
+
+Ulanish JWT bilan ochiladi (?token=... - EventSource header yubora olmaydi -
+yoki Authorization: Bearer). Har ulanish bitta korutin va bitta navbat:
+oqim band qilinmaydi, shuning uchun minglab bo'sh ulanishlar arzon.
+Hodisalar: notification, lesson_cancelled, attendance_marked,
+payment_recorded; navbat to'lib qolsa "resync" (klient REST orqali qayta
+yuklaydi). Token bekor qilinsa yoki muddati tugasa ulanish yopiladi.
+"""
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+from .authentication import ClaimsJWTAuthentication
+from .events import connection_channels, get_bus
+from .models import Student, Teacher, UserProfile
+from .revocation import revocations
+
+
+def _raw_token(scope):
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            parts = value.decode().split()
+            if len(parts) == 2 and parts[0] in settings.SIMPLE_JWT.get('AUTH_HEADER_TYPES', ('Bearer',)):
+                return parts[1]
+    return None
+
+
+def authenticate_stream(raw_token):
+    """(validated token, channels) or None - ClaimsJWTAuthentication bilan bir xil tekshiruv"""
+    if not raw_token:
+        return None
+    authenticator = ClaimsJWTAuthentication()
+    try:
+        token = authenticator.get_validated_token(raw_token)
+        user = authenticator.get_user(token)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    try:
+        profile = user.profile
+    except UserProfile.DoesNotExist:
+        profile = None
+    try:
+        teacher_id = user.teacher.pk
+    except Teacher.DoesNotExist:
+        teacher_id = None
+    group_id = None
+    if profile is not None and profile.role == 'Student':
+        group_id = Student.objects.filter(user_id=user.pk).values_list('group_id', flat=True).first()
+    channels = connection_channels(
+        user.pk,
+        profile.role if profile else None,
+        profile.educational_center_id if profile else None,
+        teacher_id=teacher_id,
+        group_id=group_id,
+    )
+    return token, channels
+
+
+def _cors_headers(scope):
+    origin = next((value for name, value in scope.get('headers', []) if name == b'origin'), None)
+    if origin and origin.decode() in settings.CORS_ALLOWED_ORIGINS:
+        return [(b'access-control-allow-origin', origin), (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin')]
+    return []
+
+
+async def _reject(send, status, message):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': json.dumps({'error': message}).encode()})
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {event['data']}\n\n".encode()
+
+
+async def sse_app(scope, receive, send):
+    """Raw ASGI app: one long-lived text/event-stream response per connection"""
+    if scope['method'] != 'GET':
+        return await _reject(send, 405, 'Method not allowed')
+    auth = await sync_to_async(authenticate_stream)(_raw_token(scope))
+    if auth is None:
+        return await _reject(send, 401, 'Invalid or missing token')
+    token, channels = auth
+    expires_at = token.get('exp') or float('inf')
+
+    bus = get_bus()
+    subscription = bus.subscribe(channels)
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        # Birinchi xabar http.request (bo'sh GET body) - faqat http.disconnect ulanishni yopadi
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch_disconnect())
+    disconnect = asyncio.ensure_future(disconnected.wait())
+    next_event = asyncio.ensure_future(subscription.queue.get())
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # nginx/proxy buferlamasin
+            *_cors_headers(scope),
+        ]})
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': f"retry: {settings.EVENTS_RETRY_MS}\nevent: ready\ndata: {json.dumps(channels)}\n\n".encode()})
+        while True:
+            done, _ = await asyncio.wait(
+                {disconnect, next_event}, timeout=settings.EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                break
+            if next_event in done:
+                body = format_event(next_event.result())
+                next_event = asyncio.ensure_future(subscription.queue.get())
+            else:
+                # Heartbeat: proxy ulanishni yopmasin; bekor qilingan/eskirgan token tekshiruvi
+                if time.time() >= expires_at or await sync_to_async(revocations.is_revoked)(token):
+                    break
+                body = b': ping\n\n'
+            if subscription.overflowed:
+                subscription.overflowed = False
+                body += b'event: resync\ndata: {}\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    except OSError:
+        pass
+    finally:
+        bus.unsubscribe(subscription)
+        next_event.cancel()
+        disconnect.cancel()
+        watcher.cancel()
@@ -0,0 +1,360 @@
+"""
+Filial uchun haftalik dars jadvalini avtomatik tuzish (timetable solver).
+
+Har bir guruhga weekly_hours bo'yicha N ta mashg'ulot kerak; har bir
+mashg'ulotga (hafta kuni, vaqt sloti, xona) tanlanadi.
+
+Qat'iy shartlar: xona sig'imi >= guruh hajmi, o'qituvchi shu vaqtda ishlaydi
+(TeacherAvailability), o'qituvchi/xona/guruh bir vaqtda ikki joyda emas,
+boshqa guruhlarning mavjud GroupSchedule'lari band vaqt hisoblanadi.
+Yumshoq shartlar: guruhning darslari turli kunlarda, iloji boricha bitta xonada.
+
+Algoritm: eng cheklangan mashg'ulotdan boshlab ochko'z (greedy) joylashtirish,
+so'ng vaqt byudjeti tugaguncha siqib chiqarishli lokal qidiruv (simulated
+annealing). Tashqi servis yoki kutubxona kerak emas.
+"""
+
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import time as dtime
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import bump_version
+from .models import Group, GroupSchedule, Room, TeacherAvailability
+from .scheduling import LAZY_SCHEDULES_NAMESPACE, minutes_of, open_window
+
+UNPLACED_COST = 1000
+SAME_DAY_COST = 10
+ROOM_CHANGE_COST = 1
+
+
+def _as_time(minutes):
+    return dtime(minutes // 60, minutes % 60)
+
+
+class TimetableProblem:
+    """Static data of one solve: slots, rooms, sessions and their feasible options"""
+
+    def __init__(self, branch, lesson_minutes=90, weekly_hours=None, weekdays=None):
+        self.branch = branch
+        self.lesson_minutes = lesson_minutes
+        weekly_hours = {int(k): int(v) for k, v in (weekly_hours or {}).items()}
+
+        low, high = open_window()
+        weekdays = sorted(weekdays if weekdays is not None else settings.ROOM_OPEN_WEEKDAYS)
+        starts = range(low, high - lesson_minutes + 1, lesson_minutes)
+        # slot: (hafta kuni, boshlanish, tugash) daqiqalarda
+        self.slots = [(day, start, start + lesson_minutes) for day in weekdays for start in starts]
+
+        self.rooms = list(Room.objects.filter(branch=branch, is_available=True).order_by('capacity', 'id'))
+        groups = Group.objects.filter(branch=branch, status='Active').select_related('teacher')
+        self.groups = []
+        self.skipped = []
+        for group in groups:
+            hours = weekly_hours.get(group.id, group.weekly_hours)
+            if not hours:
+                continue
+            if not group.teacher_id:
+                self.skipped.append({'group': group.id, 'reason': 'Group has no teacher'})
+                continue
+            self.groups.append((group, math.ceil(hours * 60 / lesson_minutes)))
+
+        group_ids = [group.id for group, _ in self.groups]
+        teacher_ids = {group.teacher_id for group, _ in self.groups}
+        room_ids = [room.id for room in self.rooms]
+
+        # O'qituvchi ish vaqti; yozuvi yo'q o'qituvchi filial ish vaqtida bo'sh
+        availability = defaultdict(list)
+        for teacher_id, weekday, start, end in TeacherAvailability.objects.filter(
+            teacher_id__in=teacher_ids
+        ).values_list('teacher_id', 'weekday', 'start_time', 'end_time'):
+            availability[teacher_id].append((weekday, minutes_of(start), minutes_of(end)))
+
+        # Hal qilinmayotgan guruhlarning jadvali - o'zgarmas band vaqt
+        fixed_teacher, fixed_room = defaultdict(list), defaultdict(list)
+        fixed = GroupSchedule.objects.exclude(group_id__in=group_ids).filter(
+            group__status='Active'
+        ).select_related('group')
+        for slot in fixed.iterator():
+            interval = (slot.weekday, minutes_of(slot.start_time), minutes_of(slot.end_time))
+            teacher_id = slot.teacher_id or slot.group.teacher_id
+            room_id = slot.room_id or slot.group.room_id
+            if teacher_id in teacher_ids:
+                fixed_teacher[teacher_id].append(interval)
+            if room_id in room_ids:
+                fixed_room[room_id].append(interval)
+
+        def overlaps(intervals, slot):
+            return any(d == slot[0] and s < slot[2] and e > slot[1] for d, s, e in intervals)
+
+        def available(teacher_id, slot):
+            windows = availability.get(teacher_id)
+            if windows is None:
+                return True
+            return any(d == slot[0] and s <= slot[1] and e >= slot[2] for d, s, e in windows)
+
+        free_room_slots = {
+            r: [t for t, slot in enumerate(self.slots) if not overlaps(fixed_room[room.id], slot)]
+            for r, room in enumerate(self.rooms)
+        }
+
+        # sessions[i] = guruh indeksi; options[i] = mumkin bo'lgan (slot, xona) juftliklari
+        self.sessions, self.options = [], []
+        for g, (group, count) in enumerate(self.groups):
+            teacher_slots = {
+                t for t, slot in enumerate(self.slots)
+                if available(group.teacher_id, slot) and not overlaps(fixed_teacher[group.teacher_id], slot)
+            }
+            options = [
+                (t, r)
+                for r, room in enumerate(self.rooms) if room.capacity >= group.capacity
+                for t in free_room_slots[r] if t in teacher_slots
+            ]
+            for _ in range(count):
+                self.sessions.append(g)
+                self.options.append(options)
+
+    def teacher_of(self, session):
+        return self.groups[self.sessions[session]][0].teacher_id
+
+
+class TimetableSolver:
+    """Greedy construction + simulated annealing with eviction, within a time budget"""
+
+    def __init__(self, problem, time_budget=2.0, seed=0):
+        self.p = problem
+        self.time_budget = time_budget
+        self.random = random.Random(seed)
+        self.assignment = [None] * len(problem.sessions)
+        # (resurs, slot) -> shu yerga qo'yilgan mashg'ulotlar
+        self.by_teacher = defaultdict(set)
+        self.by_room = defaultdict(set)
+        self.by_group = defaultdict(set)
+        self.iterations = 0
+
+    # --- holatni o'zgartirish ---
+    def _place(self, s, option):
+        t, r = option
+        self.assignment[s] = option
+        self.by_teacher[(self.p.teacher_of(s), t)].add(s)
+        self.by_room[(r, t)].add(s)
+        self.by_group[(self.p.sessions[s], t)].add(s)
+
+    def _remove(self, s):
+        t, r = self.assignment[s]
+        self.by_teacher[(self.p.teacher_of(s), t)].discard(s)
+        self.by_room[(r, t)].discard(s)
+        self.by_group[(self.p.sessions[s], t)].discard(s)
+        self.assignment[s] = None
+
+    def _blockers(self, s, option):
+        t, r = option
+        return (
+            self.by_teacher[(self.p.teacher_of(s), t)]
+            | self.by_room[(r, t)]
+            | self.by_group[(self.p.sessions[s], t)]
+        ) - {s}
+
+    # --- baholash ---
+    def _group_penalties(self, g):
+        """(extra sessions on an already used day, extra rooms) of one group"""
+        placed = [self.assignment[s] for s in self._sessions_of[g] if self.assignment[s]]
+        days = defaultdict(int)
+        for t, _ in placed:
+            days[self.p.slots[t][0]] += 1
+        return sum(n - 1 for n in days.values()), max(len({r for _, r in placed}) - 1, 0)
+
+    def cost(self):
+        unplaced = sum(1 for option in self.assignment if option is None)
+        soft = 0
+        for g in range(len(self.p.groups)):
+            same_day, room_changes = self._group_penalties(g)
+            soft += same_day * SAME_DAY_COST + room_changes * ROOM_CHANGE_COST
+        return unplaced * UNPLACED_COST + soft
+
+    def _option_soft(self, s, option):
+        """Soft penalty of putting session s at option, given the group's other sessions"""
+        g = self.p.sessions[s]
+        day = self.p.slots[option[0]][0]
+        penalty = 0
+        for other in self._sessions_of[g]:
+            placed = self.assignment[other]
+            if other == s or placed is None:
+                continue
+            if self.p.slots[placed[0]][0] == day:
+                penalty += SAME_DAY_COST
+            if placed[1] != option[1]:
+                penalty += ROOM_CHANGE_COST
+        return penalty
+
+    def solve(self):
+        started = time.perf_counter()
+        self._sessions_of = defaultdict(list)
+        for s, g in enumerate(self.p.sessions):
+            self._sessions_of[g].append(s)
+
+        # 1) Greedy: kam variantli mashg'ulotlar birinchi
+        order = sorted(range(len(self.p.sessions)), key=lambda s: (len(self.p.options[s]), self.random.random()))
+        for s in order:
+            free = [o for o in self.p.options[s] if not self._blockers(s, o)]
+            if free:
+                self._place(s, min(free, key=lambda o: (self._option_soft(s, o), self.random.random())))
+
+        # 2) Lokal qidiruv: mashg'ulotni boshqa joyga ko'chirish, xalaqit berganlarini siqib chiqarish
+        current = best_cost = self.cost()
+        best = list(self.assignment)
+        movable = [s for s in range(len(self.p.sessions)) if self.p.options[s]]
+        temperature = 20.0
+        deadline = started + self.time_budget
+
+        while movable and best_cost > 0 and time.perf_counter() < deadline:
+            self.iterations += 1
+            unplaced = [s for s in movable if self.assignment[s] is None]
+            s = self.random.choice(unplaced) if unplaced and self.random.random() < 0.7 else self.random.choice(movable)
+            option = self.random.choice(self.p.options[s])
+            if option == self.assignment[s]:
+                continue
+
+            previous = {s: self.assignment[s]}
+            for other in self._blockers(s, option):
+                previous[other] = self.assignment[other]
+                self._remove(other)
+            if self.assignment[s] is not None:
+                self._remove(s)
+            self._place(s, option)
+
+            candidate = self.cost()
+            delta = candidate - current
+            if delta <= 0 or self.random.random() < math.exp(-delta / temperature):
+                current = candidate
+                if current < best_cost:
+                    best_cost, best = current, list(self.assignment)
+            else:
+                # Qaytarish
+                self._remove(s)
+                for other, placed in previous.items():
+                    if placed is not None:
+                        self._place(other, placed)
+            temperature = max(0.5, temperature * 0.9995)
+
+        for s in range(len(self.assignment)):
+            if self.assignment[s] is not None:
+                self._remove(s)
+        for s, option in enumerate(best):
+            if option is not None:
+                self._place(s, option)
+        self.elapsed = time.perf_counter() - started
+        return self.assignment
+
+    def report(self):
+        p = self.p
+        sessions = []
+        for s, option in enumerate(self.assignment):
+            group = p.groups[p.sessions[s]][0]
+            if option is None:
+                continue
+            t, r = option
+            weekday, start, end = p.slots[t]
+            sessions.append({
+                'group': group.id,
+                'group_name': group.name,
+                'teacher': group.teacher_id,
+                'room': p.rooms[r].id,
+                'room_name': p.rooms[r].name,
+                'weekday': weekday,
+                'start_time': _as_time(start),
+                'end_time': _as_time(end),
+            })
+        sessions.sort(key=lambda x: (x['weekday'], x['start_time'], x['room']))
+
+        unplaced = defaultdict(int)
+        for s, option in enumerate(self.assignment):
+            if option is None:
+                unplaced[p.sessions[s]] += 1
+
+        penalties = [self._group_penalties(g) for g in range(len(p.groups))]
+        fills = [
+            p.groups[p.sessions[s]][0].capacity / p.rooms[option[1]].capacity
+            for s, option in enumerate(self.assignment) if option and p.rooms[option[1]].capacity
+        ]
+        return {
+            'branch': p.branch.id,
+            'lesson_minutes': p.lesson_minutes,
+            'groups': len(p.groups),
+            'sessions_required': len(p.sessions),
+            'sessions_placed': len(sessions),
+            # Faqat barcha darslari joylashgan guruhlar (apply faqat ularni almashtiradi)
+            'solved_groups': [group.id for g, (group, _) in enumerate(p.groups) if g not in unplaced],
+            'unplaced': [
+                {
+                    'group': p.groups[g][0].id,
+                    'sessions': count,
+                    # Variant umuman yo'q: sig'imli xona yoki o'qituvchi bo'sh vaqti yetmaydi
+                    'reason': 'No feasible slot' if not p.options[self._sessions_of[g][0]] else 'Conflicts',
+                }
+                for g, count in unplaced.items()
+            ] + p.skipped,
+            'metrics': {
+                'score': self.cost(),
+                'hard_conflicts': sum(
+                    1 for s, option in enumerate(self.assignment) if option and self._blockers(s, option)
+                ),
+                'same_day_sessions': sum(same_day for same_day, _ in penalties),
+                'room_changes': sum(room_changes for _, room_changes in penalties),
+                'avg_seat_fill': round(sum(fills) / len(fills) * 100, 2) if fills else None,
+                'iterations': self.iterations,
+                'elapsed_ms': round(self.elapsed * 1000, 1),
+            },
+            'schedule': sessions,
+        }
+
+
+def apply_blocker(report):
+    """Why the report must not be saved, or None"""
+    if report['metrics']['hard_conflicts']:
+        return f"Timetable has {report['metrics']['hard_conflicts']} hard conflicts"
+    if report['sessions_placed'] < report['sessions_required']:
+        return f"{report['sessions_required'] - report['sessions_placed']} sessions could not be placed"
+    return None
+
+
+def apply_timetable(report):
+    """Replace the fully placed groups' GroupSchedule rows with the solver's sessions"""
+    group_ids = set(report['solved_groups'])
+    rows = [
+        GroupSchedule(
+            group_id=item['group'],
+            weekday=item['weekday'],
+            start_time=item['start_time'],
+            end_time=item['end_time'],
+            room_id=item['room'],
+        )
+        for item in report['schedule']
+        if item['group'] in group_ids
+    ]
+    with transaction.atomic():
+        GroupSchedule.objects.filter(group_id__in=group_ids).delete()
+        GroupSchedule.objects.bulk_create(rows)
+    # bulk_create signal yubormaydi
+    bump_version(LAZY_SCHEDULES_NAMESPACE)
+    return len(rows)
+
+
+def solve_timetable(branch, lesson_minutes=90, weekly_hours=None, time_budget=2.0, seed=0, apply=False):
+    """Build a conflict-free weekly timetable for a branch and optionally save it"""
+    problem = TimetableProblem(branch, lesson_minutes, weekly_hours)
+    solver = TimetableSolver(problem, time_budget=time_budget, seed=seed)
+    solver.solve()
+    report = solver.report()
+    report['applied'] = 0
+    if apply:
+        # Qisman yoki ziddiyatli jadval saqlanmaydi - mavjud GroupSchedule o'zgarmaydi
+        report['error'] = apply_blocker(report)
+        if report['error'] is None:
+            del report['error']
+            report['applied'] = apply_timetable(report)
+    return report
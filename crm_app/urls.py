@@ -125,8 +125,9 @@ from .views import (
     BranchViewSet, SubjectViewSet, GroupViewSet, StudentViewSet, TeacherViewSet,
     LessonViewSet, AttendanceViewSet, PaymentViewSet, AssignmentViewSet,
     AssignmentSubmissionViewSet, ExamViewSet, ExamResultViewSet, RoomViewSet,
-    PayrollViewSet, NotificationViewSet, ContractViewSet, LeadViewSet,
-    LoginAPIView, UserViewSet
+    PayrollViewSet, NotificationViewSet, BroadcastViewSet, ContractViewSet, LeadViewSet,
+    LoginAPIView, LogoutAPIView, UserViewSet, DashboardAPIView, GroupScheduleViewSet, HolidayViewSet,
+    CalendarLinkAPIView, CheckinAPIView, calendar_feed
 )
 
 # DefaultRouter yordamida barcha ViewSetlarni ro'yxatdan o'tkazamiz
@@ -151,6 +152,8 @@ router.register(r'teachers', TeacherViewSet, basename='teacher')
 router.register(r'branches', BranchViewSet, basename='branch')
 router.register(r'subjects', SubjectViewSet, basename='subject')
 router.register(r'groups', GroupViewSet, basename='group')
+router.register(r'group-schedules', GroupScheduleViewSet, basename='group-schedule')
+router.register(r'holidays', HolidayViewSet, basename='holiday')
 
 # ----------------------------
 # Academic Endpoints
@@ -179,6 +182,7 @@ router.register(r'leads', LeadViewSet, basename='lead')
 # Notifications
 # ----------------------------
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'broadcasts', BroadcastViewSet, basename='broadcast')
 
 # ----------------------------
 # JWT Login API
@@ -186,4 +190,9 @@ router.register(r'notifications', NotificationViewSet, basename='notification')
 urlpatterns = [
     path('', include(router.urls)),
     path('login/', LoginAPIView.as_view(), name='login'),  # username/password orqali token olish
+    path('logout/', LogoutAPIView.as_view(), name='logout'),  # access (va refresh) tokenni bekor qilish
+    path('dashboard/', DashboardAPIView.as_view(), name='dashboard'),  # direktor KPI'lari bitta so'rovda
+    path('calendar/<str:kind>/<int:pk>/', CalendarLinkAPIView.as_view(), name='calendar-link'),
+    path('calendar/<str:kind>/<int:pk>/feed.ics', calendar_feed, name='calendar-feed'),  # .ics obuna (token bilan)
+    path('checkin/', CheckinAPIView.as_view(), name='checkin'),  # QR check-in (o'quvchi JWT bilan + imzolangan dars tokeni)
 ]
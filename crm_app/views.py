@@ -1,17 +1,48 @@
-from rest_framework import viewsets, status, permissions
+from rest_framework import mixins, viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
+from drf_spectacular.utils import extend_schema
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.core import signing
+from django.db import transaction
 from django.db.models import Q, Count, Avg
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_date, parse_time
+from datetime import timedelta
 from .models import (
     EducationalCenter, UserProfile, Branch, Subject, Group, Student,
     Teacher, Lesson, Attendance, Payment, Assignment, AssignmentSubmission,
-    Exam, ExamResult, Room, Payroll, Notification, Contract, Lead
+    Exam, ExamResult, Room, Payroll, Notification, Contract, Lead,
+    GroupSchedule, Holiday, BroadcastJob, AbsenceStreak
+)
+from .analytics import cohort_retention, compute_gradebook, exam_statistics, exams_comparison, gradebook_csv_rows
+from .attendance import attendance_matrix, attendance_matrix_etag, parse_month
+from .authentication import issue_tokens
+from .broadcasts import start_broadcast
+from .checkin import check_in, checkin_token, read_checkin_token, token_expires_at
+from .dashboard import center_dashboard
+from .enrollment import bulk_enroll, enroll, leave_group
+from .ical import FEED_KINDS, check_feed_token, feed_etag, feed_token, stream_feed
+from .notifications import mark_read as mark_notifications_read, unread_count as unread_notifications
+from .openapi import SCHEMA_FORMATS, load_schema
+from .payroll import run_payroll
+from .revocation import revoke_token
+from .timetable import solve_timetable
+from .scheduling import (
+    available_rooms, find_conflicts, generate_group_lessons, lazy_schedules,
+    materialize_virtual_lesson, merge_lessons, parse_virtual_lesson_id, room_utilization,
+    virtual_lessons
 )
 from .serializers import (
     UserSerializer, UserProfileSerializer, EducationalCenterSerializer,
@@ -19,10 +50,73 @@ from .serializers import (
     TeacherSerializer, LessonSerializer, AttendanceSerializer, PaymentSerializer,
     AssignmentSerializer, AssignmentSubmissionSerializer, ExamSerializer,
     ExamResultSerializer, RoomSerializer, PayrollSerializer, NotificationSerializer,
-    ContractSerializer, LeadSerializer, LoginSerializer
+    ContractSerializer, LeadSerializer, LoginSerializer, ProposedLessonSerializer,
+    GroupScheduleSerializer, GroupWaitlistSerializer, HolidaySerializer, BroadcastJobSerializer,
+    AbsenceStreakSerializer
 )
 
 
+def request_profile(request):
+    """Caller's UserProfile or None (token claim'laridan bo'lsa so'rovsiz)"""
+    if not request.user.is_authenticated:
+        return None
+    try:
+        return request.user.profile
+    except UserProfile.DoesNotExist:
+        return None
+
+
+def request_teacher(request):
+    """Caller's Teacher or None (token claim'laridan bo'lsa so'rovsiz)"""
+    if not request.user.is_authenticated:
+        return None
+    try:
+        return request.user.teacher
+    except Teacher.DoesNotExist:
+        return None
+
+
+def request_center_id(request, requested=None):
+    """
+    Caller's educational center id.
+
+    SuperAdmin (yoki profilsiz/anonim) foydalanuvchi uchun so'rovda berilgan
+    center ishlatiladi; noto'g'ri yoki berilmagan bo'lsa None qaytadi.
+    """
+    profile = request_profile(request)
+    if profile and profile.role != 'SuperAdmin':
+        return profile.educational_center_id
+    try:
+        return int(requested) if requested not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def date_window(params, default_days=None, max_days=93):
+    """
+    (from, to) dates of a ?from=YYYY-MM-DD&to=YYYY-MM-DD request.
+
+    Berilmasa (None, None) yoki default_days bo'lsa bugundan boshlab shuncha kun;
+    noto'g'ri qiymatda ValueError.
+    """
+    if not params.get('from') and not params.get('to'):
+        if default_days is None:
+            return None, None
+        today = timezone.localdate()
+        return today, today + timedelta(days=default_days - 1)
+
+    try:
+        date_from = parse_date(params.get('from') or '')
+        date_to = parse_date(params.get('to') or '')
+    except ValueError:
+        date_from = date_to = None
+    if not date_from or not date_to or date_from > date_to:
+        raise ValueError('from/to must be valid dates (YYYY-MM-DD)')
+    if (date_to - date_from).days >= max_days:
+        raise ValueError(f'Date range cannot exceed {max_days} days')
+    return date_from, date_to
+
+
 # SUPERADMIN VIEWS
 class EducationalCenterViewSet(viewsets.ModelViewSet):
     """
@@ -135,8 +229,24 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import LoginSerializer
+from .login_guard import guarded_authenticate
 from .models import UserProfile
 
+def login_response(user):
+    """JWT pair with role/tenant claims (crm_app.authentication) for a verified user"""
+    refresh, claims = issue_tokens(user)
+    if claims['is_blocked']:
+        return Response({'error': 'User is blocked'}, status=status.HTTP_403_FORBIDDEN)
+    return Response({
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'username': user.username,
+        'role': claims['role'],
+        'center_id': claims['educational_center_id'],
+        'teacher_id': claims['teacher_id'],
+    }, status=status.HTTP_200_OK)
+
+
 class LoginAPIView(APIView):
     """
     Login API for obtaining JWT token.
@@ -144,27 +254,34 @@ class LoginAPIView(APIView):
     """
 
     def post(self, request):
-        serializer = LoginSerializer(data=request.data)
+        serializer = LoginSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
+        return login_response(user)
 
-        # JWT token yaratish
-        refresh = RefreshToken.for_user(user)
-        access_token = str(refresh.access_token)
 
-        # Foydalanuvchi roli
-        try:
-            profile = user.userprofile  # OneToOneField orqali UserProfile
-            role = profile.role
-        except:
-            role = "NoRole"
+class LogoutAPIView(APIView):
+    """
+    Revoke the caller's access token (and the refresh token, if sent).
 
-        return Response({
-            'access': access_token,
-            'refresh': str(refresh),
-            'username': user.username,
-            'role': role
-        }, status=status.HTTP_200_OK)
+    POST: { "refresh": "<refresh token>" } - refresh ixtiyoriy
+    Boshqa workerlar ham AUTH_REVOCATION_SYNC_SECONDS ichida rad eta boshlaydi.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if refresh:
+            try:
+                refresh = RefreshToken(refresh)
+            except TokenError:
+                return Response({'error': 'Invalid refresh token'}, status=status.HTTP_400_BAD_REQUEST)
+            if str(refresh.get('user_id')) != str(request.user.pk):
+                return Response({'error': 'Refresh token belongs to another user'}, status=status.HTTP_400_BAD_REQUEST)
+            revoke_token(refresh)
+        if request.auth is not None:
+            revoke_token(request.auth)
+        return Response({'status': 'Logged out'})
 
 
 
@@ -186,6 +303,11 @@ class BranchViewSet(viewsets.ModelViewSet):
     - DELETE /api/branches/{id}/ - Delete branch
     - POST /api/branches/{id}/open/ - Open branch
     - POST /api/branches/{id}/close/ - Close branch
+    - POST /api/branches/{id}/timetable/ - Solve a conflict-free weekly timetable for the branch groups
+      - body: {"lesson_minutes": 90, "weekly_hours": {"<group_id>": 6}, "time_budget": 2, "seed": 0, "apply": false}
+      - 409: apply=true, but some sessions are unplaced or conflicting (nothing saved)
+    - GET /api/branches/{id}/at-risk-students/ - Active students with N+ consecutive absences
+      - query: ?min_streak=3 (default ABSENCE_STREAK_THRESHOLD)
     """
     queryset = Branch.objects.all()
     serializer_class = BranchSerializer
@@ -198,10 +320,10 @@ class BranchViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Branch.objects.all()
-                return Branch.objects.filter(educational_center=profile.educational_center)
+                return Branch.objects.filter(educational_center_id=profile.educational_center_id)
             except UserProfile.DoesNotExist:
                 return Branch.objects.all()
         return Branch.objects.all()
@@ -222,6 +344,46 @@ class BranchViewSet(viewsets.ModelViewSet):
         branch.save()
         return Response({'status': 'Branch closed'})
 
+    @action(detail=True, methods=['get'], url_path='at-risk-students')
+    def at_risk_students(self, request, pk=None):
+        """Students whose current absence streak (detect_absence_streaks) reaches min_streak"""
+        branch = self.get_object()
+        try:
+            min_streak = int(request.query_params.get('min_streak', settings.ABSENCE_STREAK_THRESHOLD))
+        except ValueError:
+            return Response({'error': 'min_streak must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if min_streak < 1:
+            return Response({'error': 'min_streak must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+        streaks = AbsenceStreak.objects.filter(
+            student__branch=branch, student__status='Active', length__gte=min_streak,
+        ).select_related('student__group').order_by('-length', 'student_id')
+        return Response(AbsenceStreakSerializer(streaks, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def timetable(self, request, pk=None):
+        """Greedy + local search timetable (GroupSchedule) for groups with weekly hours"""
+        branch = self.get_object()
+        try:
+            lesson_minutes = int(request.data.get('lesson_minutes', 90))
+            time_budget = float(request.data.get('time_budget', settings.TIMETABLE_TIME_BUDGET))
+            seed = int(request.data.get('seed', 0))
+            weekly_hours = {int(k): int(v) for k, v in (request.data.get('weekly_hours') or {}).items()}
+        except (TypeError, ValueError, AttributeError):
+            return Response({'error': 'Invalid solver parameters'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 30 <= lesson_minutes <= 240:
+            return Response({'error': 'lesson_minutes must be between 30 and 240'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < time_budget <= settings.TIMETABLE_MAX_TIME_BUDGET:
+            return Response(
+                {'error': f'time_budget must be in (0, {settings.TIMETABLE_MAX_TIME_BUDGET}] seconds'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        apply = str(request.data.get('apply', '')).lower() in ('1', 'true', 'yes')
+        report = solve_timetable(branch, lesson_minutes, weekly_hours, time_budget, seed, apply=apply)
+        # apply so'ralgan, lekin jadval to'liq/ziddiyatsiz emas - hech narsa saqlanmadi
+        return Response(report, status=status.HTTP_409_CONFLICT if 'error' in report else status.HTTP_200_OK)
+
 
 # class SubjectViewSet(viewsets.ModelViewSet):
 #     """
@@ -275,7 +437,7 @@ class SubjectViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("User profile not found")
 
         return Subject.objects.filter(
-            educational_center=profile.educational_center
+            educational_center_id=profile.educational_center_id
         )
 
     def perform_create(self, serializer):
@@ -368,13 +530,22 @@ class SubjectViewSet(viewsets.ModelViewSet):
 
 
 class GroupViewSet(viewsets.ModelViewSet):
+    """
+    ENDPOINTS:
+    - POST /api/groups/{id}/generate-lessons/ - Create lessons from the group's weekly schedule
+      - body: {"from": "YYYY-MM-DD", "to": "YYYY-MM-DD", "dry_run": false}
+    - GET /api/groups/{id}/waitlist/ - Students waiting for a seat (FIFO order)
+    - GET /api/groups/{id}/attendance-matrix/?month=YYYY-MM - Students × lessons status matrix (ETag)
+    - GET /api/groups/{id}/gradebook/?assignment_weight=0.4 - Students × (assignments + exams) in percent
+      - ?export=csv - stream the same table as CSV
+    """
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         profile = self.request.user.profile
         return Group.objects.filter(
-            educational_center=profile.educational_center
+            educational_center_id=profile.educational_center_id
         )
 
     def perform_create(self, serializer):
@@ -383,7 +554,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         room = serializer.validated_data.get('room')
 
         # ❗ Branch boshqa center bo‘lsa — ruxsat yo‘q
-        if branch.educational_center != profile.educational_center:
+        if branch.educational_center_id != profile.educational_center_id:
             raise PermissionDenied("Invalid branch")
 
         # ❗ Room boshqa branchga tegishli bo‘lsa — ruxsat yo‘q
@@ -394,6 +565,136 @@ class GroupViewSet(viewsets.ModelViewSet):
             educational_center=profile.educational_center
         )
 
+    @action(detail=True, methods=['post'], url_path='generate-lessons')
+    def generate_lessons(self, request, pk=None):
+        """Materialize the group's recurring lessons for a date range in one batch"""
+        group = self.get_object()
+        date_from = parse_date(str(request.data.get('from') or '')) if request.data.get('from') else None
+        date_to = parse_date(str(request.data.get('to') or '')) if request.data.get('to') else None
+        if (request.data.get('from') and not date_from) or (request.data.get('to') and not date_to):
+            return Response({'error': 'from/to must be valid dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        if date_from and date_to and date_from > date_to:
+            return Response({'error': 'from must be before to'}, status=status.HTTP_400_BAD_REQUEST)
+        if not group.schedules.exists():
+            return Response({'error': 'Group has no weekly schedule'}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        result = generate_group_lessons(group, date_from, date_to, dry_run=dry_run)
+        return Response(result, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def waitlist(self, request, pk=None):
+        """Seat count and FIFO waitlist of the group"""
+        group = self.get_object()
+        entries = group.waitlist.select_related('student')
+        return Response({
+            'capacity': group.capacity,
+            'enrolled_count': group.enrolled_count,
+            'waitlist': GroupWaitlistSerializer(entries, many=True).data,
+        })
+
+
+    @action(detail=True, methods=['get'], url_path='attendance-matrix')
+    def attendance_matrix(self, request, pk=None):
+        """Compact attendance sheet of one month; 304 while nothing was marked since the client's copy"""
+        group = self.get_object()
+        try:
+            date_from, date_to = parse_month(request.query_params.get('month') or timezone.localdate().strftime('%Y-%m'))
+        except ValueError:
+            return Response({'error': 'month must be YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag = f'"{attendance_matrix_etag(group, date_from, date_to)}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = Response(attendance_matrix(group, date_from, date_to))
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+        return response
+
+
+    @action(detail=True, methods=['get'])
+    def gradebook(self, request, pk=None):
+        """Assignment grades and exam scores of every student with weighted averages"""
+        group = self.get_object()
+        try:
+            weight = float(request.query_params.get('assignment_weight', settings.GRADEBOOK_ASSIGNMENT_WEIGHT))
+        except ValueError:
+            return Response({'error': 'assignment_weight must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 <= weight <= 1:
+            return Response({'error': 'assignment_weight must be between 0 and 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = compute_gradebook(group, weight)
+        if request.query_params.get('export') == 'csv':
+            response = StreamingHttpResponse(gradebook_csv_rows(data), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="gradebook-group-{group.id}.csv"'
+            return response
+        return Response(data)
+
+
+class GroupScheduleViewSet(viewsets.ModelViewSet):
+    """
+    ENDPOINTS:
+    - GET /api/group-schedules/?group={id} - Weekly slots of groups
+    - POST /api/group-schedules/ - Add a slot (weekday, start_time, end_time, room?, teacher?)
+    - PUT/PATCH/DELETE /api/group-schedules/{id}/
+    """
+    serializer_class = GroupScheduleSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        profile = request_profile(self.request)
+        if profile is None:
+            return GroupSchedule.objects.none()
+        queryset = GroupSchedule.objects.filter(
+            group__educational_center_id=profile.educational_center_id
+        ).select_related('group')
+        group_id = self.request.query_params.get('group')
+        if group_id:
+            queryset = queryset.filter(group_id=group_id)
+        return queryset
+
+    def check_center(self, serializer):
+        """Guruh, xona va o'qituvchi foydalanuvchi markaziga tegishli bo'lishi shart"""
+        profile = request_profile(self.request)
+        if profile is None:
+            raise PermissionDenied("User profile not found")
+        data = serializer.validated_data
+        group = data.get('group') or serializer.instance.group
+        if group.educational_center_id != profile.educational_center_id:
+            raise PermissionDenied("Invalid group")
+        room, teacher = data.get('room'), data.get('teacher')
+        if room and room.branch.educational_center_id != profile.educational_center_id:
+            raise PermissionDenied("Room does not belong to this center")
+        if teacher and teacher.branch.educational_center_id != profile.educational_center_id:
+            raise PermissionDenied("Teacher does not belong to this center")
+
+    def perform_create(self, serializer):
+        self.check_center(serializer)
+        serializer.save()
+
+    def perform_update(self, serializer):
+        self.check_center(serializer)
+        serializer.save()
+
+
+class HolidayViewSet(viewsets.ModelViewSet):
+    """
+    ENDPOINTS:
+    - GET /api/holidays/ - Center holidays (lessons are not generated on these days)
+    - POST /api/holidays/ - Add holiday {"date": "YYYY-MM-DD", "name": "..."}
+    - PUT/PATCH/DELETE /api/holidays/{id}/
+    """
+    serializer_class = HolidaySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        profile = self.request.user.profile
+        return Holiday.objects.filter(educational_center_id=profile.educational_center_id)
+
+    def perform_create(self, serializer):
+        serializer.save(educational_center=self.request.user.profile.educational_center)
+
 
 
 
@@ -490,8 +791,12 @@ class StudentViewSet(viewsets.ModelViewSet):
     - DELETE /api/students/{id}/ - Delete student
     - POST /api/students/{id}/block/ - Block student
     - POST /api/students/{id}/assign-group/ - Assign student to group
+      - body: {"group_id": 1, "waitlist": false}; 409 if full, 202 if waitlisted
+    - POST /api/students/bulk-enroll/ - Enroll/transfer many students into one group
+      - body: {"group_id": 1, "student_ids": [1, 2, 3], "waitlist": false}
     - GET /api/students/{id}/attendance-history/ - Get attendance history
     - GET /api/students/{id}/payment-history/ - Get payment history
+    - GET /api/students/cohort-retention/?months=12 - Monthly enrollment cohort retention matrix
     """
 
     queryset = Student.objects.all()
@@ -506,21 +811,67 @@ class StudentViewSet(viewsets.ModelViewSet):
         student.save()
         return Response({'status': 'Student blocked'})
 
+    def perform_create(self, serializer):
+        group = serializer.validated_data.pop('group', None)
+        with transaction.atomic():
+            student = serializer.save()
+            if group:
+                self._enroll_or_fail(student, group)
+
+    def perform_update(self, serializer):
+        group = serializer.validated_data.pop('group', serializer.instance.group)
+        with transaction.atomic():
+            student = serializer.save()
+            if group is None and student.group_id:
+                leave_group(student)
+            elif group and group.id != student.group_id:
+                self._enroll_or_fail(student, group)
+        student.refresh_from_db()
+
+    def _enroll_or_fail(self, student, group):
+        # Sig'im enrollment.enroll ichida shartli UPDATE bilan tekshiriladi
+        if enroll(student, group)['status'] == 'full':
+            raise ValidationError({'group': f'Group {group.name} is full'})
+        student.refresh_from_db()
+
     @action(detail=True, methods=['post'])
     def assign_group(self, request, pk=None):
-        """Assign student to group"""
+        """Assign student to group (or put them on its waitlist)"""
         student = self.get_object()
         group_id = request.data.get('group_id')
         if not group_id:
             return Response({'error': 'group_id is required'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             group = Group.objects.get(id=group_id)
-            student.group = group
-            student.save()
-            return Response({'status': f'Student assigned to group {group.name}'})
+        except (Group.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        result = enroll(student, group, waitlist=str(request.data.get('waitlist', '')).lower() in ('1', 'true', 'yes'))
+        if result['status'] == 'full':
+            return Response({'error': f'Group {group.name} is full', **result}, status=status.HTTP_409_CONFLICT)
+        if result['status'] == 'waitlisted':
+            return Response(result, status=status.HTTP_202_ACCEPTED)
+        return Response(result)
+
+    @action(detail=False, methods=['post'], url_path='bulk-enroll')
+    def bulk_enroll(self, request):
+        """Enroll or transfer a list of students into one group in a single transaction"""
+        group_id = request.data.get('group_id')
+        student_ids = request.data.get('student_ids')
+        if not group_id or not isinstance(student_ids, list) or not student_ids:
+            return Response({'error': 'group_id and a non-empty student_ids list are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            student_ids = [int(student_id) for student_id in student_ids]
+            group = Group.objects.get(id=group_id)
+        except (ValueError, TypeError):
+            return Response({'error': 'student_ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
         except Group.DoesNotExist:
             return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
 
+        waitlist = str(request.data.get('waitlist', '')).lower() in ('1', 'true', 'yes')
+        return Response(bulk_enroll(group, student_ids, waitlist=waitlist))
+
     @action(detail=True, methods=['get'])
     def attendance_history(self, request, pk=None):
         """Get student attendance history"""
@@ -538,6 +889,22 @@ class StudentViewSet(viewsets.ModelViewSet):
         serializer = PaymentSerializer(payments, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='cohort-retention')
+    def cohort_retention(self, request):
+        """Share of each enrollment-month cohort still attending and paying N months later"""
+        center_id = request_center_id(request, request.query_params.get('center'))
+        if not center_id:
+            return Response({'error': 'center is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            months = int(request.query_params.get('months', 12))
+        except ValueError:
+            return Response({'error': 'months must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= months <= 36:
+            return Response({'error': 'months must be between 1 and 36'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(cohort_retention(center_id, months))
+
 
 
 
@@ -620,6 +987,7 @@ class StudentViewSet(viewsets.ModelViewSet):
 
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from .models import Teacher, UserProfile, Lesson, Attendance
 from .serializers import TeacherSerializer, LessonSerializer
@@ -637,10 +1005,10 @@ class TeacherViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Teacher.objects.all()
-                return Teacher.objects.filter(branch__educational_center=profile.educational_center)
+                return Teacher.objects.filter(branch__educational_center_id=profile.educational_center_id)
             except UserProfile.DoesNotExist:
                 return Teacher.objects.all()
         return Teacher.objects.all()
@@ -669,11 +1037,25 @@ class TeacherViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def schedule(self, request, pk=None):
-        """Get teacher schedule"""
+        """
+        Get teacher schedule for ?from=YYYY-MM-DD&to=YYYY-MM-DD
+        (berilmasa bugundan SCHEDULE_WINDOW_DAYS kun), lazy guruhlarning virtual darslari bilan
+        """
         teacher = self.get_object()
-        lessons = Lesson.objects.filter(teacher=teacher).order_by('date', 'start_time')
+        try:
+            date_from, date_to = date_window(request.query_params, settings.SCHEDULE_WINDOW_DAYS)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # (teacher, date, start_time) indeksi bo'yicha faqat oyna o'qiladi
+        lessons = (
+            Lesson.objects.filter(teacher=teacher, date__gte=date_from, date__lte=date_to)
+            .select_related('group', 'teacher__user', 'room')
+            .order_by('date', 'start_time')
+        )
         serializer = LessonSerializer(lessons, many=True)
-        return Response(serializer.data)
+        virtual = virtual_lessons(date_from, date_to, lazy_schedules(teacher_id=teacher.id))
+        return Response(merge_lessons(serializer.data, virtual))
 
     @action(detail=True, methods=['get'])
     def performance(self, request, pk=None):
@@ -712,6 +1094,14 @@ class LessonViewSet(viewsets.ModelViewSet):
     - DELETE /api/lessons/{id}/ - Delete lesson
     - POST /api/lessons/{id}/cancel/ - Cancel lesson
     - POST /api/lessons/{id}/generate-online-link/ - Generate online meeting link
+    - POST /api/lessons/check-conflicts/ - Report room/teacher double bookings in a batch of lessons
+    - GET /api/lessons/{id}/checkin-token/ - Short-lived signed token for the classroom QR code
+    - GET /api/lessons/?from=YYYY-MM-DD&to=YYYY-MM-DD[&group=&teacher=&room=] - Calendar window
+      - lazy_schedule guruhlarning virtual darslari ("v-<slot>-<YYYYMMDD>" id bilan) ham qaytadi
+
+    Create/update room yoki o'qituvchi shu vaqtda band bo'lsa 400 qaytaradi.
+    Virtual darsga cancel/generate-online-link/update yoki davomat (bulk-mark)
+    yuborilganda u Lesson sifatida saqlanadi.
     """
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
@@ -724,18 +1114,129 @@ class LessonViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Lesson.objects.all()
                 elif profile.role in ['Director', 'Manager']:
-                    return Lesson.objects.filter(group__branch__educational_center=profile.educational_center)
+                    return Lesson.objects.filter(group__branch__educational_center_id=profile.educational_center_id)
                 elif profile.role == 'Teacher':
-                    teacher = Teacher.objects.get(user=user)
+                    teacher = user.teacher
                     return Lesson.objects.filter(teacher=teacher)
             except (UserProfile.DoesNotExist, Teacher.DoesNotExist):
                 return Lesson.objects.all()
         return Lesson.objects.all()
 
+    def get_virtual_schedules(self):
+        """Lazy group slots visible to the user (get_queryset bilan bir xil qoida)"""
+        profile = request_profile(self.request)
+        if profile and profile.role in ['Director', 'Manager']:
+            return lazy_schedules(center_id=profile.educational_center_id)
+        if profile and profile.role == 'Teacher':
+            teacher = request_teacher(self.request)
+            if teacher:
+                return lazy_schedules(teacher_id=teacher.id)
+        return lazy_schedules()
+
+    def get_object(self):
+        """Virtual id bo'lsa dars shu yerda saqlanadi (materialize)"""
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if parse_virtual_lesson_id(lookup) is None:
+            return super().get_object()
+        lesson = materialize_virtual_lesson(lookup, self.get_virtual_schedules())
+        if lesson is None:
+            raise Http404
+        self.check_object_permissions(self.request, lesson)
+        return lesson
+
+    def create(self, request, *args, **kwargs):
+        # validate() xona/o'qituvchini qulflaydi - tekshiruv va saqlash bitta tranzaksiyada
+        with transaction.atomic():
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return self.update_lesson(request, *args, **kwargs)
+
+    def update_lesson(self, request, *args, **kwargs):
+        """Virtual dars faqat validatsiyadan keyin, o'sha tranzaksiyada saqlanadi"""
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        parsed = parse_virtual_lesson_id(lookup)
+        if parsed is None:
+            return super().update(request, *args, **kwargs)
+        schedule_id, day = parsed
+        schedules = self.get_virtual_schedules()
+        item = next(iter(virtual_lessons(day, day, schedules.filter(pk=schedule_id))), None)
+        if item is None:
+            # Mashg'ulot allaqachon saqlangan yoki mavjud emas - get_object hal qiladi
+            return super().update(request, *args, **kwargs)
+
+        occurrence = Lesson(
+            group_id=item['group'], teacher_id=item['teacher'], room_id=item['room'], date=item['date'],
+            start_time=item['start_time'], end_time=item['end_time'], duration=item['duration'],
+        )
+        serializer = self.get_serializer_class()(
+            occurrence, data=request.data, partial=kwargs.pop('partial', False),
+            context={**self.get_serializer_context(), 'virtual_id': lookup},
+        )
+        serializer.is_valid(raise_exception=True)
+        lesson = materialize_virtual_lesson(lookup, schedules)
+        if lesson is None:
+            raise Http404
+        self.check_object_permissions(request, lesson)
+        serializer.instance = lesson
+        self.perform_update(serializer)
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        """?from=&to= berilsa saqlangan va virtual darslar birga qaytadi"""
+        params = request.query_params
+        try:
+            date_from, date_to = date_window(params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not date_from:
+            return super().list(request, *args, **kwargs)
+
+        filters = {key: params[key] for key in ('group', 'teacher', 'room') if str(params.get(key, '')).isdigit()}
+        lessons = self.filter_queryset(self.get_queryset()).filter(
+            date__gte=date_from, date__lte=date_to, **filters
+        ).select_related('group', 'teacher__user', 'room')
+        schedules = self.get_virtual_schedules() & lazy_schedules(
+            group_id=filters.get('group'), teacher_id=filters.get('teacher'), room_id=filters.get('room')
+        )
+        virtual = virtual_lessons(date_from, date_to, schedules)
+        return Response(merge_lessons(self.get_serializer(lessons, many=True).data, virtual))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Virtual darsni ko'rish uni saqlamaydi"""
+        parsed = parse_virtual_lesson_id(kwargs.get('pk'))
+        if parsed is None:
+            return super().retrieve(request, *args, **kwargs)
+        schedule_id, day = parsed
+        for item in virtual_lessons(day, day, self.get_virtual_schedules().filter(pk=schedule_id)):
+            return Response(item)
+        return Response({'error': 'Lesson not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    def destroy(self, request, *args, **kwargs):
+        if parse_virtual_lesson_id(kwargs.get('pk')) is not None:
+            return Response(
+                {'error': 'Virtual lesson is not stored; cancel it instead'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return super().destroy(request, *args, **kwargs)
+
+    @action(detail=True, methods=['get'], url_path='checkin-token')
+    def checkin_token(self, request, pk=None):
+        """Token for students' self check-in; the QR screen refreshes it before it expires"""
+        lesson = self.get_object()
+        if lesson.is_cancelled:
+            return Response({'error': 'Lesson is cancelled'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'lesson': lesson.id,
+            'token': checkin_token(lesson),
+            'expires_at': token_expires_at(),
+        })
+
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
         """Cancel lesson"""
@@ -754,6 +1255,25 @@ class LessonViewSet(viewsets.ModelViewSet):
         lesson.save()
         return Response({'online_link': online_link})
 
+    @action(detail=False, methods=['post'], url_path='check-conflicts')
+    def check_conflicts(self, request):
+        """
+        Validate a proposed schedule (e.g. a whole week) in one pass.
+        POST data: {"lessons": [{"ref": "mon-1", "room": 1, "teacher": 2, "date": "2025-01-06",
+                                 "start_time": "09:00", "end_time": "10:30"}, ...]}
+        """
+        lessons = request.data.get('lessons', []) if isinstance(request.data, dict) else None
+        if not isinstance(lessons, list):
+            return Response({'error': 'lessons must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = ProposedLessonSerializer(data=lessons, many=True)
+        serializer.is_valid(raise_exception=True)
+        conflicts = find_conflicts(serializer.validated_data)
+        return Response({
+            'checked': len(serializer.validated_data),
+            'conflicts_count': len(conflicts),
+            'conflicts': conflicts,
+        })
+
 
 class AttendanceViewSet(viewsets.ModelViewSet):
     """
@@ -768,7 +1288,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
     - PUT /api/attendance/{id}/ - Update attendance
     - PATCH /api/attendance/{id}/ - Partial update
     - DELETE /api/attendance/{id}/ - Delete attendance
-    - POST /api/attendance/bulk-mark/ - Bulk mark attendance for lesson
+    - POST /api/attendance/bulk-mark/ - Bulk mark attendance for lesson (lesson_id virtual "v-..." id ham bo'lishi mumkin)
     """
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
@@ -781,13 +1301,13 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Attendance.objects.all()
                 elif profile.role in ['Director', 'Manager', 'Admin']:
-                    return Attendance.objects.filter(lesson__group__branch__educational_center=profile.educational_center)
+                    return Attendance.objects.filter(lesson__group__branch__educational_center_id=profile.educational_center_id)
                 elif profile.role == 'Teacher':
-                    teacher = Teacher.objects.get(user=user)
+                    teacher = user.teacher
                     return Attendance.objects.filter(marked_by=teacher)
                 elif profile.role == 'Student':
                     student = Student.objects.get(user=user)
@@ -803,7 +1323,14 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         attendance_data = request.data.get('attendance_data', [])
 
         try:
-            lesson = Lesson.objects.get(id=lesson_id)
+            # Lazy guruhning virtual darsi birinchi davomatda saqlanadi
+            if parse_virtual_lesson_id(lesson_id) is not None:
+                lesson = materialize_virtual_lesson(lesson_id)
+                if lesson is None:
+                    raise Lesson.DoesNotExist
+            else:
+                lesson = Lesson.objects.get(id=lesson_id)
+            marked_by = request_teacher(request)
             marked_count = 0
 
             for record in attendance_data:
@@ -817,7 +1344,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
                         student=student,
                         defaults={
                             'status': status_val,
-                            'marked_by': request.user
+                            'marked_by': marked_by
                         }
                     )
                     marked_count += 1
@@ -858,11 +1385,11 @@ class PaymentViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Payment.objects.all()
                 elif profile.role in ['Director', 'Manager', 'Admin']:
-                    return Payment.objects.filter(student__branch__educational_center=profile.educational_center)
+                    return Payment.objects.filter(student__branch__educational_center_id=profile.educational_center_id)
             except UserProfile.DoesNotExist:
                 return Payment.objects.all()
         return Payment.objects.all()
@@ -893,13 +1420,13 @@ class AssignmentViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Assignment.objects.all()
                 elif profile.role in ['Director', 'Manager']:
-                    return Assignment.objects.filter(group__branch__educational_center=profile.educational_center)
+                    return Assignment.objects.filter(group__branch__educational_center_id=profile.educational_center_id)
                 elif profile.role == 'Teacher':
-                    teacher = Teacher.objects.get(user=user)
+                    teacher = user.teacher
                     return Assignment.objects.filter(teacher=teacher)
             except (UserProfile.DoesNotExist, Teacher.DoesNotExist):
                 return Assignment.objects.all()
@@ -955,6 +1482,8 @@ class ExamViewSet(viewsets.ModelViewSet):
     - PATCH /api/exams/{id}/ - Partial update
     - DELETE /api/exams/{id}/ - Delete exam
     - POST /api/exams/{id}/publish-results/ - Publish exam results
+    - GET /api/exams/{id}/statistics/ - Score statistics and histogram
+    - GET /api/exams/comparison/?group={id} | ?center={id} - Compare exams of a group or center
     """
     queryset = Exam.objects.all()
     serializer_class = ExamSerializer
@@ -967,13 +1496,13 @@ class ExamViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Exam.objects.all()
                 elif profile.role in ['Director', 'Manager']:
-                    return Exam.objects.filter(group__branch__educational_center=profile.educational_center)
+                    return Exam.objects.filter(group__branch__educational_center_id=profile.educational_center_id)
                 elif profile.role == 'Teacher':
-                    teacher = Teacher.objects.get(user=user)
+                    teacher = user.teacher
                     return Exam.objects.filter(teacher=teacher)
             except (UserProfile.DoesNotExist, Teacher.DoesNotExist):
                 return Exam.objects.all()
@@ -987,6 +1516,32 @@ class ExamViewSet(viewsets.ModelViewSet):
         exam.save()
         return Response({'status': 'Results published'})
 
+    @action(detail=True, methods=['get'])
+    def statistics(self, request, pk=None):
+        """Mean, median, percentiles, pass rate and histogram of exam scores"""
+        exam = self.get_object()
+        return Response(exam_statistics(exam))
+
+    @action(detail=False, methods=['get'])
+    def comparison(self, request):
+        """Compare score statistics of all exams in a group or center"""
+        exams = self.get_queryset()
+        group_id = request.query_params.get('group')
+        center_id = request.query_params.get('center')
+
+        if group_id:
+            if not group_id.isdigit():
+                return Response({'error': 'group must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            exams = exams.filter(group_id=group_id)
+        elif center_id:
+            if not center_id.isdigit():
+                return Response({'error': 'center must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            exams = exams.filter(group__educational_center_id=center_id)
+        else:
+            return Response({'error': 'group or center is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(exams_comparison(exams))
+
 
 class ExamResultViewSet(viewsets.ModelViewSet):
     """
@@ -1013,11 +1568,11 @@ class ExamResultViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return ExamResult.objects.all()
                 elif profile.role in ['Director', 'Manager']:
-                    return ExamResult.objects.filter(exam__group__branch__educational_center=profile.educational_center)
+                    return ExamResult.objects.filter(exam__group__branch__educational_center_id=profile.educational_center_id)
                 elif profile.role == 'Student':
                     student = Student.objects.get(user=user)
                     return ExamResult.objects.filter(student=student)
@@ -1081,6 +1636,13 @@ class ExamResultViewSet(viewsets.ModelViewSet):
 
 
 class RoomViewSet(viewsets.ModelViewSet):
+    """
+    ENDPOINTS:
+    - GET /api/rooms/utilization/?branch={id}&from=YYYY-MM-DD&to=YYYY-MM-DD[&room={id}]
+      - Booked vs open hours per day/week and seat fill of each room
+    - GET /api/rooms/available/?branch={id}&date=YYYY-MM-DD[&to=YYYY-MM-DD]&start=HH:MM&end=HH:MM[&min_capacity=N]
+      - Rooms free for the slot and the dates they are free on (max 31 days)
+    """
     serializer_class = RoomSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1089,7 +1651,7 @@ class RoomViewSet(viewsets.ModelViewSet):
         profile = user.profile
 
         return Room.objects.filter(
-            branch__educational_center=profile.educational_center
+            branch__educational_center_id=profile.educational_center_id
         )
 
     def perform_create(self, serializer):
@@ -1099,11 +1661,72 @@ class RoomViewSet(viewsets.ModelViewSet):
         profile = self.request.user.profile
         branch = serializer.validated_data.get('branch')
 
-        if branch.educational_center != profile.educational_center:
+        if branch.educational_center_id != profile.educational_center_id:
             raise PermissionDenied("You cannot add room to another center")
 
         serializer.save()
 
+    @action(detail=False, methods=['get'])
+    def utilization(self, request):
+        """Room occupancy report of a branch for a date range"""
+        params = request.query_params
+        branch = Branch.objects.filter(
+            pk=params.get('branch') if str(params.get('branch', '')).isdigit() else None,
+            educational_center_id=request.user.profile.educational_center_id,
+        ).first()
+        if not branch:
+            return Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        today = timezone.localdate()
+        date_from = parse_date(params.get('from', '')) if params.get('from') else today - timedelta(days=today.weekday())
+        date_to = parse_date(params.get('to', '')) if params.get('to') else date_from + timedelta(days=6)
+        if not date_from or not date_to or date_from > date_to:
+            return Response({'error': 'from/to must be valid dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        if (date_to - date_from).days > 92:
+            return Response({'error': 'Date range cannot exceed 93 days'}, status=status.HTTP_400_BAD_REQUEST)
+
+        room_id = params.get('room')
+        room_id = int(room_id) if room_id and room_id.isdigit() else None
+        return Response(room_utilization(branch.id, date_from, date_to, room_id))
+
+    @action(detail=False, methods=['get'])
+    def available(self, request):
+        """Free rooms of a branch for a time slot, answered from occupancy bitmaps"""
+        params = request.query_params
+        branch = Branch.objects.filter(
+            pk=params.get('branch') if str(params.get('branch', '')).isdigit() else None,
+            educational_center_id=request.user.profile.educational_center_id,
+        ).first()
+        if not branch:
+            return Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            date_from = parse_date(params.get('date') or '')
+            date_to = parse_date(params.get('to') or '') if params.get('to') else date_from
+            start_time = parse_time(params.get('start') or '')
+            end_time = parse_time(params.get('end') or '')
+        except ValueError:
+            date_from = start_time = None
+        if not date_from or not date_to or date_from > date_to:
+            return Response({'error': 'date/to must be valid dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        if (date_to - date_from).days > 30:
+            return Response({'error': 'Date range cannot exceed 31 days'}, status=status.HTTP_400_BAD_REQUEST)
+        if not start_time or not end_time or start_time >= end_time:
+            return Response({'error': 'start/end must be valid times (HH:MM), start < end'}, status=status.HTTP_400_BAD_REQUEST)
+
+        min_capacity = params.get('min_capacity')
+        min_capacity = int(min_capacity) if min_capacity and min_capacity.isdigit() else None
+        rooms = available_rooms(branch.id, date_from, date_to, start_time, end_time, min_capacity)
+        return Response({
+            'branch': branch.id,
+            'date': date_from,
+            'to': date_to,
+            'start': start_time,
+            'end': end_time,
+            'min_capacity': min_capacity,
+            'rooms': rooms,
+        })
+
 
 
 
@@ -1123,6 +1746,7 @@ class PayrollViewSet(viewsets.ModelViewSet):
     - PATCH /api/payroll/{id}/ - Partial update
     - DELETE /api/payroll/{id}/ - Delete payroll record
     - GET /api/payroll/teacher/{teacher_id}/history/ - Get teacher payroll history
+    - POST /api/payroll/run/ - Generate payroll of a center for a month from lesson hours
     """
     queryset = Payroll.objects.all()
     serializer_class = PayrollSerializer
@@ -1135,15 +1759,42 @@ class PayrollViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Payroll.objects.all()
                 elif profile.role in ['Director', 'Manager', 'Admin']:
-                    return Payroll.objects.filter(teacher__branch__educational_center=profile.educational_center)
+                    return Payroll.objects.filter(teacher__branch__educational_center_id=profile.educational_center_id)
             except UserProfile.DoesNotExist:
                 return Payroll.objects.all()
         return Payroll.objects.all()
 
+    staff_roles = ('SuperAdmin', 'Director', 'Manager', 'Admin')
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
+    def run(self, request):
+        """
+        Generate payroll for a month (faqat markaz xodimlari).
+        POST data: {"month": "2025-01", "center": 1, "rules": {"penalty_per_cancelled_lesson": 50000}}
+        center faqat SuperAdmin uchun; boshqalar uchun o'z markazi olinadi.
+        """
+        profile = request_profile(request)
+        if profile is None or profile.role not in self.staff_roles:
+            return Response({'error': 'Only center staff can run payroll'}, status=status.HTTP_403_FORBIDDEN)
+        center_id = request_center_id(request, request.data.get('center'))
+        if not center_id:
+            return Response({'error': 'center is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        month = request.data.get('month') or timezone.localdate().strftime('%Y-%m')
+        rules = request.data.get('rules') or {}
+        if not isinstance(rules, dict):
+            return Response({'error': 'rules must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            summary = run_payroll(center_id, month, rules)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
+
 
 class NotificationViewSet(viewsets.ModelViewSet):
     """
@@ -1156,7 +1807,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
     - POST /api/notifications/ - Create notification
     - GET /api/notifications/{id}/ - Retrieve notification
     - DELETE /api/notifications/{id}/ - Delete notification
-    - POST /api/notifications/{id}/mark-read/ - Mark as read
+    - POST /api/notifications/{id}/mark_read/ - Mark as read
+    - GET /api/notifications/unread-count/ - {"unread": n}; badge uchun (hisoblagich, jadval sanalmaydi)
+    - POST /api/notifications/mark-read/ - {"ids": [1, 2]} - bitta UPDATE
+    - POST /api/notifications/mark-all-read/ - barcha o'qilmaganlar, bitta UPDATE
     """
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
@@ -1174,11 +1828,89 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark notification as read"""
-        notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        # save() o'rniga bitta UPDATE; 0 qator - allaqachon o'qilgan yoki boshqaniki
+        if not str(pk).isdigit():
+            raise Http404
+        if not mark_notifications_read(request.user.pk, [int(pk)]) and not self.get_queryset().filter(pk=pk).exists():
+            raise Http404
         return Response({'status': 'Notification marked as read'})
 
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """Unread badge: one primary-key lookup of the user's counter"""
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response({'unread': unread_notifications(request.user.pk)})
+
+    # {id}/mark_read/ bilan bir xil operationId chiqmasin (OpenAPI klient generatorlari uchun)
+    @extend_schema(operation_id='notifications_mark_read_many')
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read_many(self, request):
+        """Mark the given notification ids read"""
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(str(i).isdigit() for i in ids):
+            return Response({'error': 'ids must be a list of notification ids'}, status=status.HTTP_400_BAD_REQUEST)
+        updated = mark_notifications_read(request.user.pk, [int(i) for i in ids])
+        return Response({'updated': updated, 'unread': unread_notifications(request.user.pk)})
+
+    @action(detail=False, methods=['post'], url_path='mark-all-read')
+    def mark_all_read(self, request):
+        """Mark every unread notification of the user read"""
+        if not request.user.is_authenticated:
+            return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        updated = mark_notifications_read(request.user.pk)
+        return Response({'updated': updated, 'unread': unread_notifications(request.user.pk)})
+
+
+class BroadcastViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Announcements fanned out to many users at once.
+
+    Authentication: IsAuthenticated (SuperAdmin/Director/Manager/Admin)
+
+    ENDPOINTS:
+    - POST /api/broadcasts/ - {"target_type": "group"|"branch"|"center"|"role", "target_id": 1,
+      "role": "Teacher", "notification_type": "...", "title": "...", "message": "..."}
+      - 202: job; bildirishnomalar fon oqimida yoziladi
+    - GET /api/broadcasts/ - Center broadcasts
+    - GET /api/broadcasts/{id}/ - Progress: status, total, sent, progress (%)
+    """
+    serializer_class = BroadcastJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    staff_roles = ('SuperAdmin', 'Director', 'Manager', 'Admin')
+
+    def get_queryset(self):
+        profile = request_profile(self.request)
+        if profile is None or profile.role not in self.staff_roles:
+            return BroadcastJob.objects.none()
+        if profile.role == 'SuperAdmin':
+            return BroadcastJob.objects.all()
+        return BroadcastJob.objects.filter(educational_center_id=profile.educational_center_id)
+
+    def create(self, request, *args, **kwargs):
+        profile = request_profile(request)
+        if profile is None or profile.role not in self.staff_roles:
+            return Response({'error': 'Only center staff can broadcast'}, status=status.HTTP_403_FORBIDDEN)
+        center_id = request_center_id(request, request.data.get('educational_center'))
+        if center_id is None:
+            return Response({'error': 'educational_center is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        targets = {'group': Group.objects, 'branch': Branch.objects}
+        if data['target_type'] in targets and not targets[data['target_type']].filter(
+            pk=data['target_id'], educational_center_id=center_id,
+        ).exists():
+            return Response({'error': f"{data['target_type'].title()} not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        with transaction.atomic():
+            job = serializer.save(educational_center_id=center_id, created_by_id=request.user.pk)
+            start_broadcast(job)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 # class UserViewSet(viewsets.ModelViewSet):
 #     """User management"""
 #     queryset = User.objects.all().order_by('-date_joined')
@@ -1251,27 +1983,10 @@ def login_api(request):
     if not username or not password:
         return Response({'error': 'Username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    user = authenticate(username=username, password=password)
+    user = guarded_authenticate(request, username, password)
     if not user:
         return Response({'error': 'Invalid username or password'}, status=status.HTTP_401_UNAUTHORIZED)
-
-    # JWT token yaratish
-    refresh = RefreshToken.for_user(user)
-    access_token = str(refresh.access_token)
-
-    # Foydalanuvchi roli
-    try:
-        profile = user.profile
-        role = profile.role
-    except UserProfile.DoesNotExist:
-        role = None
-
-    return Response({
-        'access': access_token,
-        'refresh': str(refresh),
-        'username': user.username,
-        'role': role
-    }, status=status.HTTP_200_OK)
+    return login_response(user)
 
 
 
@@ -1305,11 +2020,11 @@ class ContractViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Contract.objects.all()
                 elif profile.role in ['Director', 'Manager', 'Admin']:
-                    return Contract.objects.filter(student__branch__educational_center=profile.educational_center)
+                    return Contract.objects.filter(student__branch__educational_center_id=profile.educational_center_id)
             except UserProfile.DoesNotExist:
                 return Contract.objects.all()
         return Contract.objects.all()
@@ -1342,11 +2057,11 @@ class LeadViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_authenticated:
             try:
-                profile = UserProfile.objects.get(user=user)
+                profile = user.profile
                 if profile.role == 'SuperAdmin':
                     return Lead.objects.all()
                 elif profile.role in ['Director', 'Manager']:
-                    return Lead.objects.filter(branch__educational_center=profile.educational_center)
+                    return Lead.objects.filter(branch__educational_center_id=profile.educational_center_id)
             except UserProfile.DoesNotExist:
                 return Lead.objects.all()
         return Lead.objects.all()
@@ -1371,3 +2086,137 @@ class LeadViewSet(viewsets.ModelViewSet):
         """Get statistics by lead source"""
         leads_by_source = Lead.objects.values('source').annotate(count=Count('id'))
         return Response(list(leads_by_source))
+
+
+# =========================
+# Director Dashboard
+# =========================
+class DashboardAPIView(APIView):
+    """
+    All KPIs of the caller's educational center in one response.
+
+    ENDPOINTS:
+    - GET /api/dashboard/ - Branches, groups, students, teachers, payments, leads,
+      today's lessons and unpaid payroll (SuperAdmin: ?center={id})
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        center_id = request_center_id(request, request.query_params.get('center'))
+        if not center_id:
+            return Response({'error': 'Educational center not found'}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(center_dashboard(center_id))
+
+
+class CalendarLinkAPIView(APIView):
+    """
+    Subscription URL of a teacher/group/room .ics feed.
+
+    ENDPOINTS:
+    - GET /api/calendar/{teacher|group|room}/{id}/ - {"url": ".../feed.ics?token=..."}
+      - Kalendar ilovasi (Google/Apple/Outlook) shu URL'ga JWT'siz obuna bo'ladi
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, kind, pk):
+        if kind not in FEED_KINDS:
+            return Response({'error': 'Unknown calendar type'}, status=status.HTTP_404_NOT_FOUND)
+
+        center_id = request_center_id(request)
+        queryset = FEED_KINDS[kind][0].objects.filter(pk=pk)
+        if center_id:
+            center_field = 'educational_center_id' if kind == 'group' else 'branch__educational_center_id'
+            queryset = queryset.filter(**{center_field: center_id})
+        if not queryset.exists():
+            return Response({'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        path = reverse('calendar-feed', kwargs={'kind': kind, 'pk': pk})
+        url = request.build_absolute_uri(f'{path}?token={feed_token(kind, pk)}')
+        return Response({'url': url})
+
+
+def _calendar_etag(request, kind, pk):
+    if kind not in FEED_KINDS or not check_feed_token(kind, pk, request.GET.get('token')):
+        return None
+    return feed_etag(kind, pk)
+
+
+@condition(etag_func=_calendar_etag)
+def calendar_feed(request, kind, pk):
+    """
+    GET /api/calendar/{teacher|group|room}/{id}/feed.ics?token=... - streaming iCalendar feed.
+    If-None-Match mos kelsa 304 qaytadi (condition dekoratori).
+    """
+    if kind not in FEED_KINDS or not check_feed_token(kind, pk, request.GET.get('token')):
+        return HttpResponseForbidden('Invalid calendar token')
+    obj = FEED_KINDS[kind][0].objects.filter(pk=pk).first()
+    if obj is None:
+        raise Http404
+
+    response = StreamingHttpResponse(stream_feed(kind, pk, str(obj)), content_type='text/calendar; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{kind}-{pk}.ics"'
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    return response
+
+
+class CheckinAPIView(APIView):
+    """
+    Student self check-in by scanning the lesson QR code.
+
+    Authentication: IsAuthenticated (o'quvchi kabineti, Student.user)
+
+    ENDPOINTS:
+    - POST /api/checkin/ - body: {"token": "..."}
+      - 202: {"lesson": 1, "status": "Present" | "Late"}; davomat buferdan bir necha soniyada yoziladi
+      - 400: token noto'g'ri yoki muddati o'tgan
+      - 403: foydalanuvchi o'quvchi akkaunti emas
+
+    O'quvchi JWT egasidan olinadi: QR token faqat dars va vaqtni tasdiqlaydi,
+    kim skanerlayotganini emas.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        try:
+            lesson_id, start = read_checkin_token(request.data.get('token'))
+        except (signing.BadSignature, ValueError):
+            return Response({'error': 'Invalid or expired check-in token'}, status=status.HTTP_400_BAD_REQUEST)
+        student_id = Student.objects.filter(user_id=request.user.pk, status='Active').values_list(
+            'id', flat=True
+        ).first()
+        if student_id is None:
+            return Response({'error': 'Only students can check in'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(
+            {'lesson': lesson_id, 'status': check_in(lesson_id, start, student_id)},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+def openapi_schema(request):
+    """
+    Prebuilt OpenAPI schema (manage.py build_openapi_schema).
+
+    GET /api/schema/ - YAML (default), ?format=json yoki Accept: ...json - JSON.
+    Fayl xotiradan beriladi: ETag/If-None-Match -> 304, Accept-Encoding: gzip
+    bo'lsa oldindan siqilgan nusxa.
+    """
+    fmt = request.GET.get('format') or ('json' if 'json' in request.headers.get('Accept', '') else 'yaml')
+    if fmt not in SCHEMA_FORMATS:
+        return JsonResponse({'error': f"Unknown format '{fmt}'"}, status=400)
+    schema = load_schema(fmt)
+    if schema is None:
+        return JsonResponse({'error': 'Schema is not built, run manage.py build_openapi_schema'}, status=503)
+    content, gzipped, etag = schema
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(gzipped, content_type=SCHEMA_FORMATS[fmt][1])
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(content, content_type=SCHEMA_FORMATS[fmt][1])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, max-age=300'
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
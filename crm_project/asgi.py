@@ -4,4 +4,22 @@ from django.core.asgi import get_asgi_application
 # settings.py faylingizni ko‘rsatish
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crm_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402  (django.setup() dan keyin)
+
+from crm_app.events import require_shared_bus  # noqa: E402
+from crm_app.sse import sse_app  # noqa: E402
+
+EVENTS_PATH = '/api/events/'
+
+if settings.WEB_ROLE == 'events':
+    # Hodisalar boshqa protsesslardan keladi - brokersiz ishga tushmaslik
+    require_shared_bus()
+
+
+async def application(scope, receive, send):
+    """SSE oqimi Django view emas: uzun ulanish middleware/ORM oqimini band qilmaydi"""
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await sse_app(scope, receive, send)
+    return await django_application(scope, receive, send)
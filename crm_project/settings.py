@@ -49,7 +49,14 @@ INSTALLED_APPS = [
 # ===========================
 # MIDDLEWARE
 # ===========================
+# Yo'lga qarab zanjir tanlanadi (crm_app/middleware.py):
+# /api/ - faqat JWT, sessiya/CSRF/messages/X-Frame-Options kerak emas;
+# /admin/ va qolgan yo'llar - to'liq FULL_MIDDLEWARE
 MIDDLEWARE = [
+    'crm_app.middleware.PathMiddlewareDispatcher',
+]
+
+FULL_MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # 👈 DOIM BIRINCHI
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,6 +67,22 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+API_MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    # APPEND_SLASH: slash'siz /api/... manzillari avvalgidek redirect qilinadi
+    'django.middleware.common.CommonMiddleware',
+    # Autentifikatsiya DRF ichida (ClaimsJWTAuthentication), sessiyasiz
+]
+
+MIDDLEWARE_BY_PATH = [
+    ('/api/', API_MIDDLEWARE),
+]
+
+# Admin sessiya/auth/messages middleware'larini MIDDLEWARE da qidiradi;
+# ular FULL_MIDDLEWARE da, /admin/ uchun dispatcher orqali ishlaydi (crm_app.E408-E410 tekshiradi)
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 ROOT_URLCONF = 'crm_project.urls'
 
 # ===========================
@@ -94,6 +117,41 @@ DATABASES = {
     )
 }
 
+# ===========================
+# CACHE
+# ===========================
+# REDIS_URL berilsa barcha gunicorn workerlar bitta keshni ishlatadi,
+# aks holda har bir process o'zining xotira keshiga ega bo'ladi.
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'crm-cache',
+        }
+    }
+
+# Dashboard keshi (sekund): muddat tugaganda faqat bitta so'rov qayta hisoblaydi
+DASHBOARD_CACHE_TIMEOUT = 30
+
+# Imtihon statistikasi keshi (sekund). Versiya signal bilan oshiriladi; LocMemCache'da
+# bu faqat shu protsessni tozalaydi, shuning uchun muddat - boshqa workerlar uchun zaxira
+EXAM_STATS_CACHE_TIMEOUT = 10 * 60
+
+# Kogorta (retention) matritsasi keshi, har bir markaz uchun alohida (sekund)
+COHORT_CACHE_TIMEOUT = 60 * 60
+
+# Gradebook: o'rtacha bahoda topshiriqlar ulushi (qolgani imtihonlar)
+GRADEBOOK_ASSIGNMENT_WEIGHT = 0.4
+
 # ===========================
 # PASSWORD VALIDATION
 # ===========================
@@ -129,7 +187,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     # 🔐 Authentication
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # JWT orqali auth
+        # JWT claim'laridan (role, markaz, teacher) foydalanuvchi - har so'rovda User/UserProfile o'qilmaydi
+        'crm_app.authentication.ClaimsJWTAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',  # Browsable API uchun kerak bo'lsa izohga olish mumkin
     ),
 
@@ -158,6 +217,32 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Token claim'lari bazadagi holat bilan shuncha sekundda bir marta solishtiriladi
+# (har worker, har foydalanuvchi) - blok/rol o'zgarishi signali yetib bormasa ham eskirish chegarasi
+AUTH_CLAIMS_REVALIDATE_SECONDS = 5 * 60
+# Worker eslab qoladigan tekshiruvlar soni (LRU): eng eskisi chiqariladi, xotira cheklangan
+AUTH_CLAIMS_REVALIDATE_CACHE_SIZE = 50_000
+
+# Bekor qilingan tokenlar (TokenRevocation): workerlar yangi qatorlarni shuncha sekundda bir o'qiydi,
+# to'plam shuncha sekundda to'liq qayta quriladi; Bloom filtr sig'imi (0.1% xato)
+AUTH_REVOCATION_SYNC_SECONDS = 2
+AUTH_REVOCATION_REBUILD_SECONDS = 60 * 60
+AUTH_REVOCATION_BLOOM_CAPACITY = 100_000
+
+# Login: parol xeshi shuncha oqimli poolda (har worker), navbat to'lsa 503.
+# WORKERS + QUEUE gunicorn --threads (Procfile: 8) dan kichik bo'lsin - aks holda
+# login'lar barcha oqimlarni egallab, boshqa endpoint'lar navbatda qoladi.
+# Muvaffaqiyatsiz urinishlar username/IP bo'yicha oynada sanaladi, limitdan keyin 429
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_QUEUE = 4
+LOGIN_HASH_TIMEOUT = 10
+LOGIN_FAILURES_PER_USERNAME = 5
+LOGIN_FAILURES_PER_IP = 30
+LOGIN_FAILURE_WINDOW = 15 * 60
+# IP cheklovi uchun: X-Forwarded-For'ga o'zi qo'shadigan ishonchli proxy'lar soni
+# (Render - 1). Klient yuborgan chap tomondagi qiymatlarga ishonilmaydi; 0 - REMOTE_ADDR
+TRUSTED_PROXY_HOPS = config("TRUSTED_PROXY_HOPS", default=1, cast=int)
+
 # ===========================
 # SWAGGER / SPECTACULAR
 # ===========================
@@ -167,6 +252,99 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
 }
 
+# /api/schema/ deploy paytida yig'ilgan fayldan beriladi (manage.py build_openapi_schema).
+# OPENAPI_RUNTIME_SCHEMA=True (faqat dev): fayl yo'q bo'lsa protsessda bir marta yaratiladi
+# va /api/schema/live/ har so'rovda generatsiya qiladi
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+OPENAPI_RUNTIME_SCHEMA = config("OPENAPI_RUNTIME_SCHEMA", default=False, cast=bool)
+
+# ===========================
+# PAYROLL
+# ===========================
+# run_payroll uchun bonus/jarima qoidalari (crm_app/payroll.py DEFAULT_RULES)
+PAYROLL_RULES = {
+    'hours_bonus_threshold': 0,
+    'hours_bonus_percent': 0,
+    'rating_bonus_threshold': 0,
+    'rating_bonus_percent': 0,
+    'penalty_per_cancelled_lesson': 0,
+}
+
+# ===========================
+# ROOMS / SCHEDULE
+# ===========================
+# Filial ish vaqti: xonalar bandligi (utilization) shu oynaga nisbatan hisoblanadi
+ROOM_OPEN_HOURS = ('08:00', '20:00')
+ROOM_OPEN_WEEKDAYS = [0, 1, 2, 3, 4, 5]  # Dushanba-Shanba
+ROOM_UTILIZATION_CACHE_TIMEOUT = 60 * 60
+
+# O'qituvchi jadvali: from/to berilmasa bugundan necha kun ko'rsatiladi
+SCHEDULE_WINDOW_DAYS = 28
+
+# .ics lentalari oynasi (bugundan orqaga / oldinga, kun)
+CALENDAR_FEED_PAST_DAYS = 30
+CALENDAR_FEED_FUTURE_DAYS = 120
+
+# Timetable solver vaqt byudjeti (sekund): standart va API orqali ruxsat etilgan maksimum
+TIMETABLE_TIME_BUDGET = 2
+TIMETABLE_MAX_TIME_BUDGET = 30
+
+# QR check-in: token amal qilish muddati, kechikish chegarasi va bufer flush qoidasi
+# (CHECKIN_FLUSH_INTERVAL = 0 - buferlamasdan darhol yozish).
+# Yo'qotish oynasi: qabul qilingan (200 qaytgan) check-in'lar flush'gacha faqat worker
+# xotirasida. Oddiy to'xtash (SIGTERM, max-requests, deploy) atexit'da flush qiladi;
+# SIGKILL/OOM esa oxirgi CHECKIN_FLUSH_INTERVAL (baza ishlamayotgan bo'lsa - undan ko'p)
+# ichidagi skanlarni yo'qotadi - o'quvchi qayta skanerlashi yoki o'qituvchi belgilashi kerak.
+CHECKIN_TOKEN_MAX_AGE = 5 * 60
+CHECKIN_LATE_MINUTES = 10
+CHECKIN_FLUSH_INTERVAL = 0.5
+CHECKIN_FLUSH_SIZE = 500
+
+# ===========================
+# BACKGROUND / BROADCASTS
+# ===========================
+# Fon pooli oqimlari (har worker); 0 - vazifa commit'dan keyin shu oqimda bajariladi
+BACKGROUND_WORKERS = 2
+# Ommaviy bildirishnoma: bitta INSERT/tranzaksiyadagi qatorlar soni (progress qadami)
+BROADCAST_CHUNK_SIZE = 5000
+# Avtomatik (dedup_key) bildirishnomalar: bitta executemany/tranzaksiya hajmi
+NOTIFICATION_BATCH_SIZE = 5000
+
+# ===========================
+# REAL-TIME EVENTS (SSE)
+# ===========================
+# GET /api/events/ faqat ASGI'da (crm_project.asgi, uvicorn). Platforma HTTP'ni
+# faqat "web" protsessiga yo'naltiradi, shuning uchun hodisalar alohida servis
+# (xuddi shu kod, WEB_ROLE=events, o'z domeni) sifatida deploy qilinadi - Procfile.
+# Hodisalarni gunicorn workerlar yozadi: WEB_ROLE=events umumiy brokersiz
+# (REDIS_URL yoki EVENT_BUS) ishga tushmaydi.
+WEB_ROLE = config("WEB_ROLE", default="api")
+# Boshqa broker: 'module.Class' (LocalEventBus interfeysi)
+EVENT_BUS = config("EVENT_BUS", default=None)
+# Ulanish navbati; to'lsa klientga "resync" yuboriladi
+EVENTS_QUEUE_SIZE = 100
+EVENTS_HEARTBEAT_SECONDS = 20
+EVENTS_RETRY_MS = 5000
+
+# ===========================
+# PAYMENT REMINDERS
+# ===========================
+# send_payment_reminders (--every bilan protsess ichida rejalashtiriladi)
+PAYMENT_REMINDER_DAYS_AHEAD = 3
+# Bundan eski muddatlar skan qilinmaydi (oraliq skani chegarasi)
+PAYMENT_OVERDUE_LOOKBACK_DAYS = 90
+PAYMENT_OVERDUE_REPEAT_DAYS = 7
+
+# ===========================
+# ABSENCE STREAKS
+# ===========================
+# detect_absence_streaks: shuncha dars ketma-ket "Absent" - Attendance Alert
+ABSENCE_STREAK_THRESHOLD = 3
+# Seriya shu kunlardan eski darslarga qaralmaydi
+ABSENCE_LOOKBACK_DAYS = 60
+# Watermark'dan shuncha soniya oldingi belgilashlar ham qayta ko'riladi
+ABSENCE_WATERMARK_OVERLAP = 300
+
 # ===========================
 # CORS
 # ===========================
@@ -4,13 +4,20 @@ from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from crm_app.views import openapi_schema
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    # Sxema deploy paytida yig'iladi (build_openapi_schema), so'rovda generatsiya yo'q
+    path('api/schema/', openapi_schema, name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/', include('crm_app.urls')),
 ]
 
+if settings.OPENAPI_RUNTIME_SCHEMA:
+    # Dev: har so'rovda yangidan generatsiya (kod o'zgarishlarini darhol ko'rish uchun)
+    urlpatterns.insert(1, path('api/schema/live/', SpectacularAPIView.as_view(), name='schema-live'))
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
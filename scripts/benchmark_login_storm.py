@@ -0,0 +1,143 @@
+"""
+Login storm benchmark
+Run: python scripts/benchmark_login_storm.py --username director --password secret --probe /api/groups/ --logins 32
+
+Avval --duration sekund davomida oddiy API endpoint'i (--probe, login orqali
+olingan JWT bilan) kechikishi o'lchanadi, so'ng --logins ta parallel oqim
+to'xtovsiz POST /api/login/ yuborayotgan paytda xuddi shu o'lchov takrorlanadi.
+Natijada ikkala holat uchun persentillar va login javob kodlari (200/429/503) chiqadi.
+"""
+
+import argparse
+import collections
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def connect(base):
+    target = urlparse(base)
+    connection_class = http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(target.hostname, target.port, timeout=30)
+
+
+def login(base, username, password):
+    connection = connect(base)
+    body = json.dumps({'username': username, 'password': password})
+    connection.request('POST', '/api/login/', body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    payload = json.loads(response.read() or b'{}')
+    connection.close()
+    if response.status != 200:
+        raise SystemExit(f'Login failed ({response.status}): {payload}')
+    return payload['access']
+
+
+def probe(base, path, access, rate, duration):
+    """GET the probe endpoint at a fixed pace; returns (sorted latencies, errors)"""
+    connection = connect(base)
+    headers = {'Authorization': f'Bearer {access}'}
+    latencies, errors = [], 0
+    next_at = time.perf_counter()
+    stop_at = next_at + duration
+    while time.perf_counter() < stop_at:
+        now = time.perf_counter()
+        if now < next_at:
+            time.sleep(next_at - now)
+        # Sekin javoblardan keyin yo'qotilgan so'rovlar yetkazib yuborilmaydi
+        next_at = max(next_at, time.perf_counter())
+        sent = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+        latencies.append(time.perf_counter() - sent)
+        next_at += 1 / rate
+    connection.close()
+    return sorted(latencies), errors
+
+
+def storm(base, username, password, stop, codes, lock):
+    """Sends logins back to back until stop is set"""
+    connection = connect(base)
+    body = json.dumps({'username': username, 'password': password})
+    while not stop.is_set():
+        try:
+            connection.request('POST', '/api/login/', body, {'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            code = response.status
+        except (OSError, http.client.HTTPException):
+            code = 'error'
+            connection.close()
+        with lock:
+            codes[code] += 1
+    connection.close()
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def report(title, latencies, errors):
+    print(f'{title}: {len(latencies)} requests, {errors} errors')
+    print('  latency ms: p50={:.1f} p95={:.1f} p99={:.1f} max={:.1f}'.format(
+        percentile(latencies, 50) * 1000,
+        percentile(latencies, 95) * 1000,
+        percentile(latencies, 99) * 1000,
+        (latencies[-1] if latencies else 0) * 1000,
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API latency during a login storm')
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--probe', default='/api/groups/', help='Endpoint measured during the storm')
+    parser.add_argument('--probe-rate', type=float, default=20, help='Probe requests per second')
+    parser.add_argument('--logins', type=int, default=32, help='Concurrent login clients')
+    parser.add_argument('--storm-password', help="Password used by the storm (default: --password; "
+                                                 "noto'g'ri parol throttling'ni sinaydi)")
+    parser.add_argument('--duration', type=float, default=15)
+    args = parser.parse_args()
+
+    base = args.url.rstrip('/')
+    access = login(base, args.username, args.password)
+
+    report('Baseline', *probe(base, args.probe, access, args.probe_rate, args.duration))
+
+    stop, lock = threading.Event(), threading.Lock()
+    codes = collections.Counter()
+    threads = [
+        threading.Thread(target=storm, args=(base, args.username, args.storm_password or args.password,
+                                             stop, codes, lock))
+        for _ in range(args.logins)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        report(f'During storm ({args.logins} login clients)',
+               *probe(base, args.probe, access, args.probe_rate, args.duration))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - started
+    total = sum(codes.values())
+    print(f'Logins: {total} in {elapsed:.1f}s ({total / elapsed:.0f}/s) ' +
+          ' '.join(f'{code}={count}' for code, count in sorted(codes.items(), key=str)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+QR check-in load test
+Run: python scripts/load_test_checkin.py --token <lesson token> --jwt-file students.txt --rate 1000 --duration 30
+
+Token: GET /api/lessons/{id}/checkin-token/ (o'qituvchi/direktor JWT bilan).
+students.txt: har qatorda bitta o'quvchi access tokeni (/api/login/) - o'quvchi JWT'dan olinadi.
+Skript berilgan tezlikda (so'rov/sekund) POST /api/checkin/ yuboradi va
+haqiqiy throughput, kechikish persentillari va xatolar sonini chiqaradi.
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+
+def read_jwts(path):
+    with open(path) as handle:
+        return [line.strip() for line in handle if line.strip()]
+
+
+def worker(url, token, students, start_at, interval, stop_at, results, lock):
+    """Sends its share of requests on one keep-alive connection at a fixed pace"""
+    target = urlparse(url)
+    connection_class = http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(target.hostname, target.port, timeout=10)
+    latencies, errors, i = [], 0, 0
+    next_at = start_at
+    while True:
+        now = time.perf_counter()
+        if now >= stop_at:
+            break
+        if now < next_at:
+            time.sleep(next_at - now)
+        body = json.dumps({'token': token})
+        headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {students[i % len(students)]}'}
+        sent = time.perf_counter()
+        try:
+            connection.request('POST', target.path, body, headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 202:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+        latencies.append(time.perf_counter() - sent)
+        i += 1
+        next_at += interval
+    connection.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test POST /api/checkin/')
+    parser.add_argument('--url', default='http://localhost:8000/api/checkin/')
+    parser.add_argument('--token', required=True, help='Lesson check-in token')
+    parser.add_argument('--jwt-file', required=True, help='File with one student access token per line')
+    parser.add_argument('--rate', type=int, default=1000, help='Target requests per second')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--concurrency', type=int, default=64)
+    args = parser.parse_args()
+
+    students = read_jwts(args.jwt_file)
+    concurrency = max(1, min(args.concurrency, args.rate))
+    interval = concurrency / args.rate
+    results = {'latencies': [], 'errors': 0}
+    lock = threading.Lock()
+
+    start_at = time.perf_counter() + 0.5
+    stop_at = start_at + args.duration
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(args.url, args.token, students[n::concurrency] or students, start_at + n * interval / concurrency,
+                  interval, stop_at, results, lock),
+        )
+        for n in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_at
+
+    latencies = sorted(results['latencies'])
+    total = len(latencies)
+    print(f'Requests:   {total} in {elapsed:.1f}s ({total / elapsed:.0f} req/s, target {args.rate})')
+    print(f'Errors:     {results["errors"]}')
+    print('Latency ms: p50={:.1f} p95={:.1f} p99={:.1f} max={:.1f}'.format(
+        percentile(latencies, 50) * 1000,
+        percentile(latencies, 95) * 1000,
+        percentile(latencies, 99) * 1000,
+        (latencies[-1] if latencies else 0) * 1000,
+    ))
+
+
+if __name__ == '__main__':
+    main()